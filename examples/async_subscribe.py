@@ -0,0 +1,36 @@
+import asyncio
+from simconnect import AsyncSimConnect, PERIOD_VISUAL_FRAME
+
+
+"""
+Share a single connection between several coroutines using AsyncSimConnect,
+which pumps SDK messages from a task on the event loop
+"""
+
+
+async def watch(asc: AsyncSimConnect, updates: int):
+    # subscribe_simdata is an async iterator yielding the latest values after each update
+    it = asc.subscribe_simdata(["Plane Latitude", "Plane Longitude"], period=PERIOD_VISUAL_FRAME, interval=30)
+    async for simdata in it:
+        print(f"Position {simdata}")
+        updates -= 1
+        if not updates:
+            break
+    # closing the iterator stops the subscription
+    await it.aclose()
+
+
+async def main():
+    async with AsyncSimConnect(name='AsyncSubscribe') as asc:
+        state = await asc.RequestSystemState("AircraftLoaded")
+        print(f"Aircraft loaded: {state.string if state else '?'}")
+        # one-off requests can run concurrently with each other and with subscriptions
+        altitude, heading, _ = await asyncio.gather(
+            asc.get_simdatum("Indicated Altitude"),
+            asc.get_simdatum("Plane Heading Degrees True", units="degrees"),
+            watch(asc, 10),
+        )
+        print(f"Altitude {altitude}, heading {heading}")
+
+
+asyncio.run(main())
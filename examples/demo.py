@@ -28,7 +28,7 @@ datadef = sc.subscribe_simdata(
 print("Inferred variable units", datadef.get_units())
 
 # track the most recent data update
-latest = datadef.simdata.latest()
+latest = datadef.simdata.version
 
 for i in range(10):
     # bump altitude, which is a settable simulator variable
@@ -46,9 +46,8 @@ for i in range(10):
         pass
 
     # show data that's been changed since the last update
-    print(f"Updated data {datadef.simdata.changedsince(latest)}")
-
-    latest = datadef.simdata.latest()
+    changes, latest = datadef.simdata.snapshot_diff(latest)
+    print(f"Updated data {changes}")
 
     # fetch the current altitude
     altitude = datadef.simdata['Indicated Altitude']
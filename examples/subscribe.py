@@ -29,8 +29,7 @@ with SimConnect(name='MonitorMetrics') as sc:
             # clear queue of pending results, processed by receiver handlers
             print('received result')
             pass
-        n = len(dd.simdata.changedsince(latest))
-        if n:
-            print(f"Updated {n} simvars")
+        changes, latest = dd.simdata.snapshot_diff(latest)
+        if changes:
+            print(f"Updated {len(changes)} simvars")
             print(dd.simdata)
-            latest = dd.simdata.latest()
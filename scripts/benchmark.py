@@ -0,0 +1,665 @@
+"""
+Microbenchmarks for the simconnect hot paths, using synthetic packets
+or the SimConnectEmulator backend so no DLL is needed.
+Run from the repo root, e.g. `PYTHONPATH=. python scripts/benchmark.py`,
+optionally naming the benchmarks to run, and with --json to write
+machine-readable results to stdout for tracking regressions between releases, e.g.
+
+    PYTHONPATH=. python scripts/benchmark.py --json > bench-0.2.6.json
+"""
+from ctypes import create_string_buffer, cast, byref, sizeof, POINTER, c_char
+from time import perf_counter, time
+from typing import Any, Dict, List
+import argparse
+import gc
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tracemalloc
+
+from simconnect import (
+    SIMVARS, SimConnect, SimConnectEmulator, PacketReplay, ReceiverInstance, DataDefinition, DefinitionRegistry,
+    RECV_P, RECV_SIMOBJECT_DATA, RECV_ID_SIMOBJECT_DATA, RECV_EXCEPTION, RECV_ID_EXCEPTION,
+    DATA_REQUEST_FLAG_TAGGED, PERIOD_SIM_FRAME, DATATYPE_INT32, DATATYPE_FLOAT64, DATATYPE_STRING256, DWORD,
+    DATATYPE_WAYPOINT, DATA_WAYPOINT,
+)
+from simconnect.datadef import _dtyps, _data_offset, _changedict
+from simconnect.recorder import FlightRecorder, read_recording
+from simconnect.objecttable import ObjectTable
+from simconnect.history import History
+from simconnect.changedict import ChangeDict
+from simconnect import scvars
+from simconnect.search import SearchIndex
+import simconnect
+
+
+# human readable output, which goes to stderr when writing JSON
+_out = sys.stdout
+# machine readable results from report()
+results: List[Dict[str, Any]] = []
+
+
+def log(*args):
+    print(*args, file=_out)
+
+
+def report(name: str, seconds: float, **params):
+    """Record the mean seconds per operation for a benchmark with the given parameters"""
+    results.append(dict(name=name, params=params, us_per_op=seconds * 1e6, ops_per_sec=1 / seconds))
+
+
+class _DefinitionSink:
+    """Stands in for a SimConnect connection when creating a DataDefinition or its receiver"""
+    def __init__(self):
+        self.definitions = DefinitionRegistry(self)
+
+    def AddToDataDefinition(self, *args):
+        pass
+
+    def ClearDataDefinition(self, *args):
+        pass
+
+    def add_receiver(self, rtype, receiver, req_id=None) -> ReceiverInstance:
+        return ReceiverInstance(rtype, receiver, req_id)
+
+
+def make_defs(n: int) -> List[Dict[str, Any]]:
+    """Make n synthetic field definitions, mostly floats with some ints and strings"""
+    dtyps = [DATATYPE_FLOAT64] * 8 + [DATATYPE_INT32, DATATYPE_STRING256]
+    return [
+        dict(name=f"SIMVAR {i}", units='', dtyp=dtyps[i % len(dtyps)], epsilon=0)
+        for i in range(n)
+    ]
+
+
+def make_values(defs: List[Dict[str, Any]]) -> List[Any]:
+    def _value(d):
+        if d['dtyp'] == DATATYPE_STRING256:
+            return f"value {random.randint(0, 1000)}"
+        elif d['dtyp'] == DATATYPE_INT32:
+            return random.randint(0, 1 << 31)
+        else:
+            return random.uniform(-1e5, 1e5)
+    return [_value(d) for d in defs]
+
+
+def make_packet(defs: List[Dict[str, Any]], values: List[Any], tagged: bool, req_id=0):
+    """Lay out a RECV_SIMOBJECT_DATA packet with ctypes, returning (buffer, recv)"""
+    payload = b''
+    for i, (d, v) in enumerate(zip(defs, values)):
+        if tagged:
+            payload += bytes(DWORD(i))
+        ctyp = _dtyps[d['dtyp']]
+        payload += v.encode('ascii').ljust(256, b'\x00') if ctyp == c_char else bytes(ctyp(v))
+    header = RECV_SIMOBJECT_DATA(
+        dwSize=_data_offset + len(payload),
+        dwID=RECV_ID_SIMOBJECT_DATA,
+        dwRequestID=req_id,
+        dwFlags=DATA_REQUEST_FLAG_TAGGED if tagged else 0,
+        dwDefineCount=len(defs),
+    )
+    data = bytes(header)[:_data_offset] + payload
+    buf = create_string_buffer(data, max(sizeof(header), len(data)))
+    return buf, ReceiverInstance.cast_recv(cast(buf, RECV_P))
+
+
+def legacy_decode(dd: DataDefinition, recv: RECV_SIMOBJECT_DATA) -> Dict[str, Any]:
+    """The original field-at-a-time ctypes decoder, for comparison"""
+    simdata = {}
+    offset = RECV_SIMOBJECT_DATA.dwData.offset
+    tagged = recv.dwFlags & DATA_REQUEST_FLAG_TAGGED > 0
+    idx = -1
+    for _ in range(recv.dwDefineCount):
+        if tagged:
+            idx = cast(byref(recv, offset), POINTER(DWORD))[0]
+            offset += sizeof(DWORD)
+        else:
+            idx += 1
+        d = dd.defs[idx]
+        ctyp = _dtyps[d['dtyp']]
+        ptr = cast(byref(recv, offset), POINTER(ctyp))
+        if ctyp == c_char:  # STRING256
+            val = ptr[:256].rstrip(b'\x00').decode('ascii')
+            offset += 256
+        else:
+            val = ptr[0]
+            offset += sizeof(ctyp)
+        simdata[d['name']] = val
+    return simdata
+
+
+def timed(f, min_seconds=0.2) -> float:
+    """Return the mean seconds per call of f, repeating for at least min_seconds"""
+    n = 0
+    t0 = perf_counter()
+    while True:
+        f()
+        n += 1
+        elapsed = perf_counter() - t0
+        if elapsed > min_seconds:
+            return elapsed / n
+
+
+def bench_decode():
+    for n in (1, 10, 50, 200, 1000):
+        defs = make_defs(n)
+        dd = DataDefinition(_DefinitionSink(), 0, defs)
+        values = make_values(defs)
+        for tagged in (False, True):
+            _, recv = make_packet(defs, values, tagged)
+            expected = legacy_decode(dd, recv)
+            actual = {dd.defs[i]['name']: v for i, v in dd.decode(recv)}
+            assert actual == expected, "compiled decoder doesn't match legacy decoder"
+            t_old = timed(lambda: legacy_decode(dd, recv))
+            t_new = timed(lambda: dd.decode(recv))
+            layout = 'tagged' if tagged else 'untagged'
+            report('decode', t_new, fields=n, layout=layout)
+            report('decode_legacy', t_old, fields=n, layout=layout)
+            log(
+                f"decode {n:5d} fields {layout:9s} "
+                f"legacy {t_old*1e6:9.1f}us  compiled {t_new*1e6:9.1f}us  speedup {t_old/t_new:5.1f}x"
+            )
+
+
+def bench_cast_recv():
+    """Cost of casting the SDK's RECV pointer to the message's concrete type"""
+    _, data = make_packet(make_defs(10), make_values(make_defs(10)), tagged=False)
+    exc = RECV_EXCEPTION(dwSize=sizeof(RECV_EXCEPTION), dwID=RECV_ID_EXCEPTION)
+    for label, recv in (('RECV_SIMOBJECT_DATA', data), ('RECV_EXCEPTION', exc)):
+        p = cast(byref(recv), RECV_P)
+        t = timed(lambda: ReceiverInstance.cast_recv(p))
+        report('cast_recv', t, rtype=label)
+        log(f"cast_recv {label:20s} {t*1e6:7.2f}us")
+
+
+def bench_receive():
+    """The DataDefinition receiver: decode each packet and update simdata, alternating values so they change"""
+    for n in (1, 10, 50, 200, 1000):
+        defs = make_defs(n)
+        dd = DataDefinition(_DefinitionSink(), 0, defs)
+        for tagged in (False, True):
+            r = dd.add_receiver(_DefinitionSink(), 0, callback=lambda simdata: None)
+            packets = [make_packet(defs, make_values(defs), tagged) for _ in range(2)]
+            recvs = itertools.cycle([recv for _, recv in packets])
+            t = timed(lambda: r.receive(next(recvs)))
+            layout = 'tagged' if tagged else 'untagged'
+            report('receive', t, fields=n, layout=layout)
+            log(f"receive {n:5d} fields {layout:9s} {t*1e6:9.1f}us")
+
+
+def bench_fanout():
+    """SimConnect._dispatcher routing one packet with N other receivers registered"""
+    defs = make_defs(10)
+    for n in (1, 10, 100, 1000):
+        for routing in ('broadcast', 'request'):
+            with SimConnect(name='fanout', backend=SimConnectEmulator(realtime=False)) as sc:
+                if routing == 'broadcast':
+                    # every receiver sees the packet
+                    for _ in range(n):
+                        sc.add_receiver(RECV_SIMOBJECT_DATA, lambda recv: True)
+                else:
+                    # only the receiver for the matching request sees the packet
+                    for req_id in range(n):
+                        sc.add_receiver(RECV_SIMOBJECT_DATA, lambda recv: True, req_id)
+                buf, _ = make_packet(defs, make_values(defs), tagged=False, req_id=n // 2)
+                p = cast(buf, RECV_P)
+                size = len(buf)
+                t = timed(lambda: sc._dispatcher(p, size, None))
+            report('fanout', t, receivers=n, routing=routing)
+            log(f"fanout {n:5d} receivers {routing:9s} {t*1e6:9.1f}us")
+
+
+def bench_changedict(n=1000, nupdates=1_000_000):
+    """ChangeDict updates, with and without a change, and changedsince queries"""
+    d = ChangeDict()
+    keys = [f"SIMVAR {i}" for i in range(n)]
+    for k in keys:
+        d[k] = 0.0
+    ks = itertools.cycle(keys)
+    vs = itertools.count()
+    cases = [
+        ('setitem_changed', lambda: d.__setitem__(next(ks), float(next(vs)))),
+        ('setitem_unchanged', lambda: d.__setitem__('SIMVAR 0', d['SIMVAR 0'])),
+    ]
+    # the same with comparators for each field from float64 and string field defs
+    typed = _changedict(
+        [dict(name=k, dtyp=DATATYPE_FLOAT64, epsilon=1e-4) for k in keys]
+        + [dict(name='ATC ID', dtyp=DATATYPE_STRING256, epsilon=0)]
+    )
+    for k in keys:
+        typed[k] = 0.0
+    typed['ATC ID'] = 'N123'
+    d['ATC ID'] = 'N123'
+    cases += [
+        ('setitem_unchanged_str', lambda: d.__setitem__('ATC ID', 'N123')),
+        ('typed_changed', lambda: typed.__setitem__(next(ks), float(next(vs)))),
+        ('typed_unchanged', lambda: typed.__setitem__('SIMVAR 0', typed['SIMVAR 0'])),
+        ('typed_unchanged_str', lambda: typed.__setitem__('ATC ID', 'N123')),
+    ]
+    for label, f in cases:
+        t = timed(f)
+        report('changedict', t, keys=n, op=label)
+        log(f"changedict {label:21s} {n} keys {t*1e6:7.2f}us")
+    for recent in (1, 10, 100):
+        d = ChangeDict()
+        for k in keys:
+            d[k] = 0.0
+        since = d.version
+        for k in keys[:recent]:
+            d[k] = 1.0
+        assert len(d.changedsince_version(since)) == recent
+        t = timed(lambda: d.changedsince_version(since))
+        report('changedict', t, keys=n, op='changedsince_version', changed=recent)
+        log(f"changedict changedsince_version {recent:4d} of {n} keys {t*1e6:7.2f}us")
+    # a sustained stream of updates, most of them changes
+    values = [float(v % 7) for v in range(n)]
+    for track_times in (False, True):
+        d = ChangeDict(track_times=track_times)
+        t0 = perf_counter()
+        for i in range(nupdates):
+            d[keys[i % n]] = values[i % 997 % n]
+        t = (perf_counter() - t0) / nupdates
+        token = d.version
+        d[keys[0]] = -1.0
+        assert d.snapshot_diff(token) == ({keys[0]: -1.0}, token + 1)
+        report('changedict', t, keys=n, op='update_stream', updates=nupdates, track_times=track_times)
+        log(f"changedict {nupdates} updates track_times={track_times!s:5s} {t*1e6:7.2f}us {1/t:9.0f}/s")
+
+
+def bench_create():
+    """
+    DataDefinition.create from simvar names, for a new definition,
+    an existing definition found by validating the spec, and a repeated spec
+    """
+    names = [name for name in SIMVARS if ':' not in name]
+    sink = _DefinitionSink()
+    for n in (1, 10, 100):
+        simvars = names[:n]
+        DataDefinition.create(sink, simvars)
+        t_cached = timed(lambda: DataDefinition.create(sink, simvars))
+
+        def _validated():
+            sink.definitions.clear_spec_cache()
+            DataDefinition.create(sink, simvars)
+
+        def _uncached():
+            sink.definitions = DefinitionRegistry(sink)
+            DataDefinition.create(sink, simvars)
+        t_validated = timed(_validated)
+        t_new = timed(_uncached)
+        report('create', t_new, simvars=n, cached=False)
+        report('create', t_validated, simvars=n, cached='validated')
+        report('create', t_cached, simvars=n, cached=True)
+        log(f"create {n:4d} simvars new {t_new*1e6:9.1f}us  validated {t_validated*1e6:9.1f}us"
+            f"  cached {t_cached*1e6:7.2f}us")
+
+
+def bench_pack():
+    """DataDefinition._pack_data for SetDataOnSimObject"""
+    for n in (1, 10, 100):
+        defs = [dict(d, dtyp=DATATYPE_FLOAT64) for d in make_defs(n)]
+        dd = DataDefinition(_DefinitionSink(), 0, defs)
+        values = {d['name']: v for d, v in zip(defs, make_values(defs))}
+        t = timed(lambda: dd._pack_data(values))
+        report('pack', t, fields=n)
+        log(f"pack {n:4d} fields {t*1e6:7.2f}us")
+
+
+def bench_import(repeat=5):
+    """Cold start: importing simconnect and looking up a simvar in a fresh interpreter"""
+    stmt = "import simconnect; simconnect.SIMVARS['PLANE ALTITUDE']"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    times = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        subprocess.run([sys.executable, '-c', stmt], check=True, env=env)
+        times.append(perf_counter() - t0)
+    report('import', min(times))
+    log(f"import simconnect and lookup {min(times)*1e3:7.1f}ms (best of {repeat})")
+
+    # compare loading the metadata from the source JSON and the compiled database
+    def _from_json():
+        with open(scvars._jsonpath) as f:
+            json.load(f)['VARIABLES']['PLANE ALTITUDE']
+
+    def _from_db():
+        scvars._db = None
+        scvars.Metadata('VARIABLES')['PLANE ALTITUDE']
+    t_json = timed(_from_json)
+    t_db = timed(_from_db)
+    report('metadata', t_json, source='json')
+    report('metadata', t_db, source='db')
+    log(f"metadata first lookup from json {t_json*1e3:7.2f}ms  db {t_db*1e3:7.2f}ms  speedup {t_json/t_db:5.1f}x")
+
+
+def bench_search(repeat=5):
+    """Full text search: a cold query in a fresh interpreter, like the CLI, and warm queries by type"""
+    path = os.path.join(os.path.dirname(simconnect.__file__), 'scvars_idx.db')
+    stmt = f"from simconnect.search import SearchIndex; SearchIndex({path!r}).search('altitude')"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    # an installed package has compiled bytecode, so don't recompile every module on each run
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    def cold(stmt):
+        subprocess.run([sys.executable, '-c', stmt], check=True, env=env)
+        times = []
+        for _ in range(repeat):
+            t0 = perf_counter()
+            subprocess.run([sys.executable, '-c', stmt], check=True, env=env)
+            times.append(perf_counter() - t0)
+        return min(times)
+
+    t_python, t_search = cold('pass'), cold(stmt)
+    report('search_cold', t_search, python=t_python)
+    log(f"search cold start {t_search*1e3:7.1f}ms, {(t_search - t_python)*1e3:5.1f}ms "
+        f"after starting python (best of {repeat})")
+
+    idx = SearchIndex(path)
+    for q in ['altitude', 'alti*', 'alti~1', '+kind:EVENTS alti*', 'flaps^10 -handle']:
+        t = timed(lambda: idx.search(q))
+        report('search', t, query=q)
+        log(f"search {q!r:24s} {t*1e3:7.3f}ms")
+
+
+def bench_complete():
+    """CLI TAB completion for short and long prefixes, after the first call builds the index"""
+    from simconnect.cli import scoped_autocomplete
+    for kind, prefixes in [('VARIABLES', ['', 'a', 'PLANE_AL']), ('EVENTS', ['', 'ap', 'TOGGLE_'])]:
+        complete = scoped_autocomplete(kind)
+        complete('')
+        for prefix in prefixes:
+            t = timed(lambda: complete(prefix))
+            report('complete', t, kind=kind, prefix=prefix)
+            log(f"complete {kind:9s} {prefix!r:12s} {t*1e6:7.1f}us")
+
+
+def bench_units():
+    """Unit canonicalization for validate_units: the regex pipeline vs the alias table and memo"""
+    units = ['feet', 'Feet per second', 'knots', 'degrees', 'percent over 100', 'Bool', 'pounds per square inch']
+
+    def _regex():
+        for u in units:
+            ustd = scvars._unitstd(u)[0]
+            if ustd in scvars.UNITS:
+                scvars.UNITS[ustd]['name_std']
+
+    def _table():
+        for u in units:
+            scvars._canonical_units(u)
+    t_regex = timed(_regex) / len(units)
+    t_table = timed(_table) / len(units)
+    report('units', t_regex, method='regex')
+    report('units', t_table, method='table')
+    log(f"canonical units regex {t_regex*1e6:6.2f}us  table {t_table*1e6:6.2f}us  speedup {t_regex/t_table:5.1f}x")
+
+
+def bench_registry(ndefs=5000, max_definitions=100):
+    """Ad-hoc snapshots of many different definitions, with the registry clearing idle ones"""
+    names = [name for name in SIMVARS if ':' not in name]
+    emulator = SimConnectEmulator(realtime=False)
+    with SimConnect(backend=emulator, max_definitions=max_definitions) as sc:
+        specs = [random.sample(names, 3) for _ in range(ndefs)]
+        t0 = perf_counter()
+        for simvars in specs:
+            sc.get_simdata(simvars)
+        t = (perf_counter() - t0) / ndefs
+    report('registry', t, definitions=ndefs, max_definitions=max_definitions)
+    log(f"registry {ndefs} definitions {t*1e6:7.1f}us per snapshot, "
+        f"{len(sc.definitions)} live in client, {len(emulator.definitions)} in sim")
+
+
+def bench_setter():
+    """Repeatedly setting control inputs with set_simdata vs a reusable setter, via the emulator"""
+    names = ['AILERON POSITION', 'ELEVATOR POSITION', 'RUDDER POSITION', 'GENERAL ENG THROTTLE LEVER POSITION:1']
+    with SimConnect(backend=SimConnectEmulator(realtime=False)) as sc:
+        values = [0.1, -0.2, 0.05, 80.0]
+        specs = [dict(name=name, value=v) for name, v in zip(names, values)]
+        t_set = timed(lambda: sc.set_simdata(specs))
+        with sc.setter(names) as controls:
+            t_setter = timed(lambda: controls(*values))
+    report('setter', t_set, method='set_simdata', fields=len(names))
+    report('setter', t_setter, method='setter', fields=len(names))
+    log(f"setter {len(names)} fields set_simdata {1/t_set:9.0f}/s  setter {1/t_setter:9.0f}/s"
+        f"  speedup {t_set/t_setter:5.1f}x")
+
+
+def bench_set_array(nitems=500):
+    """Sending a batch of waypoints one call per item vs as one array, via the emulator"""
+    spec = dict(name='AI WAYPOINT LIST', units='number', type=DATATYPE_WAYPOINT)
+    waypoints = [
+        dict(Latitude=47 + i * 0.01, Longitude=-122.0, Altitude=3000.0, Flags=0, ktsSpeed=150.0)
+        for i in range(nitems)
+    ]
+    with SimConnect(backend=SimConnectEmulator(realtime=False)) as sc:
+        def _per_item():
+            for wp in waypoints:
+                sc.set_simdata_array(spec, [wp])
+        t_items = timed(_per_item)
+        t_array = timed(lambda: sc.set_simdata_array(spec, waypoints))
+        report('set_array', t_items, method='per_item', items=nitems)
+        report('set_array', t_array, method='array', items=nitems)
+        msg = f"set_array {nitems} waypoints per item {t_items*1e3:7.2f}ms  array {t_array*1e3:7.2f}ms"
+        try:
+            import numpy as np
+        except ImportError:
+            log(msg)
+            return
+        records = np.zeros(nitems, dtype=np.dtype(DATA_WAYPOINT))
+        records['Latitude'] = [wp['Latitude'] for wp in waypoints]
+        t_numpy = timed(lambda: sc.set_simdata_array(spec, records))
+        report('set_array', t_numpy, method='numpy', items=nitems)
+        log(msg + f"  numpy {t_numpy*1e3:7.2f}ms")
+
+
+def bench_bytype(nobjects=500, nfields=10):
+    """Collecting RECV_SIMOBJECT_DATA_BYTYPE packets for many objects as dicts vs an ObjectTable"""
+    defs = make_defs(nfields)
+    dd = DataDefinition(_DefinitionSink(), 0, defs)
+    packets = []
+    for i in range(nobjects):
+        buf, recv = make_packet(defs, make_values(defs), tagged=False)
+        recv.dwObjectID, recv.dwentrynumber, recv.dwoutof = 100 + i, i + 1, nobjects
+        packets.append((buf, recv))
+
+    def _dicts():
+        {recv.dwObjectID: dd.decode_simdata(recv) for _, recv in packets}
+
+    def _table(use_numpy):
+        table = ObjectTable(dd, use_numpy=use_numpy)
+        for _, recv in packets:
+            table.add(recv)
+    methods = dict(dicts=_dicts, lists=lambda: _table(False))
+    try:
+        import numpy    # noqa: F401
+        methods['numpy'] = lambda: _table(True)
+    except ImportError:
+        pass
+    msg = f"bytype {nobjects} objects x {nfields} fields"
+    for method, f in methods.items():
+        t = timed(f)
+        report('bytype', t, method=method, objects=nobjects, fields=nfields)
+        msg += f"  {method} {nobjects/t:9.0f} objects/s"
+    log(msg)
+
+
+def bench_history(nfields=10, nupdates=10_000, changed=0.2, capacity=4096, window=512):
+    """Appending numeric subscription updates to a History ring buffer vs a bounded list of dicts"""
+    try:
+        import numpy    # noqa: F401
+    except ImportError:
+        log("history skipped, requires numpy")
+        return
+    defs = [dict(name=f'FIELD{i}', units='number', dtyp=DATATYPE_FLOAT64, epsilon=0) for i in range(nfields)]
+    dd = DataDefinition(_DefinitionSink(), 0, defs)
+    updates = [
+        [(i, random.random()) for i in range(nfields) if random.random() < changed]
+        for _ in range(nupdates)
+    ]
+    names = dd._names
+    rows: List[Dict[str, Any]] = []
+    h = History(dd, capacity)
+
+    def _dicts():
+        latest: Dict[str, Any] = {}
+        for u in updates:
+            latest.update((names[i], v) for i, v in u)
+            rows.append(dict(latest, local_time=time()))
+            if len(rows) > capacity:
+                del rows[0]
+
+    def _history():
+        for u in updates:
+            h.update(u)
+
+    t_dicts = timed(_dicts) / nupdates
+    t_history = timed(_history) / nupdates
+    report('history', t_dicts, method='dicts', fields=nfields, changed=changed)
+    report('history', t_history, method='history', fields=nfields, changed=changed)
+    # a typical read, the rolling mean of one field
+    r_dicts = timed(lambda: sum(r['FIELD0'] for r in rows[-window:]) / window)
+    r_history = timed(lambda: h.column('FIELD0', window).mean())
+    report('history_read', r_dicts, method='dicts', window=window)
+    report('history_read', r_history, method='history', window=window)
+    log(f"history {nfields} fields  dicts {1/t_dicts:9.0f} updates/s  history {1/t_history:9.0f} updates/s  "
+        f"speedup {t_dicts/t_history:4.1f}x;  mean of {window} rows  dicts {r_dicts*1e6:6.1f}us  "
+        f"history {r_history*1e6:6.1f}us")
+
+
+def bench_recorder(nfields=50, nrows=20_000, changed=0.2):
+    """Throughput of recording updates where a fraction of the fields change each time"""
+    defs = make_defs(nfields)
+    dd = DataDefinition(_DefinitionSink(), 0, defs)
+    updates = []
+    for _ in range(100):
+        values = make_values(defs)
+        updates.append([(i, v) for i, v in enumerate(values) if random.random() < changed])
+    # the equivalent size of the decoded values, packed as they arrive in tagged packets
+    raw = sum(4 + sizeof(_dtyps[defs[i]['dtyp']]) * (256 if defs[i]['dtyp'] == DATATYPE_STRING256 else 1)
+              for u in updates for i, _ in u) * nrows / len(updates)
+
+    buf = io.BytesIO()
+    t0 = perf_counter()
+    rec = FlightRecorder(buf, dd)
+    for i in range(nrows):
+        rec.record(updates[i % len(updates)], t=rec.t0 + i / 60)
+    rec.close()
+    t_write = perf_counter() - t0
+    size = rec.bytes_written
+    report('recorder_write', t_write / nrows, fields=nfields, changed=changed)
+    log(
+        f"recorder write {nrows} rows x {nfields} fields: {nrows/t_write:9.0f} rows/s, "
+        f"{raw/t_write/1e6:6.1f} MB/s of packet data, {size/t_write/1e6:6.2f} MB/s written, "
+        f"file {size/1e3:.0f}KB is {size/raw:.1%} of packet data"
+    )
+
+    buf.seek(0)
+    t0 = perf_counter()
+    _, blocks = read_recording(buf)
+    nread = sum(len(block['t']) for block in blocks)
+    t_read = perf_counter() - t0
+    assert nread == rec.rows
+    report('recorder_read', t_read / nread, fields=nfields, changed=changed)
+    log(f"recorder read  {nread} rows: {nread/t_read:9.0f} rows/s, {size/t_read/1e6:6.1f} MB/s of file")
+
+
+def bench_replay(path=None, nfields=50, seconds=60):
+    """Per-packet cost of handling captured traffic, replayed as fast as possible"""
+    simvars = [name for name in SIMVARS if ':' not in name][:nfields]
+    if not path:
+        path = io.BytesIO()
+        scripts = {name.upper(): (lambda t, i=i: int(t * (i + 1))) for i, name in enumerate(simvars)}
+        with SimConnect(name='capture', backend=SimConnectEmulator(scripts, realtime=False)) as sc:
+            sc.start_capture(path)
+            sc.subscribe_simdata(simvars, period=PERIOD_SIM_FRAME)
+            for _ in range(int(seconds * 60)):
+                sc.dispatch()
+        path.seek(0)
+    replay = PacketReplay(path, speed=None)
+    for label, callback in (('decode only', None), ('with callback', lambda simdata: None)):
+        replay.rewind()
+        with SimConnect(name='replay', backend=replay) as sc:
+            sc.subscribe_simdata(simvars, period=PERIOD_SIM_FRAME, callback=callback)
+            t0 = perf_counter()
+            while not replay.done:
+                sc.dispatch()
+            elapsed = perf_counter() - t0
+        n = len(replay.packets)
+        report('replay', elapsed / n, fields=nfields, callback=callback is not None)
+        log(f"replay {n} packets {label:14s} {elapsed/n*1e6:7.2f}us/packet")
+
+
+def soak_subscriptions(sc: SimConnect, cycles=100_000, samples=10):
+    """Check that repeatedly subscribing and cancelling doesn't grow memory"""
+    simvars = ["Indicated Altitude", "Plane Latitude", "Plane Longitude"]
+    tracemalloc.start()
+    sizes = []
+    for i in range(cycles):
+        sub = sc.subscribe_simdata(simvars)
+        sub.cancel()
+        if (i + 1) % (cycles // samples) == 0:
+            gc.collect()
+            sizes.append(tracemalloc.get_traced_memory()[0])
+            log(f"soak {i+1:7d} subscribe/cancel cycles, traced memory {sizes[-1]/1024:8.1f}KB")
+    tracemalloc.stop()
+    # allow for warmup in the first sample
+    growth = sizes[-1] - sizes[1]
+    log(f"soak memory growth after warmup {growth/1024:.1f}KB, {len(sc._receivers)} receivers")
+    assert growth < 64 * 1024, "memory grows with subscribe/cancel cycles"
+
+
+_benchmarks = {
+    'import': bench_import,
+    'cast_recv': bench_cast_recv,
+    'decode': bench_decode,
+    'receive': bench_receive,
+    'fanout': bench_fanout,
+    'changedict': bench_changedict,
+    'create': bench_create,
+    'pack': bench_pack,
+    'recorder': bench_recorder,
+    'replay': bench_replay,
+    'search': bench_search,
+    'complete': bench_complete,
+    'units': bench_units,
+    'registry': bench_registry,
+    'setter': bench_setter,
+    'set_array': bench_set_array,
+    'bytype': bench_bytype,
+    'history': bench_history,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="simconnect microbenchmarks")
+    parser.add_argument(
+        'benchmarks', nargs='*',
+        help=f"benchmarks to run from {', '.join(_benchmarks)} or soak, defaulting to all but soak")
+    parser.add_argument('--json', action='store_true', help="write JSON results to stdout")
+    parser.add_argument('--capture', help="a capture file for the replay benchmark")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(_benchmarks) - {'soak'}
+    if unknown:
+        parser.error(f"unknown benchmarks {', '.join(sorted(unknown))}")
+    if args.json:
+        _out = sys.stderr
+    benchmarks = args.benchmarks or list(_benchmarks)
+    for name in benchmarks:
+        if name == 'soak':
+            with SimConnect(name='soak', backend=SimConnectEmulator(realtime=False)) as sc:
+                soak_subscriptions(sc)
+        elif name == 'replay':
+            bench_replay(args.capture)
+        else:
+            _benchmarks[name]()
+    if args.json:
+        json.dump(dict(
+            date=time(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            results=results,
+        ), sys.stdout, indent=1)
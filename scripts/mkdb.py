@@ -0,0 +1,63 @@
+"""
+Compile simconnect/scvars.json to the SQLite database simconnect/scvars.db,
+which scvars.py queries lazily rather than parsing the JSON on every import.
+Rerun whenever scvars.json changes.
+"""
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from simconnect.scvars import _unitstd, _source_checksum, _display_name  # noqa: E402
+
+
+tgtdir = os.path.join(os.path.dirname(__file__), '../simconnect')
+srcpath = os.path.join(tgtdir, 'scvars.json')
+dbpath = os.path.join(tgtdir, 'scvars.db')
+
+with open(srcpath) as f:
+    scvars = json.load(f)
+
+
+if os.path.exists(dbpath):
+    os.remove(dbpath)
+con = sqlite3.connect(dbpath)
+con.executescript("""
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE scvars (
+    kind TEXT,
+    key TEXT,
+    seq INTEGER,
+    name TEXT,
+    value TEXT,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+CREATE INDEX scvars_seq ON scvars (kind, seq);
+CREATE TABLE unit_aliases (alias TEXT PRIMARY KEY, name_std TEXT) WITHOUT ROWID;
+""")
+con.execute("INSERT INTO meta VALUES ('source_crc32', ?)", (_source_checksum(srcpath),))
+for kind, instances in scvars.items():
+    con.executemany(
+        "INSERT INTO scvars VALUES (?, ?, ?, ?, ?)",
+        (
+            (kind, key, seq, _display_name(kind, key, d), json.dumps(d))
+            for seq, (key, d) in enumerate(instances.items())
+        )
+    )
+
+# map the ways units are commonly written to their standard name, see scvars.validate_units
+units = scvars['UNITS']
+aliases = {}
+for key, d in units.items():
+    for alias in {key, d['name_std'], *_unitstd(d['name'], False)}:
+        for s in (alias, alias.lower(), alias.upper()):
+            ustd = _unitstd(s)[0]
+            if ustd in units:
+                aliases[s] = units[ustd]['name_std']
+con.executemany("INSERT INTO unit_aliases VALUES (?, ?)", aliases.items())
+con.commit()
+con.execute("VACUUM")
+con.close()
+
+print(f"Wrote {dbpath} with", ', '.join(f"{len(v)} {k}" for k, v in scvars.items()), f"and {len(aliases)} unit aliases")
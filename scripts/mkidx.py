@@ -1,7 +1,20 @@
+"""
+Build the search index used by `simconnect search` from simconnect/scvars.json.
+lunr computes the BM25 term scores for each document field,
+which we store as inverted postings in simconnect/scvars_idx.db
+so that simconnect/search.py can query them without loading the whole index.
+"""
 from lunr import lunr
-from lunr.index import Index
+from lunr.stemmer import porter_stemmer
 import json
 import os
+import re
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from simconnect._porter import stem  # noqa: E402
+from simconnect.search import SearchIndex, _charmask  # noqa: E402
 
 
 tgtdir = os.path.join(os.path.dirname(__file__), '../simconnect')
@@ -25,21 +38,69 @@ docs = [
     if kind != 'DIMENSIONS'
 ]
 
+fields = ['kind', 'name', 'name_', 'description', 'page', 'section']
 idx = lunr(
     ref='id',
-    fields=['kind', 'name', 'name_', 'description', 'page', 'section'],
+    fields=fields,
     documents=docs
 )
 
-idxpath = os.path.join(tgtdir, 'scvars_idx.json')
-with open(idxpath, 'w') as f:
-    json.dump(idx.serialize(), f)
+idxpath = os.path.join(tgtdir, 'scvars_idx.db')
+if os.path.exists(idxpath):
+    os.remove(idxpath)
+con = sqlite3.connect(idxpath)
+con.executescript("""
+-- field ids are the column order of the lunr index, used by postings
+CREATE TABLE fields (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE docs (id INTEGER PRIMARY KEY, ref TEXT);
+-- length and mask let fuzzy queries skip most terms without computing their edit distance
+CREATE TABLE terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE, length INTEGER, mask INTEGER);
+CREATE INDEX terms_length ON terms (length);
+CREATE TABLE postings (
+    term INTEGER,
+    field INTEGER,
+    doc INTEGER,
+    score REAL,
+    PRIMARY KEY (term, field, doc)
+) WITHOUT ROWID;
+""")
+con.executemany("INSERT INTO fields VALUES (?, ?)", enumerate(fields))
+
+# documents are numbered in the order they were indexed, which lunr uses to order postings
+doc_ids = {d['id']: i for i, d in enumerate(docs)}
+con.executemany("INSERT INTO docs VALUES (?, ?)", ((i, ref) for ref, i in doc_ids.items()))
+con.executemany(
+    "INSERT INTO terms VALUES (?, ?, ?, ?)",
+    ((posting['_index'], term, len(term), _charmask(term)) for term, posting in idx.inverted_index.items())
+)
+field_ids = {field: i for i, field in enumerate(fields)}
+postings = []
+for field_ref, vector in idx.field_vectors.items():
+    field, ref = field_ref.split('/', 1)
+    elements = vector.elements
+    for i in range(0, len(elements), 2):
+        postings.append((elements[i], field_ids[field], doc_ids[ref], elements[i + 1]))
+con.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+con.commit()
+con.execute("VACUUM")
+con.close()
+print(f"Wrote {idxpath} with {len(docs)} documents, {len(idx.inverted_index)} terms, {len(postings)} postings")
 
-with open(idxpath) as f:
-    idx = Index.load(json.load(f))
+# check that we stem and match like lunr, which search.py doesn't import
+words = {w.lower() for d in docs for field in fields for w in re.split(r'[\s\-]+', d[field]) if w}
+unstemmed = [w for w in words if stem(w) != porter_stemmer.stem(w)]
+assert not unstemmed, f"stemmer mismatch for {unstemmed[:10]}"
+sidx = SearchIndex(idxpath)
+queries = [
+    'altitude', 'alti*', '+kind:EVENTS alti*', 'alti~1', 'altitdue~2',
+    'kohlsman setting', '-kind:UNITS feet', 'flaps^10 handle',
+]
+for q in queries:
+    expected = [(r['ref'], round(r['score'], 6)) for r in idx.search(q)]
+    actual = [(r['ref'], round(r['score'], 6)) for r in sidx.search(q)]
+    assert sorted(expected) == sorted(actual), f"search mismatch for {q!r}"
+    assert [s for _, s in expected] == [s for _, s in actual], f"ranking mismatch for {q!r}"
 
-results = idx.search('+kind:EVENTS alti*')[:5]
-print(results)
-for r in results:
+for r in sidx.search('+kind:EVENTS alti*')[:5]:
     kind, key = r['ref'].split('_', 1)
     print(kind, key, scvars[kind][key].get('description'))
@@ -1,5 +1,40 @@
 from .scdefs import *
-from .sc import SimConnect, RECV_P
-from .receiver import Receiver, ReceiverInstance
-from .datadef import SimData, SimDataHandler , DataDefinition
-from .scvars import SIMVARS, EVENTS, UNITS, DIMENSIONS
+
+
+# everything beyond the SDK definitions is imported on first use,
+# so that simconnect.search and the CLI don't pay for the client,
+# and asyncio in particular is slow to import
+_core = dict(
+    SimConnect='sc', RECV_P='receiver',
+    Receiver='receiver', ReceiverInstance='receiver', ReceiverTable='receiver',
+    SimData='datadef', SimDataHandler='datadef', DataDefinition='datadef',
+    DefinitionRegistry='datadef', Subscription='datadef', Setter='datadef',
+    SIMVARS='scvars', EVENTS='scvars', UNITS='scvars', DIMENSIONS='scvars',
+)
+_lazy = dict(
+    _core,
+    AsyncSimConnect='asyncsc', SystemState='asyncsc',
+    SimDataMux='mux', MuxSubscription='mux',
+    FlightRecorder='recorder', read_recording='recorder',
+    ObjectTable='objecttable',
+    History='history',
+    SimConnectEmulator='emulator',
+    PacketCapture='replay', PacketReplay='replay', read_capture='replay',
+    Metrics='metrics',
+)
+
+# `from simconnect import *` still provides the SDK definitions and the client
+__all__ = [name for name in globals() if not name.startswith('_')] + list(_core)
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f'.{_lazy[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
@@ -0,0 +1,182 @@
+"""
+The Porter stemmer exactly as used by lunr's search pipeline, so that search.py
+can stem query terms the same way as the indexed terms without importing lunr.
+This follows lunr.stemmer, itself the tartarus.org Python port of Martin Porter's algorithm,
+including its points of departure from the published algorithm:
+words of one or two letters are left alone, 'bli' becomes 'ble' and 'logi' becomes 'log'.
+"""
+
+# suffix replacements for steps 2 and 3 and suffixes removed by step 4,
+# keyed by the penultimate (steps 2 and 4) or last (step 3) letter, and tried in order
+_STEP2 = {
+    'a': [('ational', 'ate'), ('tional', 'tion')],
+    'c': [('enci', 'ence'), ('anci', 'ance')],
+    'e': [('izer', 'ize')],
+    'l': [('bli', 'ble'), ('alli', 'al'), ('entli', 'ent'), ('eli', 'e'), ('ousli', 'ous')],
+    'o': [('ization', 'ize'), ('ation', 'ate'), ('ator', 'ate')],
+    's': [('alism', 'al'), ('iveness', 'ive'), ('fulness', 'ful'), ('ousness', 'ous')],
+    't': [('aliti', 'al'), ('iviti', 'ive'), ('biliti', 'ble')],
+    'g': [('logi', 'log')],
+}
+_STEP3 = {
+    'e': [('icate', 'ic'), ('ative', ''), ('alize', 'al')],
+    'i': [('iciti', 'ic')],
+    'l': [('ical', 'ic'), ('ful', '')],
+    's': [('ness', '')],
+}
+_STEP4 = {
+    'a': ['al'],
+    'c': ['ance', 'ence'],
+    'e': ['er'],
+    'i': ['ic'],
+    'l': ['able', 'ible'],
+    'n': ['ant', 'ement', 'ment', 'ent'],
+    'o': ['ion', 'ou'],
+    's': ['ism'],
+    't': ['ate', 'iti'],
+    'u': ['ous'],
+    'v': ['ive'],
+    'z': ['ize'],
+}
+
+
+class _Stemmer:
+    """
+    Stem a single lower case word held in b, which the steps shorten by reducing k,
+    the index of its last letter, with j marking the end of the stem before a matched suffix
+    """
+    def __init__(self, word: str):
+        self.b = word
+        self.k = len(word) - 1
+        self.j = 0
+
+    def cons(self, i: int) -> bool:
+        """True if b[i] is a consonant"""
+        c = self.b[i]
+        if c in 'aeiou':
+            return False
+        if c == 'y':
+            return i == 0 or not self.cons(i - 1)
+        return True
+
+    def m(self) -> int:
+        """The number of vowel-consonant sequences in b[0..j]"""
+        n = 0
+        i = 0
+        while i <= self.j and self.cons(i):
+            i += 1
+        while True:
+            while i <= self.j and not self.cons(i):
+                i += 1
+            if i > self.j:
+                return n
+            while i <= self.j and self.cons(i):
+                i += 1
+            n += 1
+            if i > self.j:
+                return n
+
+    def vowelinstem(self) -> bool:
+        return any(not self.cons(i) for i in range(self.j + 1))
+
+    def doublec(self, j: int) -> bool:
+        return j >= 1 and self.b[j] == self.b[j - 1] and self.cons(j)
+
+    def cvc(self, i: int) -> bool:
+        """True if b[i-2..i] is consonant-vowel-consonant and b[i] isn't w, x or y, e.g. cav(e) but not snow"""
+        if i < 2 or not self.cons(i) or self.cons(i - 1) or not self.cons(i - 2):
+            return False
+        return self.b[i] not in 'wxy'
+
+    def ends(self, s: str) -> bool:
+        """True if b[0..k] ends with s, setting j to the end of the remaining stem"""
+        n = len(s)
+        if s[-1] != self.b[self.k] or n > self.k + 1 or self.b[self.k - n + 1:self.k + 1] != s:
+            return False
+        self.j = self.k - n
+        return True
+
+    def setto(self, s: str):
+        """Replace b[j+1..k] with s"""
+        n = len(s)
+        self.b = self.b[:self.j + 1] + s + self.b[self.j + n + 1:]
+        self.k = self.j + n
+
+    def r(self, s: str):
+        if self.m() > 0:
+            self.setto(s)
+
+    def step1ab(self):
+        """Remove plurals and -ed or -ing, e.g. caresses -> caress, agreed -> agree, matting -> mat"""
+        if self.b[self.k] == 's':
+            if self.ends('sses'):
+                self.k -= 2
+            elif self.ends('ies'):
+                self.setto('i')
+            elif self.b[self.k - 1] != 's':
+                self.k -= 1
+        if self.ends('eed'):
+            if self.m() > 0:
+                self.k -= 1
+        elif (self.ends('ed') or self.ends('ing')) and self.vowelinstem():
+            self.k = self.j
+            if self.ends('at'):
+                self.setto('ate')
+            elif self.ends('bl'):
+                self.setto('ble')
+            elif self.ends('iz'):
+                self.setto('ize')
+            elif self.doublec(self.k):
+                if self.b[self.k - 1] not in 'lsz':
+                    self.k -= 1
+            elif self.m() == 1 and self.cvc(self.k):
+                self.setto('e')
+
+    def step1c(self):
+        """Turn a terminal y to i when there is another vowel in the stem"""
+        if self.ends('y') and self.vowelinstem():
+            self.b = self.b[:self.k] + 'i' + self.b[self.k + 1:]
+
+    def replace_suffix(self, rules):
+        for suffix, replacement in rules:
+            if self.ends(suffix):
+                self.r(replacement)
+                return
+
+    def step4(self):
+        """Remove -ant, -ence etc. from stems with at least two vowel-consonant sequences"""
+        for suffix in _STEP4.get(self.b[self.k - 1], []):
+            if self.ends(suffix):
+                if suffix == 'ion' and self.b[self.j] not in 'st':
+                    continue
+                break
+        else:
+            return
+        if self.m() > 1:
+            self.k = self.j
+
+    def step5(self):
+        """Remove a final -e and change -ll to -l in longer stems"""
+        self.j = self.k
+        if self.b[self.k] == 'e':
+            a = self.m()
+            if a > 1 or (a == 1 and not self.cvc(self.k - 1)):
+                self.k -= 1
+        if self.b[self.k] == 'l' and self.doublec(self.k) and self.m() > 1:
+            self.k -= 1
+
+    def stem(self) -> str:
+        if self.k <= 1:
+            return self.b
+        self.step1ab()
+        self.step1c()
+        self.replace_suffix(_STEP2.get(self.b[self.k - 1], []))
+        self.replace_suffix(_STEP3.get(self.b[self.k], []))
+        self.step4()
+        self.step5()
+        return self.b[:self.k + 1]
+
+
+def stem(word: str) -> str:
+    """Stem a lower case word, e.g. stem('altitudes') == 'altitud'"""
+    return _Stemmer(word).stem()
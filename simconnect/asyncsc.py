@@ -0,0 +1,147 @@
+from typing import Any, AsyncIterator, NamedTuple, Optional
+import asyncio
+import logging
+from .scdefs import (
+    RECV_SYSTEM_STATE, PERIOD_SECOND,
+    DATA_REQUEST_FLAG_CHANGED, DATA_REQUEST_FLAG_TAGGED,
+)
+from .sc import SimConnect
+from .datadef import SimVarsSpec, SimData
+from .changedict import ChangeDict
+
+
+class SystemState(NamedTuple):
+    """The payload of a RECV_SYSTEM_STATE response, see RequestSystemState"""
+    integer: int
+    float: float
+    string: str
+
+
+class AsyncSimConnect:
+    """
+    An asyncio wrapper for a SimConnect connection.
+    A single pump task on the event loop polls the SDK via CallDispatch,
+    which never blocks, so any number of coroutines can share one connection.
+    Use as an async context manager, e.g.
+
+        async with AsyncSimConnect(name='aio') as asc:
+            altitude = await asc.get_simdatum("Indicated Altitude")
+
+    Other attributes, including the low-level SDK functions,
+    are delegated to the underlying SimConnect object, available as asc.sc
+    """
+    def __init__(
+            self,
+            name='pySimConnect',
+            sc: Optional[SimConnect] = None,
+            poll_interval_seconds=0.01,
+            **kwargs):
+        self.sc = sc or SimConnect(name=name, **kwargs)
+        self.poll_interval_seconds = poll_interval_seconds
+        self._pump_task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.close()
+
+    def __getattr__(self, k):
+        if k == 'sc':
+            # not yet initialized
+            raise AttributeError
+        return getattr(self.sc, k)
+
+    def start(self):
+        """Start pumping SDK messages on the running event loop"""
+        if not self._pump_task:
+            self._pump_task = asyncio.get_running_loop().create_task(self._pump())
+
+    async def close(self):
+        """Stop the pump task and close the underlying connection"""
+        if self._pump_task:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
+        self.sc.Close()
+
+    async def _pump(self):
+        while True:
+            try:
+                received = self.sc.dispatch()
+            except Exception:
+                logging.exception("AsyncSimConnect: dispatch failed")
+                received = 0
+            # yield to other tasks, pausing only when the queue was empty
+            await asyncio.sleep(0 if received else self.poll_interval_seconds)
+
+    async def get_simdatum(self, name, units=None, timeout_seconds=1) -> Any:
+        """get a one-off value of a single simvar variable, see also subscribe_simdata"""
+        simdata = await self.get_simdata([dict(name=name, units=units)], timeout_seconds)
+        return list(simdata.values())[0] if simdata else None
+
+    async def get_simdata(self, simvars: SimVarsSpec, timeout_seconds=1) -> SimData:
+        """
+        get a snapshot of one or more simvars, waiting up to timeout_seconds for a response.
+        Many concurrent calls can be outstanding on the same connection.
+        """
+        self.start()
+        try:
+            return await asyncio.wrap_future(self.sc.request_simdata(simvars, timeout_seconds or 1))
+        except TimeoutError:
+            return ChangeDict()
+
+    async def RequestSystemState(self, state: str, timeout_seconds=1) -> Optional[SystemState]:
+        """
+        Request a system state like "Sim" or "AircraftLoaded",
+        returning the result, or None if there's no response within timeout_seconds
+        """
+        self.start()
+        fut = asyncio.get_running_loop().create_future()
+
+        def _receiver(recv: RECV_SYSTEM_STATE) -> bool:
+            # copy the result since the SDK owns the recv buffer
+            if not fut.done():
+                fut.set_result(SystemState(recv.dwInteger, recv.fFloat, recv.szString.decode('utf-8')))
+            return True
+
+        req_id = next(self.sc._reqid_iter)
+        r = self.sc.add_receiver(RECV_SYSTEM_STATE, _receiver, req_id)
+        try:
+            self.sc.RequestSystemState(req_id, state)
+            return await asyncio.wait_for(fut, timeout_seconds)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.sc.remove_receiver(r)
+
+    async def subscribe_simdata(
+            self, simvars: SimVarsSpec,
+            period=PERIOD_SECOND,
+            skip_periods=0,
+            interval=1,
+            repeat_count=0,
+            flags=DATA_REQUEST_FLAG_CHANGED | DATA_REQUEST_FLAG_TAGGED,
+            maxsize=0,
+            ) -> AsyncIterator[SimData]:
+        """
+        Subscribe to a data definition, yielding a copy of the latest SimData on each update.
+        With maxsize > 0 at most maxsize updates are queued for a slow consumer,
+        discarding the oldest first.  The subscription stops when the iterator is closed,
+        e.g. with `await it.aclose()` or by iterating inside `contextlib.aclosing(...)`.
+        """
+        self.start()
+        queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+        def _enqueue(simdata: SimData):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(dict(simdata))
+
+        with self.sc.subscribe_simdata(simvars, period, skip_periods, interval, repeat_count, flags, _enqueue):
+            while True:
+                yield await queue.get()
@@ -1,7 +1,7 @@
 from collections import OrderedDict
 from time import time
 import math
-from typing import Callable, Any
+from typing import Any, Callable, Dict, Optional, Tuple
 from itertools import takewhile
 
 
@@ -20,53 +20,129 @@ def equal_or_close(rel_tol=1e-6, abs_tol=1e-6) -> Callable[[Any, Any], bool]:
     return comparator
 
 
+def within(epsilon: float) -> Callable[[Any, Any], bool]:
+    """Return a function that decides if a and b differ by at most epsilon, like the sim's change detection"""
+    def comparator(a, b) -> bool:
+        return abs(a - b) <= epsilon
+    return comparator
+
+
 class ChangeDict(OrderedDict):
-    """An ordered dict that records timestamp of changed items"""
-    def __init__(self, default_comparator=equal_or_close(), comparators={}):
+    """
+    An ordered dict that records when items changed, with the most recently changed last.
+    Each change increments the dict's version, so changedsince_version(version) or snapshot_diff(token)
+    return exactly the items changed after that version, even for changes in the same millisecond.
+    Unless track_times=False, the times attribute also maps each key to its last change in epoch ms,
+    for latest() and changedsince(millis).
+    """
+    def __init__(self, default_comparator=equal_or_close(), comparators={}, track_times=True):
+        super().__init__()
         self.__default_comparator = default_comparator
         self.__comparators = comparators
-        self.__times = {}
+        self.__versions: Dict[Any, int] = {}
+        self.version = 0
+        self.times: Optional[Dict[Any, int]] = {} if track_times else None
 
     def __setitem__(self, k, v):
         if k in self:
-            vv = self[k]
             eq = self.__comparators.get(k, self.__default_comparator)
-            if eq(v, vv):
+            if eq(v, self[k]):
                 return
-        super().__setitem__(k, v)
-        self.move_to_end(k)
-        self.__times[k] = now()
+            super().__setitem__(k, v)
+            self.move_to_end(k)
+        else:
+            # new keys are already last
+            super().__setitem__(k, v)
+        self.version += 1
+        self.__versions[k] = self.version
+        if self.times is not None:
+            self.times[k] = now()
+
+    def __delitem__(self, k):
+        super().__delitem__(k)
+        self.__forget(k)
+
+    # OrderedDict's own pop, popitem and clear bypass __delitem__
+
+    def pop(self, k, *default):
+        if k not in self:
+            return super().pop(k, *default)
+        v = super().pop(k)
+        self.__forget(k)
+        return v
+
+    def popitem(self, last=True):
+        k, v = super().popitem(last)
+        self.__forget(k)
+        return k, v
+
+    def clear(self):
+        super().clear()
+        self.__versions.clear()
+        if self.times is not None:
+            self.times.clear()
+
+    def __forget(self, k):
+        del self.__versions[k]
+        if self.times is not None:
+            del self.times[k]
 
-    def __delitem__(self, k, v):
-        super().__delitem__(k, v)
-        del self.__times[k]
+    def versionof(self, k) -> int:
+        """The version when k last changed, or 0 if it's missing"""
+        return self.__versions.get(k, 0)
 
-    def latest(self):
-        if not self.__times:
+    def latest(self) -> int:
+        """The time of the most recent change in epoch ms, or 0 if none"""
+        times = self.__require_times('latest')
+        if not times:
             return 0
-        k = next(reversed(self))
-        return self.__times[k]
+        return times[next(reversed(self))]
 
-    def changedsince(self, millis):
+    def changedsince(self, millis: int) -> Dict[Any, Any]:
+        """The items changed after a time in epoch ms, most recent first, see also snapshot_diff"""
+        times = self.__require_times('changedsince')
         return dict(
             takewhile(
-                lambda kv: self.__times[kv[0]] > millis,
+                lambda kv: times[kv[0]] > millis,
                 reversed(self.items())
             )
         )
 
+    def changedsince_version(self, version: int) -> Dict[Any, Any]:
+        """The items changed after version, most recent first"""
+        versions = self.__versions
+        return dict(
+            takewhile(
+                lambda kv: versions[kv[0]] > version,
+                reversed(self.items())
+            )
+        )
 
-if __name__ == '__main__':
-    from time import sleep
+    def snapshot_diff(self, token: int = 0) -> Tuple[Dict[Any, Any], int]:
+        """
+        Return the items changed since the snapshot identified by token (default all items)
+        along with a new token for the next diff, e.g.
+
+            changes, token = d.snapshot_diff()
+            ...
+            changes, token = d.snapshot_diff(token)
+        """
+        return self.changedsince_version(token), self.version
+
+    def __require_times(self, method: str) -> Dict[Any, int]:
+        if self.times is None:
+            raise ValueError(f"ChangeDict: {method} requires track_times, see snapshot_diff")
+        return self.times
 
-    t = now()
-    d = ChangeDict(comparators=dict(froz=lambda a, b: abs(a-b) < 8))
+
+if __name__ == '__main__':
+    d = ChangeDict(comparators=dict(froz=lambda a, b: abs(a-b) < 8), track_times=True)
     d.update(a=1, b=2, z='zzz', froz=1024)
-    print(d.changedsince(0), d.latest())
-    sleep(1)
+    changes, token = d.snapshot_diff()
+    print(changes, token, d.latest())
     d.update(a=1, b=3, c=3, froz=1031)
-    print(d.changedsince(t), d.latest())
-    sleep(1)
+    changes, token = d.snapshot_diff(token)
+    print(changes, token)
     d.update(a=4, froz=1033)
-    print(d.changedsince(t+1500), d.latest())
+    print(d.changedsince_version(token), d.versionof('a'), d.version)
     print(d)
@@ -4,8 +4,10 @@ import json
 from typing import List, Optional
 from textwrap import fill
 from enum import Enum
-from lunr.index import Index
-from simconnect import SimConnect
+from bisect import bisect_left
+import heapq
+from .scvars import SIMVARS, EVENTS, UNITS, DIMENSIONS
+from .search import SearchIndex
 import os
 import re
 
@@ -13,11 +15,8 @@ import re
 app = typer.Typer()
 
 thisdir = os.path.dirname(__file__)
-with open(os.path.join(thisdir, 'scvars.json')) as f:
-    scvars = json.load(f)
-for k in ['EVENTS', 'VARIABLES', 'UNITS']:
-    for d in scvars[k].values():
-        d['name_'] = d['name' if k != 'UNITS' else 'name_std'].replace(' ', '_')
+scvarsidx = SearchIndex(os.path.join(thisdir, 'scvars_idx.db'))
+scvars = dict(VARIABLES=SIMVARS, EVENTS=EVENTS, UNITS=UNITS, DIMENSIONS=DIMENSIONS)
 
 
 class MetadataKind(str, Enum):
@@ -49,16 +48,52 @@ def matchcase(s: str, prefix: str) -> Optional[str]:
         return prefix + (tail.upper() if prefix[-1].isupper() else tail.lower())
 
 
+class PrefixIndex:
+    """
+    Case-insensitive prefix lookup over a list of names, built once and reused on each TAB.
+    Names are sorted by their uppercase form so matches for a prefix are a contiguous range,
+    and also by length so short prefixes with many matches can stop after the shortest few.
+    """
+    # ranges wider than this are scanned in length order instead
+    _max_range = 256
+
+    def __init__(self, names: List[str]):
+        self.names = sorted(names, key=str.upper)
+        self.keys = [name.upper() for name in self.names]
+        self.by_length = sorted(zip(self.keys, self.names), key=lambda kn: len(kn[0]))
+
+    def complete(self, prefix: str, max_results=10) -> List[str]:
+        """Return up to max_results names matching prefix, shortest first, with matchcase applied"""
+        key = prefix.upper()
+        lo = bisect_left(self.keys, key)
+        hi = bisect_left(self.keys, key + '\U0010ffff', lo)
+        if hi - lo <= self._max_range:
+            candidates = self.names[lo:hi]
+        else:
+            # collect matches by increasing length until we have enough, plus any ties in length
+            candidates = []
+            for k, name in self.by_length:
+                if len(candidates) >= max_results and len(k) > len(candidates[-1]):
+                    break
+                if k.startswith(key):
+                    candidates.append(name)
+        matches = [matchcase(name, prefix) for name in candidates]
+        return heapq.nsmallest(max_results, matches, key=lambda s: (len(s), s))
+
+
 def scoped_autocomplete(kind: str, max_results=10):
+    index: Optional[PrefixIndex] = None
+
     def _complete(incomplete: str):
-        return sorted(
-            list(filter(None, (matchcase(d['name_'], incomplete) for d in scvars[kind].values()))),
-            key=lambda s: (len(s), s)
-        )[:max_results]
+        nonlocal index
+        if index is None:
+            index = PrefixIndex([name.replace(' ', '_') for name in scvars[kind].names() if name])
+        return index.complete(incomplete, max_results)
     return _complete
 
 
 simvardef = typer.Argument(..., autocompletion=scoped_autocomplete('VARIABLES'))
+optsimvardef = typer.Argument(None, autocompletion=scoped_autocomplete('VARIABLES'))
 eventdef = typer.Argument(..., autocompletion=scoped_autocomplete('EVENTS'))
 unitsdef = typer.Option(None, autocompletion=scoped_autocomplete('UNITS'))
 
@@ -68,21 +103,45 @@ def canonicalvars(simvars: List[str]) -> List[str]:
     return [s.upper().replace('_', ' ') for s in simvars]
 
 
+def readvars(f: typer.FileText) -> List[str]:
+    # one simvar per line, ignoring blank lines and # comments
+    lines = (line.split('#', 1)[0].strip() for line in f)
+    return [line for line in lines if line]
+
+
+def connect():
+    # only import the client for commands which talk to the sim, so search etc start quickly
+    from .sc import SimConnect
+    return SimConnect(name='cli')
+
+
 @app.command()
-def get(simvars: List[str] = simvardef, units: Optional[str] = unitsdef):
-    simvars = canonicalvars(simvars)
+def get(
+        simvars: Optional[List[str]] = optsimvardef,
+        units: Optional[str] = unitsdef,
+        file: Optional[typer.FileText] = typer.Option(
+            None, '--file', '-f', help="Read simvars one per line from a file, or - for stdin"),
+        as_json: bool = typer.Option(False, '--json', help="Show the results as a JSON object")):
+    simvars = canonicalvars(list(simvars or []) + (readvars(file) if file else []))
+    if not simvars:
+        typer.echo("Specify one or more simvars, or --file", err=True)
+        raise typer.Exit(1)
+    # fetch all the variables with a single request
+    with connect() as sc:
+        simdata = sc.get_simdata([dict(name=s, units=units) for s in simvars])
+    if as_json:
+        typer.echo(json.dumps({s: simdata.get(s) for s in simvars}, indent=2))
+        return
     unitdesc = f" ({units})" if units else ''
     for s in simvars:
-        with SimConnect(name='cli') as sc:
-            v = sc.get_simdatum(s.replace('_,', ' '), units)
-        typer.echo(f"{s}{unitdesc} = {v}")
+        typer.echo(f"{s}{unitdesc} = {simdata.get(s)}")
 
 
 @app.command()
 def watch(simvars: List[str] = simvardef, units: Optional[str] = unitsdef, interval: Optional[int] = 1):
     simvars = canonicalvars(simvars)
     typer.echo(f"Watching {', '.join(simvars)} every {interval} seconds")
-    with SimConnect(name='cli') as sc:
+    with connect() as sc:
         dd = sc.subscribe_simdata(
             [dict(name=sv, units=units) for sv in simvars],
             interval=interval
@@ -99,8 +158,7 @@ def watch(simvars: List[str] = simvardef, units: Optional[str] = unitsdef, inter
                 typer.echo(''.join(labelfmt(headings[i]) for i in range(0, len(headings), 2)))
                 # odd cols
                 typer.echo(' '*12 + ''.join(labelfmt(headings[i]) for i in range(1, len(headings), 2)))
-            changed = list(dd.simdata.changedsince(latest).keys())
-            latest = dd.simdata.latest()
+            changed, latest = dd.simdata.snapshot_diff(latest)
             values = [
                 typer.style(
                     floatfmt(dd.simdata[k]),
@@ -115,7 +173,7 @@ def watch(simvars: List[str] = simvardef, units: Optional[str] = unitsdef, inter
 def set(simvar: str = simvardef, value: float = typer.Argument(...), units: Optional[str] = unitsdef):
     simvar = canonicalvars([simvar])[0]
     typer.echo(f"Setting {simvar} = {value}" + (f" ({units})" if units else ''))
-    with SimConnect(name='cli') as sc:
+    with connect() as sc:
         sc.set_simdatum(simvar, value, units)
 
 
@@ -123,7 +181,7 @@ def set(simvar: str = simvardef, value: float = typer.Argument(...), units: Opti
 def send(event: str = eventdef, value: Optional[float] = None):
     event = event.upper()
     typer.echo(f"Sending {event}({value})")
-    with SimConnect(name='cli') as sc:
+    with connect() as sc:
         sc.send_event(event, value or 0)
 
 
@@ -133,9 +191,6 @@ def search(name: List[str], kind: Optional[MetadataKind] = None, max_results: in
     if kind:
         q += f" +kind:{kind.name.upper()}S"
 
-    with open(os.path.join(thisdir, 'scvars_idx.json')) as f:
-        scvarsidx = Index.load(json.load(f))
-
     styles = dict(
         # in mac terminal some double-width emoji need a trailing space to display correctly
         # but this seems fine on windows terminal
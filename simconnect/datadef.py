@@ -1,18 +1,28 @@
-from typing import List, Sequence, Union, Dict, Any, Callable, Optional, Type, TYPE_CHECKING
+from typing import List, Sequence, Union, Dict, Any, Callable, Optional, Tuple, Type, TYPE_CHECKING
+from collections import OrderedDict
+from heapq import heappush, heappop
 import logging
+import re
 import json
 from hashlib import sha1
-from ctypes import cast, byref, sizeof, POINTER, c_float, c_double, c_longlong, c_char
+from struct import Struct, calcsize
+from time import perf_counter
+from operator import eq
+from ctypes import addressof, sizeof, cast, byref, c_void_p, c_float, c_double, c_longlong, c_char, Structure
 
 from .scvars import validate_simvar, validate_units, validate_event, type_for_unit
 from .scdefs import (
-    Struct1, RECV_SIMOBJECT_DATA, DATA_REQUEST_FLAG_TAGGED,
+    Struct1, RECV_SIMOBJECT_DATA, DATA_REQUEST_FLAG_TAGGED, OBJECT_ID_USER, PERIOD_NEVER,
     DATATYPE_INT32, DATATYPE_INT64, DATATYPE_FLOAT32, DATATYPE_FLOAT64,
-    DATATYPE_STRING256, DWORD
+    DATATYPE_STRING256, DATATYPE_INITPOSITION, DATATYPE_MARKERSTATE, DATATYPE_WAYPOINT,
+    DATATYPE_LATLONALT, DATATYPE_XYZ, DWORD,
+    DATA_INITPOSITION, DATA_MARKERSTATE, DATA_WAYPOINT, DATA_LATLONALT, DATA_XYZ
 )
-from .changedict import ChangeDict
+from .changedict import ChangeDict, within
 if TYPE_CHECKING:
     from .sc import SimConnect
+    from .history import History
+    from .receiver import ReceiverInstance
 
 
 EPSILON_DEFAULT = 1e-4
@@ -44,6 +54,10 @@ SimData = Dict[str, Any]
 SimDataHandler = Callable[[SimData], None]
 SimVarSpec = Union[str, Dict[str, Any]]
 SimVarsSpec = Union[SimVarSpec, Sequence[SimVarSpec]]
+# decoded data is a list of (index into DataDefinition.defs, value) pairs
+Decoded = List[Tuple[int, Any]]
+Decoder = Callable[[memoryview, int, int], Decoded]
+DecodedHandler = Callable[[Decoded], None]
 
 
 def _norm_simvars(simvars: SimVarsSpec) -> Sequence[Dict[str, Any]]:
@@ -52,99 +66,480 @@ def _norm_simvars(simvars: SimVarsSpec) -> Sequence[Dict[str, Any]]:
     return [dict(name=d) if isinstance(d, str) else d for d in ds]
 
 
-class DataDefinition:
-    _instances: Dict[str, 'DataDefinition'] = {}
+def _validate_simvars(simvars: SimVarsSpec, settable=False) -> List[Dict[str, Any]]:
+    """validate simvars, returning a list of field defs with name, units, dtyp and epsilon"""
+    defs: List[Dict[str, Any]] = []
+    for d in _norm_simvars(simvars):
+        name = d['name']
+        sv = validate_simvar(name, settable)
+        units = validate_units(name, d.get('units'), sv)
+        dtyp = d.get('type') or type_for_unit(units)
+        # see https://forums.flightsimulator.com/t/how-to-read-simvar-of-type-string/502402
+        if dtyp == DATATYPE_STRING256: units = ''
+        epsilon = d.get('epsilon', EPSILON_DEFAULT if dtyp == DATATYPE_FLOAT64 else 0)
+        defs.append(dict(name=name, units=units, dtyp=dtyp, epsilon=epsilon))
+    return defs
+
+
+def _comparator(d: Dict[str, Any]) -> Callable[[Any, Any], bool]:
+    """
+    decide whether a new value for field def d is unchanged: floats within the epsilon
+    registered with the sim, so both sides agree on what's a change, otherwise exactly equal
+    """
+    if d['dtyp'] in (DATATYPE_FLOAT32, DATATYPE_FLOAT64) and d['epsilon']:
+        return within(d['epsilon'])
+    return eq
+
+
+def _changedict(defs: List[Dict[str, Any]]) -> ChangeDict:
+    """an empty ChangeDict with comparators for each field def"""
+    return ChangeDict(default_comparator=eq, comparators={d['name']: _comparator(d) for d in defs})
+
+
+def _spec_key(simvars: SimVarsSpec, settable: bool) -> Optional[tuple]:
+    """
+    A hashable key for the fields of a raw simvars spec, ignoring values (see set_simdata),
+    or None if some field isn't hashable
+    """
+    ds = simvars if isinstance(simvars, (list, tuple)) else [simvars]
+    key: List[Any] = [settable]
+    for d in ds:
+        if isinstance(d, str):
+            key.append(d)
+        else:
+            key.append((d['name'], d.get('units'), d.get('type'), d.get('epsilon', _no_epsilon)))
+    try:
+        hash(tuple(key))
+    except TypeError:
+        return None
+    return tuple(key)
+
+
+_no_epsilon = object()
 
+
+class DataDefinition:
     @classmethod
     def create(kls, sc: 'SimConnect', simvars: SimVarsSpec, settable=False) -> 'DataDefinition':
-        """create or retrieve a data definition for the specified variables"""
-        defs: List[Dict[str, Any]] = []
-        svs = _norm_simvars(simvars)
-        for d in svs:
-            name = d['name']
-            sv = validate_simvar(name, settable)
-            units = validate_units(name, d.get('units'), sv)
-            dtyp = d.get('type') or type_for_unit(units)
-            # see https://forums.flightsimulator.com/t/how-to-read-simvar-of-type-string/502402
-            if dtyp == DATATYPE_STRING256: units = ''
-            epsilon = d.get('epsilon', EPSILON_DEFAULT if dtyp == DATATYPE_FLOAT64 else 0)
-            defs.append(dict(name=name, units=units, dtyp=dtyp, epsilon=epsilon))
+        """create or retrieve a data definition for the specified variables, see DefinitionRegistry"""
+        return sc.definitions.create(simvars, settable)
 
-        # if we already have this data definition, re-use it
-        key = sha1(json.dumps(defs, sort_keys=True).encode('utf-8')).hexdigest()
-        if key not in kls._instances:
-            kls._instances[key] = kls(sc, len(kls._instances), defs)
-        return kls._instances[key]
+    @classmethod
+    def from_defs(kls, sc: 'SimConnect', defs: List[Dict[str, Any]]) -> 'DataDefinition':
+        """create or retrieve a data definition for already validated field defs, see _validate_simvars"""
+        return sc.definitions.from_defs(defs)
 
     def __init__(self, sc: 'SimConnect', def_id: int, defs: List[Dict[str, Any]]):
         self.id = def_id
-        self.simdata: SimData = ChangeDict()
+        self._key: Optional[str] = None
+        # number of active subscriptions and requests using this definition
+        self._refs = 0
+        self.simdata: SimData = _changedict(defs)
         self._struct: Optional[Type[Struct1]] = None
         self.defs = defs
+        self._names = [d['name'] for d in defs]
+        self._has_strings = any(d['dtyp'] == DATATYPE_STRING256 for d in defs)
+        # compile decoders for the untagged and tagged payload layouts up front
+        self._decoders = (_compile_decoder(defs, tagged=False), _compile_decoder(defs, tagged=True))
+        self._register(sc)
+
+    def _register(self, sc: 'SimConnect'):
         for i, d in enumerate(self.defs):
             sc.AddToDataDefinition(self.id, d['name'], d['units'], d['dtyp'], d['epsilon'], i)
 
     def get_units(self) -> Dict[str, str]:
         return {d['name']: d['units'] for d in self.defs}
 
-    def add_receiver(self, sc: 'SimConnect', req_id: int, callback: Optional[SimDataHandler] = None):
-        """Create a receiver for this DataDefinition, given req_id and optional callback"""
-        def _receiver(recv: RECV_SIMOBJECT_DATA) -> bool:
-            if recv.dwRequestID != req_id:
-                return False
+    def clear(self, sc: 'SimConnect'):
+        """Clear this definition in the sim, so that a later create makes a new one"""
+        sc.definitions.clear(self)
+
+    def decode(self, recv: RECV_SIMOBJECT_DATA) -> Decoded:
+        """Decode the data values in a RECV_SIMOBJECT_DATA packet as a list of (index, value) pairs"""
+        # dwData is a placeholder for where the data values start,
+        # so view the whole packet as a buffer and unpack from that offset
+        buf = memoryview((c_char * recv.dwSize).from_address(addressof(recv)))
+        tagged = recv.dwFlags & DATA_REQUEST_FLAG_TAGGED > 0
+        return self._decoders[tagged](buf, _data_offset, recv.dwDefineCount)
+
+    def decode_simdata(self, recv: RECV_SIMOBJECT_DATA) -> SimData:
+        """Decode a RECV_SIMOBJECT_DATA packet as new SimData, independent of self.simdata"""
+        simdata: SimData = _changedict(self.defs)
+        names = self._names
+        for idx, val in self.decode(recv):
+            simdata[names[idx]] = val
+        return simdata
+
+    def _metric_names(self) -> Tuple[str, str]:
+        """
+        Names for the decode and callback histograms, which can't use the id since the registry reuses them,
+        so use the first field, the number of others and a short hash of them all,
+        e.g. 'decode.PLANE ALTITUDE+2#1a2b3c4d'
+        """
+        key = self._key or sha1(json.dumps(self.defs, sort_keys=True).encode('utf-8')).hexdigest()
+        others = f'+{len(self._names) - 1}' if len(self._names) > 1 else ''
+        label = f'{self._names[0]}{others}#{key[:8]}'
+        return f'decode.{label}', f'callback.{label}'
 
+    def add_receiver(
+            self, sc: 'SimConnect', req_id: int, callback: Optional[SimDataHandler] = None,
+            listeners: Optional[List[DecodedHandler]] = None, visible: Optional[int] = None) -> 'ReceiverInstance':
+        """
+        Create a receiver for this DataDefinition, given req_id and optional callback.
+        Any listeners are also called with the decoded (index, value) pairs from each packet,
+        and can be added or removed later by mutating the list.
+        With visible=n, only the first n fields are copied to simdata, and the callback
+        is only called when one of them changes; the rest are only seen by listeners,
+        like the timestamp subscribe_simdata adds for history.
+        """
+        names = self._names
+        hidden = visible is not None and visible < len(names)
+        listeners = listeners if listeners is not None else []
+        # with metrics enabled, time the decode and the callbacks separately
+        metrics = getattr(sc, 'metrics', None)
+        decode_name, callback_name = self._metric_names()
+        decode_hist = metrics.histogram(decode_name) if metrics else None
+        callback_hist = metrics.histogram(callback_name) if metrics else None
+
+        # the connection only routes messages for req_id to this receiver
+        def _receiver(recv: RECV_SIMOBJECT_DATA) -> bool:
             logging.debug(f"DataDefinition[{self.id}]: Reading RECV_SIMOBJECT_DATA for request {req_id}")
-            # dwData is a placeholder for where the data values start
-            # so get a void* to that location and cast appropriately
-            offset = RECV_SIMOBJECT_DATA.dwData.offset
-            tagged = recv.dwFlags & DATA_REQUEST_FLAG_TAGGED > 0
-            idx = -1
-            for _ in range(recv.dwDefineCount):
-                if tagged:
-                    idx = cast(byref(recv, offset), POINTER(DWORD))[0]
-                    offset += sizeof(DWORD)
-                else:
-                    idx += 1
-                d = self.defs[idx]
-                ctyp = _dtyps[d['dtyp']]
-                ptr = cast(byref(recv, offset), POINTER(ctyp))
-                if ctyp == c_char:  # STRING256
-                    val = ptr[:256].rstrip(b'\x00').decode('ascii')
-                    offset += 256
-                else:
-                    val = ptr[0]
-                    offset += sizeof(ctyp)
-                self.simdata[d['name']] = val
-
-            if callback:
-                callback(self.simdata)
+            if decode_hist:
+                t0 = perf_counter()
+            simdata = self.simdata
+            decoded = self.decode(recv)
+            if hidden:
+                version = simdata.version
+                for idx, val in decoded:
+                    if idx < visible:   # type: ignore
+                        simdata[names[idx]] = val
+                changed = simdata.version != version
+            else:
+                for idx, val in decoded:
+                    simdata[names[idx]] = val
+                changed = True
+
+            if decode_hist:
+                t1 = perf_counter()
+                decode_hist.observe(t1 - t0)
+            for listener in listeners:
+                listener(decoded)
+            if callback and changed:
+                callback(simdata)
+            if callback_hist and (callback or listeners):
+                callback_hist.observe(perf_counter() - t1)
             return True
 
-        sc.add_receiver(RECV_SIMOBJECT_DATA, _receiver)
+        return sc.add_receiver(RECV_SIMOBJECT_DATA, _receiver, req_id)
 
-    def _pack_data(self, simdata: Dict[str, Any]) -> Struct1:
+    def _struct_type(self) -> Type[Struct1]:
+        """
+        The ctypes structure for one item of data for SetDataOnSimObject.
+        Fields are named for each simvar, with an identifier alias like PLANE_ALTITUDE
+        """
         if self._struct is None:
             class kls(Struct1):
-                _fields_ = [(d['name'], _dtyps[d['dtyp']]) for d in self.defs]
+                _fields_ = [(d['name'], _ctype(d['dtyp'])) for d in self.defs]
+            for d in self.defs:
+                alias = re.sub(r'\W', '_', d['name'])
+                if alias != d['name'] and not hasattr(kls, alias):
+                    setattr(kls, alias, getattr(kls, d['name']))
             self._struct = kls
+        return self._struct
+
+    def _pack_data(self, simdata: Dict[str, Any]) -> Struct1:
+        if self._has_strings:
+            simdata = {k: _encode(v) for k, v in simdata.items()}
+        return self._struct_type()(**simdata)
+
+    def _pack_array(self, records) -> Tuple[Any, int]:
+        """
+        Pack a sequence of records into one contiguous array of items for SetDataOnSimObject,
+        returning the array and the number of items.  Records are dicts keyed by simvar name,
+        or just the value when there's a single field, e.g. a dict of DATA_WAYPOINT fields,
+        or a numpy structured array whose fields match the simvars by name,
+        or for a single structured simvar, match the fields of its type, e.g. np.dtype(DATA_WAYPOINT)
+        """
+        kls = self._struct_type()
+        if getattr(getattr(records, 'dtype', None), 'names', None):
+            return self._pack_ndarray(records), len(records)
+        ctyps = {d['name']: _ctype(d['dtyp']) for d in self.defs}
+        name = self._names[0] if len(self._names) == 1 else None
+        items = []
+        for r in records:
+            if name is not None and not (isinstance(r, dict) and name in r):
+                r = {name: r}
+            items.append(kls(**{k: _field_value(ctyps[k], v) for k, v in r.items()}))
+        return (kls * len(items))(*items), len(items)
+
+    def _pack_ndarray(self, records):
+        import numpy as np
+        kls = self._struct_type()
+        formats = [
+            np.dtype('S256') if d['dtyp'] == DATATYPE_STRING256 else np.dtype(_ctype(d['dtyp']))
+            for d in self.defs
+        ]
+        dtype = np.dtype(dict(
+            names=self._names,
+            formats=formats,
+            offsets=[getattr(kls, name).offset for name in self._names],
+            itemsize=sizeof(kls),
+        ))
+        out = np.zeros(len(records), dtype=dtype)
+        src_names = records.dtype.names
+        ctyp = _ctype(self.defs[0]['dtyp'])
+        if len(self.defs) == 1 and issubclass(ctyp, Structure) and set(src_names) <= {f for f, *_ in ctyp._fields_}:
+            # each record is one item of a structured simvar like AI WAYPOINT LIST
+            column = out[self._names[0]]
+            for f in src_names:
+                column[f] = records[f]
+            return out
+        fields = {}
+        for name in self._names:
+            fields[name] = name
+            fields[re.sub(r'\W', '_', name)] = name
+        for src in src_names:
+            if src not in fields:
+                raise ValueError(f"DataDefinition: record field {src!r} doesn't match any of {self._names}")
+            out[fields[src]] = records[src]
+        return out
+
+
+class DefinitionRegistry:
+    """
+    The data definitions registered on one SimConnect connection, found by their fields.
+    Ids are recycled once a definition is cleared, and when more than max_definitions are live
+    the least recently used ones without active requests are cleared to make room.
+    Repeated raw simvar specs map straight to their definition without validating them again,
+    for up to spec_cache_size specs.
+    """
+    def __init__(self, sc: 'SimConnect', max_definitions=1000, spec_cache_size=256):
+        self.sc = sc
+        self.max_definitions = max_definitions
+        self.spec_cache_size = spec_cache_size
+        # live definitions keyed by a hash of their fields, in least to most recently used order
+        self._instances: OrderedDict[str, DataDefinition] = OrderedDict()
+        self._spec_cache: Dict[tuple, DataDefinition] = {}
+        self._free_ids: List[int] = []
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._instances)
+
+    def __contains__(self, dd: DataDefinition) -> bool:
+        return self._instances.get(dd._key) is dd   # type: ignore
+
+    def create(self, simvars: SimVarsSpec, settable=False) -> DataDefinition:
+        key = _spec_key(simvars, settable)
+        dd = self._spec_cache.get(key) if key is not None else None
+        if dd is not None and dd in self:
+            self._instances.move_to_end(dd._key)    # type: ignore
+            return dd
+        dd = self.from_defs(_validate_simvars(simvars, settable))
+        if key is not None:
+            if len(self._spec_cache) >= self.spec_cache_size:
+                # evict the oldest entry
+                del self._spec_cache[next(iter(self._spec_cache))]
+            self._spec_cache[key] = dd
+        return dd
+
+    def from_defs(self, defs: List[Dict[str, Any]]) -> DataDefinition:
+        # if we already have this data definition, re-use it
+        key = sha1(json.dumps(defs, sort_keys=True).encode('utf-8')).hexdigest()
+        dd = self._instances.get(key)
+        if dd is not None:
+            self._instances.move_to_end(key)
+            return dd
+        self._make_room()
+        dd = self._instances[key] = DataDefinition(self.sc, self._allocate_id(), defs)
+        dd._key = key
+        return dd
+
+    def activate(self, dd: DataDefinition) -> DataDefinition:
+        """
+        Mark a definition as recently used before making a request with it,
+        registering it again if it was cleared.  Returns the live definition with the same fields.
+        """
+        if dd in self:
+            self._instances.move_to_end(dd._key)    # type: ignore
+            return dd
+        live = self._instances.get(dd._key) if dd._key else None   # type: ignore
+        if live is not None:
+            return self.activate(live)
+        if dd._key is None:
+            return self.from_defs(dd.defs)
+        self._make_room()
+        dd.id = self._allocate_id()
+        dd._register(self.sc)
+        self._instances[dd._key] = dd
+        return dd
+
+    def clear(self, dd: DataDefinition):
+        """Clear a definition in the sim and recycle its id"""
+        if dd not in self:
+            return
+        self.sc.ClearDataDefinition(dd.id)
+        del self._instances[dd._key]    # type: ignore
+        heappush(self._free_ids, dd.id)
+        # so that services making many ad-hoc definitions don't grow the metrics without bound
+        metrics = getattr(self.sc, 'metrics', None)
+        if metrics:
+            metrics.discard(*dd._metric_names())
+
+    def clear_spec_cache(self):
+        """Forget cached specs, e.g. after changing SIMVARS or UNITS, so that create validates them again"""
+        self._spec_cache.clear()
+
+    def _allocate_id(self) -> int:
+        if self._free_ids:
+            return heappop(self._free_ids)
+        self._next_id += 1
+        return self._next_id - 1
 
-        return self._struct(**simdata)
+    def _make_room(self):
+        """Clear idle definitions, least recently used first, so there's room for another"""
+        if len(self._instances) < self.max_definitions:
+            return
+        for dd in list(self._instances.values()):
+            if not dd._refs:
+                self.clear(dd)
+                if len(self._instances) < self.max_definitions:
+                    return
+        logging.warning(f"DefinitionRegistry: all {len(self._instances)} definitions are in use")
+
+
+class Subscription:
+    """
+    A handle for a data request created by SimConnect.subscribe_simdata.
+    Call cancel() to stop the updates, or use the subscription as a context manager.
+    Other attributes like simdata and get_units() are delegated to the DataDefinition
+    """
+    def __init__(
+            self, sc: 'SimConnect', datadef: DataDefinition, req_id: int, receiver: 'ReceiverInstance',
+            listeners: List[DecodedHandler]):
+        self.sc = sc
+        self.datadef = datadef
+        self.req_id = req_id
+        self._receiver: Optional['ReceiverInstance'] = receiver
+        self._listeners = listeners
+        # with subscribe_simdata(history=...), a History of recent updates
+        self.history: Optional['History'] = None
+        datadef._refs += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.cancel()
+
+    def __getattr__(self, k):
+        if k == 'datadef':
+            # not yet initialized
+            raise AttributeError
+        return getattr(self.datadef, k)
+
+    @property
+    def active(self) -> bool:
+        return self._receiver is not None
+
+    def add_listener(self, listener: DecodedHandler):
+        """Call listener with the decoded (index, value) pairs from each update, indexing datadef.defs"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: DecodedHandler):
+        self._listeners.remove(listener)
+
+    def cancel(self, clear_definition=False) -> bool:
+        """
+        Stop the data request and remove its receiver, returning False if already cancelled.
+        With clear_definition, also clear the data definition in the sim
+        if no other subscription is using it.
+        """
+        if self._receiver is None:
+            return False
+        self.sc.RequestDataOnSimObject(self.req_id, self.datadef.id, OBJECT_ID_USER, PERIOD_NEVER, 0, 0, 0, 0)
+        self.sc.remove_receiver(self._receiver)
+        self._receiver = None
+        self.datadef._refs -= 1
+        if clear_definition and not self.datadef._refs:
+            self.datadef.clear(self.sc)
+        return True
+
+
+class Setter:
+    """
+    A reusable handle for setting the same simvars repeatedly, created by SimConnect.setter.
+    Values are written in place to a single preallocated structure,
+    by index or name with setter[i] = value, or via setter.data.PLANE_ALTITUDE = value,
+    and sent with send(), so high rate updates like control inputs don't allocate.
+    Calling setter(*values, **named) updates and sends in one step.
+    Call close() to release the data definition, or use the setter as a context manager.
+    """
+    def __init__(self, sc: 'SimConnect', datadef: DataDefinition, object_id=OBJECT_ID_USER):
+        self.sc = sc
+        self.datadef = datadef
+        self.object_id = object_id
+        self.data = datadef._struct_type()()
+        self._names = [d['name'] for d in datadef.defs]
+        self._index = {name: i for i, name in enumerate(self._names)}
+        self._strings = frozenset(i for i, d in enumerate(datadef.defs) if d['dtyp'] == DATATYPE_STRING256)
+        self._size = sizeof(self.data)
+        self._pointer = cast(byref(self.data), c_void_p)
+        # call the SDK function directly, skipping SimConnect's per-call argument encoding
+        self._set_data = sc._decls['SetDataOnSimObject']
+        datadef._refs += 1
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __getitem__(self, k: Union[int, str]) -> Any:
+        return getattr(self.data, self._names[k] if isinstance(k, int) else k)
+
+    def __setitem__(self, k: Union[int, str], value: Any):
+        i = k if isinstance(k, int) else self._index[k]
+        if i in self._strings:
+            value = _encode(value)
+        setattr(self.data, self._names[i], value)
+
+    def __call__(self, *values, **named):
+        """Update the first len(values) fields in order and any named fields, then send"""
+        for i, value in enumerate(values):
+            self[i] = value
+        for name, value in named.items():
+            self[name] = value
+        self.send()
+
+    def send(self):
+        """Send the current values to the sim"""
+        if self._closed:
+            raise ValueError("Setter: already closed")
+        self._set_data(self.sc.hsc, self.datadef.id, self.object_id, 0, 0, self._size, self._pointer)
+
+    def close(self):
+        """Release the data definition so the connection can clear it when idle"""
+        if not self._closed:
+            self._closed = True
+            self.datadef._refs -= 1
 
 
 def map_event_id(sc: 'SimConnect', event: str) -> int:
+    """Map an event to a client event id on this connection, see SimConnect.event_ids"""
     s = validate_event(event)
-    client_id = _event_ids.get(s)
+    client_id = sc.event_ids.get(s)
     if client_id is None:
-        client_id = len(_event_ids)
-        _event_ids[s] = client_id
+        client_id = len(sc.event_ids)
+        sc.event_ids[s] = client_id
         sc.MapClientEventToSimEvent(client_id, s)
     return client_id
 
 
-# Track client-mapped event ids
-_event_ids: Dict[str, int] = {}
-
-
 # Map scdefs type flags to ctypes
 _dtyps = {
     DATATYPE_INT32: DWORD,   # 32-bit integer number
@@ -152,4 +547,98 @@ _dtyps = {
     DATATYPE_FLOAT32: c_float,   # 32-bit floating-point number (float)
     DATATYPE_FLOAT64: c_double,   # 64-bit floating-point number (double)
     DATATYPE_STRING256: c_char,  # variable length string
+    # structured types, which can be set but are decoded as raw bytes
+    DATATYPE_INITPOSITION: DATA_INITPOSITION,
+    DATATYPE_MARKERSTATE: DATA_MARKERSTATE,
+    DATATYPE_WAYPOINT: DATA_WAYPOINT,
+    DATATYPE_LATLONALT: DATA_LATLONALT,
+    DATATYPE_XYZ: DATA_XYZ,
 }
+
+
+def _ctype(dtyp: int) -> Any:
+    """The ctypes type used to set a field, with a fixed length buffer for strings"""
+    return c_char * 256 if dtyp == DATATYPE_STRING256 else _dtyps[dtyp]
+
+
+def _encode(value: Any) -> Any:
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def _field_value(ctyp: Any, value: Any) -> Any:
+    """Convert a value for a field of type ctyp, e.g. a dict or tuple for a DATA_WAYPOINT"""
+    if isinstance(ctyp, type) and issubclass(ctyp, Structure) and not isinstance(value, Structure):
+        return ctyp(**value) if isinstance(value, dict) else ctyp(*value)
+    return _encode(value)
+
+
+def _struct_code(ctyp) -> str:
+    """Return a struct format code with the same size and signedness as a simple ctypes type"""
+    if ctyp == c_char:  # STRING256
+        return '256s'
+    if issubclass(ctyp, Structure):
+        return f'{sizeof(ctyp)}s'
+    code = ctyp._type_
+    if calcsize('=' + code) != sizeof(ctyp):
+        # e.g. c_ulong is 8 bytes on linux but the standard struct 'L' is always 4
+        code = {4: 'i', 8: 'q'}[sizeof(ctyp)]
+        if ctyp._type_.isupper():
+            code = code.upper()
+    return code
+
+
+def _compile_decoder(defs: List[Dict[str, Any]], tagged: bool) -> Decoder:
+    """
+    Build a decoder for the payload of a RECV_SIMOBJECT_DATA packet with the given field defs.
+    The decoder takes a buffer, the offset of the first value and the number of values,
+    and returns a list of (index, value) pairs.  Untagged packets are a contiguous
+    sequence of values for the first count fields, while tagged packets
+    prefix each value with the DWORD index of its field.
+    """
+    codes = [_struct_code(_dtyps[d['dtyp']]) for d in defs]
+    fields = [(Struct('=' + code).unpack_from, calcsize('=' + code), code == '256s') for code in codes]
+    strings = [i for i, code in enumerate(codes) if code == '256s']
+
+    if tagged:
+        unpack_idx = Struct('=' + _struct_code(DWORD)).unpack_from
+        idx_size = sizeof(DWORD)
+
+        def _decode_tagged(buf: memoryview, offset: int, count: int) -> Decoded:
+            result = []
+            for _ in range(count):
+                idx = unpack_idx(buf, offset)[0]
+                unpack, size, is_str = fields[idx]
+                val = unpack(buf, offset + idx_size)[0]
+                if is_str:
+                    val = val.rstrip(b'\x00').decode('ascii')
+                result.append((idx, val))
+                offset += idx_size + size
+            return result
+
+        return _decode_tagged
+
+    unpack_all = Struct('=' + ''.join(codes)).unpack_from
+    n = len(defs)
+
+    def _decode_untagged(buf: memoryview, offset: int, count: int) -> Decoded:
+        if count == n:
+            vals = list(unpack_all(buf, offset))
+            for i in strings:
+                vals[i] = vals[i].rstrip(b'\x00').decode('ascii')
+            return list(enumerate(vals))
+        # partial payload, fall back to unpacking field by field
+        result = []
+        for idx in range(count):
+            unpack, size, is_str = fields[idx]
+            val = unpack(buf, offset)[0]
+            if is_str:
+                val = val.rstrip(b'\x00').decode('ascii')
+            result.append((idx, val))
+            offset += size
+        return result
+
+    return _decode_untagged
+
+
+# offset of the first data value in a RECV_SIMOBJECT_DATA packet
+_data_offset = RECV_SIMOBJECT_DATA.dwData.offset
@@ -0,0 +1,392 @@
+"""
+An in-process stand-in for SimConnect.dll, so the package can be tested
+and benchmarked without Flight Simulator, including on Linux. For example
+
+    emu = SimConnectEmulator(simvars={
+        'PLANE ALTITUDE': lambda t: 1000 + 10 * t,
+        'ATC ID': 'N12345',
+    })
+    with SimConnect(backend=emu) as sc:
+        sub = sc.subscribe_simdata(['Plane Altitude', 'ATC ID'], period=PERIOD_SIM_FRAME)
+        ...
+
+or set the environment variable SIMCONNECT_BACKEND=emulator to use a default emulator.
+
+The emulator keeps the state of each simvar, which is either a constant or
+a function of emulated time in seconds, and generates correctly laid out
+RECV_* packets for data requests at the requested period.
+Units are ignored: scripted values are returned whatever units are requested.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from collections import deque
+from ctypes import create_string_buffer, cast, sizeof, string_at, POINTER, c_float, c_double, Structure
+from struct import Struct, error as struct_error
+from time import monotonic
+import logging
+from .scdefs import (
+    RECV, RECV_OPEN, RECV_EXCEPTION, RECV_SYSTEM_STATE,
+    RECV_SIMOBJECT_DATA, RECV_SIMOBJECT_DATA_BYTYPE,
+    RECV_ID_OPEN, RECV_ID_EXCEPTION, RECV_ID_SYSTEM_STATE,
+    RECV_ID_SIMOBJECT_DATA, RECV_ID_SIMOBJECT_DATA_BYTYPE,
+    EXCEPTION_UNRECOGNIZED_ID, OBJECT_ID_USER, SIMOBJECT_TYPE_USER,
+    PERIOD_NEVER, PERIOD_ONCE, PERIOD_VISUAL_FRAME, PERIOD_SIM_FRAME, PERIOD_SECOND,
+    DATA_REQUEST_FLAG_CHANGED, DATA_REQUEST_FLAG_TAGGED,
+    DATATYPE_STRING256, DWORD,
+)
+from .datadef import _compile_decoder, _struct_code, _dtyps, _field_value
+from .receiver import RECV_P
+
+
+# a scripted simvar is either a constant or a function of emulated time in seconds
+SimVarScript = Union[Any, Callable[[float], Any]]
+
+# the object id the emulator reports for the user aircraft
+USER_OBJECT_ID = 1
+
+_data_offset = RECV_SIMOBJECT_DATA.dwData.offset
+_idx = Struct('=' + _struct_code(DWORD))
+
+
+class _Request:
+    """An active data request"""
+    def __init__(self, req_id, def_id, object_id, period, flags, origin, interval, limit, frame):
+        self.req_id = req_id
+        self.def_id = def_id
+        self.object_id = object_id
+        self.period = period
+        self.flags = flags
+        self.interval = max(interval, 1)
+        self.limit = limit
+        # next frame or second when the request is due
+        self.due = frame + origin
+        self.sent = 0
+        self.last: Optional[List[Any]] = None
+
+
+class SimConnectEmulator:
+    """
+    Emulates the SimConnect SDK functions used by this package, see the module docstring.
+    simvars maps upper case simvar names, e.g. 'PLANE ALTITUDE' or 'ENG RPM:1', to scripted values.
+    objects maps additional AI object ids to their own simvars, for RequestDataOnSimObjectType.
+    With realtime=False the emulated clock advances by one sim frame on each dispatch call,
+    making packet generation deterministic and as fast as possible.
+    """
+    def __init__(
+            self,
+            simvars: Optional[Dict[str, SimVarScript]] = None,
+            objects: Optional[Dict[int, Dict[str, SimVarScript]]] = None,
+            frame_rate=60.0,
+            realtime=True,
+            system_state: Optional[Dict[str, Any]] = None,
+            max_queue=100_000):
+        self.simvars: Dict[str, SimVarScript] = {k.upper(): v for k, v in (simvars or {}).items()}
+        self.objects = {
+            object_id: {k.upper(): v for k, v in svs.items()}
+            for object_id, svs in (objects or {}).items()
+        }
+        self.frame_rate = frame_rate
+        self.realtime = realtime
+        self.system_state = system_state or dict(Sim=1, AircraftLoaded='SimObjects\\Airplanes\\Emulator\\aircraft.cfg')
+        # client data definitions, event mappings and active requests
+        self.definitions: Dict[int, List[Dict[str, Any]]] = {}
+        self.client_events: Dict[int, str] = {}
+        self.requests: Dict[int, _Request] = {}
+        # recent events received via TransmitClientEvent, as (name, data)
+        self.events: deque = deque(maxlen=1000)
+        self.on_event: Optional[Callable[[str, int], None]] = None
+        self._queue: deque = deque(maxlen=max_queue)
+        self._current = None    # keep the packet from GetNextDispatch alive
+        self._start = monotonic()
+        self._ticks = 0
+        self._frame = 0         # last frame we generated packets for
+        self._packers: Dict[int, List[Tuple[Struct, Callable[[Any], Any]]]] = {}
+        self._decoders: Dict[int, Any] = {}
+
+    def decls(self) -> Dict[str, Callable]:
+        """The emulated SDK functions, with the same names and arguments as scdefs._decls"""
+        return {
+            k: getattr(self, k)
+            for k in (
+                'Open', 'Close', 'CallDispatch', 'GetNextDispatch',
+                'AddToDataDefinition', 'ClearDataDefinition',
+                'RequestDataOnSimObject', 'RequestDataOnSimObjectType', 'SetDataOnSimObject',
+                'MapClientEventToSimEvent', 'TransmitClientEvent',
+                'RequestSystemState', 'RequestResponseTimes',
+            )
+        }
+
+    def now(self) -> float:
+        """Emulated time in seconds"""
+        return monotonic() - self._start if self.realtime else self._ticks / self.frame_rate
+
+    def _object_simvars(self, object_id: int) -> Dict[str, SimVarScript]:
+        if object_id in (OBJECT_ID_USER, USER_OBJECT_ID):
+            return self.simvars
+        return self.objects.setdefault(object_id, {})
+
+    def value(self, name: str, object_id=USER_OBJECT_ID) -> Any:
+        """The current value of a simvar"""
+        v = self._object_simvars(object_id).get(name.upper(), 0)
+        return v(self.now()) if callable(v) else v
+
+    # Emulated SDK functions
+
+    def Open(self, phSimConnect, szName, hWnd, UserEventWin32, hEventHandle, ConfigIndex) -> int:
+        phSimConnect._obj.value = id(self)
+        self._post(RECV_OPEN(
+            dwSize=sizeof(RECV_OPEN), dwID=RECV_ID_OPEN, szApplicationName=b'SimConnectEmulator',
+            dwApplicationVersionMajor=11, dwSimConnectVersionMajor=11,
+        ))
+        return 0
+
+    def Close(self, hSimConnect) -> int:
+        self.requests.clear()
+        return 0
+
+    def AddToDataDefinition(self, hSimConnect, DefineID, DatumName, UnitsName, DatumType, fEpsilon, DatumID) -> int:
+        name = DatumName.decode('utf-8') if isinstance(DatumName, bytes) else DatumName
+        self.definitions.setdefault(DefineID, []).append(
+            dict(name=name.upper(), dtyp=DatumType, epsilon=fEpsilon or 0, datum_id=DatumID)
+        )
+        self._packers.pop(DefineID, None)
+        self._decoders.pop(DefineID, None)
+        return 0
+
+    def ClearDataDefinition(self, hSimConnect, DefineID) -> int:
+        if self.definitions.pop(DefineID, None) is None:
+            self._exception(EXCEPTION_UNRECOGNIZED_ID)
+        self._packers.pop(DefineID, None)
+        self._decoders.pop(DefineID, None)
+        return 0
+
+    def RequestDataOnSimObject(
+            self, hSimConnect, RequestID, DefineID, ObjectID, Period,
+            Flags=0, origin=0, interval=0, limit=0) -> int:
+        if Period == PERIOD_NEVER:
+            self.requests.pop(RequestID, None)
+        elif DefineID not in self.definitions:
+            self._exception(EXCEPTION_UNRECOGNIZED_ID)
+        else:
+            frame = self._frame + 1 if Period != PERIOD_SECOND else int(self.now())
+            self.requests[RequestID] = _Request(
+                RequestID, DefineID, ObjectID, Period, Flags, origin, interval, limit, frame
+            )
+        return 0
+
+    def RequestDataOnSimObjectType(self, hSimConnect, RequestID, DefineID, dwRadiusMeters, type) -> int:
+        if DefineID not in self.definitions:
+            self._exception(EXCEPTION_UNRECOGNIZED_ID)
+            return 0
+        # the radius is ignored, all emulated objects are in range
+        object_ids = [USER_OBJECT_ID] if type == SIMOBJECT_TYPE_USER else list(self.objects)
+        if not object_ids:
+            self._post_data(RECV_SIMOBJECT_DATA_BYTYPE, RECV_ID_SIMOBJECT_DATA_BYTYPE, RequestID, 0, DefineID, 0, [])
+        for i, object_id in enumerate(object_ids):
+            values = self._values(DefineID, object_id)
+            self._post_data(
+                RECV_SIMOBJECT_DATA_BYTYPE, RECV_ID_SIMOBJECT_DATA_BYTYPE, RequestID, object_id, DefineID, 0,
+                list(enumerate(values)), entry=i + 1, outof=len(object_ids),
+            )
+        return 0
+
+    def SetDataOnSimObject(self, hSimConnect, DefineID, ObjectID, Flags, ArrayCount, cbUnitSize, pDataSet) -> int:
+        defs = self.definitions.get(DefineID)
+        if defs is None:
+            self._exception(EXCEPTION_UNRECOGNIZED_ID)
+            return 0
+        address = pDataSet.value if hasattr(pDataSet, 'value') else pDataSet
+        count = max(ArrayCount, 1)
+        data = memoryview(string_at(address, cbUnitSize * count))
+        decode = self._decoders.get(DefineID)
+        if decode is None:
+            decode = self._decoders[DefineID] = _compile_decoder(defs, tagged=False)
+        svs = self._object_simvars(ObjectID)
+        # with an array of items, the last one wins
+        for i in range(count):
+            for idx, val in decode(data, i * cbUnitSize, len(defs)):
+                svs[defs[idx]['name']] = val
+        return 0
+
+    def MapClientEventToSimEvent(self, hSimConnect, EventID, EventName=b'') -> int:
+        self.client_events[EventID] = EventName.decode('utf-8') if isinstance(EventName, bytes) else EventName
+        return 0
+
+    def TransmitClientEvent(self, hSimConnect, ObjectID, EventID, dwData, GroupID, Flags) -> int:
+        name = self.client_events.get(EventID)
+        if name is None:
+            self._exception(EXCEPTION_UNRECOGNIZED_ID)
+            return 0
+        self.events.append((name, dwData))
+        if self.on_event:
+            self.on_event(name, dwData)
+        return 0
+
+    def RequestSystemState(self, hSimConnect, RequestID, szState) -> int:
+        state = szState.decode('utf-8') if isinstance(szState, bytes) else szState
+        v = self.system_state.get(state, 0)
+        self._post(RECV_SYSTEM_STATE(
+            dwSize=sizeof(RECV_SYSTEM_STATE), dwID=RECV_ID_SYSTEM_STATE, dwRequestID=RequestID,
+            dwInteger=v if isinstance(v, int) else 0,
+            fFloat=v if isinstance(v, float) else 0,
+            szString=v.encode('utf-8') if isinstance(v, str) else b'',
+        ))
+        return 0
+
+    def RequestResponseTimes(self, hSimConnect, nCount, fElapsedSeconds) -> int:
+        times = cast(fElapsedSeconds, POINTER(c_float))
+        for i in range(nCount):
+            times[i] = 0.001 * (i + 1)
+        return 0
+
+    def CallDispatch(self, hSimConnect, pfcnDispatch, pContext) -> int:
+        self._tick()
+        while self._queue:
+            buf = self._queue.popleft()
+            pfcnDispatch(cast(buf, RECV_P), len(buf.raw), pContext)
+        return 0
+
+    def GetNextDispatch(self, hSimConnect, ppData, pcbData) -> int:
+        self._tick()
+        if not self._queue:
+            raise OSError("SimConnectEmulator: no messages waiting")
+        self._current = buf = self._queue.popleft()
+        ppData._obj.contents = cast(buf, RECV_P).contents
+        pcbData._obj.value = len(buf.raw)
+        return 0
+
+    # Packet generation
+
+    def _post(self, recv: RECV):
+        self._queue.append(create_string_buffer(bytes(recv), sizeof(recv)))
+
+    def _exception(self, exception: int):
+        self._post(RECV_EXCEPTION(dwSize=sizeof(RECV_EXCEPTION), dwID=RECV_ID_EXCEPTION, dwException=exception))
+
+    def _values(self, def_id: int, object_id=USER_OBJECT_ID) -> List[Any]:
+        return [self.value(d['name'], object_id) for d in self.definitions[def_id]]
+
+    def _pack(self, def_id: int, items: List[Tuple[int, Any]], tagged: bool) -> bytes:
+        packers = self._packers.get(def_id)
+        if packers is None:
+            packers = [
+                (Struct('=' + _struct_code(_dtyps[d['dtyp']])), _converter(d['dtyp']))
+                for d in self.definitions[def_id]
+            ]
+            self._packers[def_id] = packers
+        parts = []
+        defs = self.definitions[def_id]
+        for idx, val in items:
+            packer, convert = packers[idx]
+            if tagged:
+                parts.append(_idx.pack(idx))
+            try:
+                parts.append(packer.pack(convert(val)))
+            except (TypeError, ValueError, struct_error) as e:
+                raise ValueError(
+                    f"SimConnectEmulator: can't send {val!r} for {defs[idx]['name']} "
+                    f"as data type {defs[idx]['dtyp']}: {e}"
+                ) from None
+        return b''.join(parts)
+
+    def _post_data(self, kls, recv_id, req_id, object_id, def_id, flags, items, entry=1, outof=1):
+        payload = self._pack(def_id, items, flags & DATA_REQUEST_FLAG_TAGGED)
+        size = _data_offset + len(payload)
+        header = kls(
+            dwSize=size, dwID=recv_id, dwRequestID=req_id, dwObjectID=object_id, dwDefineID=def_id,
+            dwFlags=flags, dwentrynumber=entry, dwoutof=outof, dwDefineCount=len(items),
+        )
+        data = bytes(header)[:_data_offset] + payload
+        # the buffer must cover the dwData placeholder even with an empty payload
+        self._queue.append(create_string_buffer(data, max(size, sizeof(kls))))
+
+    def _tick(self):
+        """Generate packets for any requests that have come due"""
+        if not self.realtime:
+            self._ticks += 1
+        now = self.now()
+        frame = int(now * self.frame_rate)
+        second = int(now)
+        # catch up on missed frames, within reason
+        first = max(self._frame + 1, frame - 100)
+        frames = range(first, frame + 1)
+        self._frame = max(frame, self._frame)
+        for req in list(self.requests.values()):
+            if req.period == PERIOD_ONCE:
+                self._send(req, force=True)
+                self.requests.pop(req.req_id, None)
+            elif req.period in (PERIOD_SIM_FRAME, PERIOD_VISUAL_FRAME):
+                for f in frames:
+                    if f >= req.due:
+                        req.due = f + req.interval
+                        if not self._send(req):
+                            break
+            elif req.period == PERIOD_SECOND:
+                if second >= req.due:
+                    req.due = second + req.interval
+                    self._send(req)
+
+    def _send(self, req: _Request, force=False) -> bool:
+        """Send data for req, returning False once the request is finished"""
+        if req.def_id not in self.definitions:
+            self.requests.pop(req.req_id, None)
+            return False
+        values = self._values(req.def_id, req.object_id)
+        items = list(enumerate(values))
+        if req.flags & DATA_REQUEST_FLAG_CHANGED and req.last is not None and not force:
+            defs = self.definitions[req.def_id]
+            changed = [
+                (i, v) for (i, v), prev, d in zip(items, req.last, defs)
+                if not _close(v, prev, d['epsilon'])
+            ]
+            if not changed:
+                return True
+            # tagged data only includes changed values, otherwise send everything
+            if req.flags & DATA_REQUEST_FLAG_TAGGED:
+                items = changed
+        req.last = values
+        self._post_data(
+            RECV_SIMOBJECT_DATA, RECV_ID_SIMOBJECT_DATA, req.req_id,
+            USER_OBJECT_ID if req.object_id == OBJECT_ID_USER else req.object_id,
+            req.def_id, req.flags & DATA_REQUEST_FLAG_TAGGED, items,
+        )
+        req.sent += 1
+        if req.limit and req.sent >= req.limit:
+            self.requests.pop(req.req_id, None)
+            return False
+        return True
+
+
+def _converter(dtyp: int) -> Callable[[Any], Any]:
+    """Coerce a scripted value to what struct expects for a data type, e.g. a float for an INT32 field"""
+    if dtyp == DATATYPE_STRING256:
+        return lambda v: str(v).encode('ascii')
+    ctyp = _dtyps[dtyp]
+    if issubclass(ctyp, Structure):
+        # structured values can be scripted as a ctypes structure, raw bytes, or a dict or tuple of fields
+        return lambda v: v if isinstance(v, bytes) else bytes(_field_value(ctyp, v))
+    if ctyp in (c_float, c_double):
+        return float
+    if _struct_code(ctyp).isupper():
+        # wrap negative values into unsigned fields like a C cast
+        mask = (1 << 8 * sizeof(ctyp)) - 1
+        return lambda v: int(v) & mask
+    return int
+
+
+def _close(a, b, epsilon) -> bool:
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) <= epsilon
+    return a == b
+
+
+if __name__ == '__main__':
+    from .sc import SimConnect
+    logging.getLogger().setLevel(logging.DEBUG)
+
+    emu = SimConnectEmulator(simvars={'PLANE ALTITUDE': lambda t: 1000 + 100 * t}, realtime=False)
+    with SimConnect(name='emulated', backend=emu) as sc:
+        print(sc.get_simdatum('Plane Altitude'))
+        sub = sc.subscribe_simdata('Plane Altitude', period=PERIOD_VISUAL_FRAME, interval=30)
+        for _ in range(120):
+            sc.dispatch()
+        print(sub.simdata)
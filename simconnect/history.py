@@ -0,0 +1,163 @@
+"""
+A fixed capacity history of subscription updates in a numpy ring buffer,
+for vectorized analysis like rolling statistics or FFTs of control inputs, e.g.
+
+    sub = sc.subscribe_simdata(['ELEVATOR POSITION', 'AILERON POSITION'], period=PERIOD_SIM_FRAME, history=4096)
+    ...
+    elevator = sub.history.column('ELEVATOR POSITION', 512)
+    sim_time = sub.history.column('sim_time', 512)
+
+Each update writes one row with the latest value of every field,
+carrying forward values that didn't change, plus two timestamps:
+sim_time, from the SIMULATION TIME simvar which subscribe_simdata adds (else NaN),
+and local_time, from time.time() when the update was received.
+
+The buffer holds twice capacity rows: each update writes row i, which is copied
+in bulk to its mirror at i + capacity when the history is next read,
+so the most recent n rows are always a contiguous slice and windows are views, not copies.
+Views may change with later updates as the ring wraps, so copy them to keep a stable snapshot.
+"""
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+from ctypes import c_char
+from struct import Struct
+from time import time
+from .scdefs import DATATYPE_INT32, DATATYPE_INT64, DATATYPE_FLOAT32, DATATYPE_FLOAT64
+from .datadef import DataDefinition, Decoded
+if TYPE_CHECKING:
+    import numpy
+
+
+# numpy types and struct codes for each data type, with anything else, like strings, stored as objects
+_np_types = {
+    DATATYPE_INT32: ('<i8', 'q'),
+    DATATYPE_INT64: ('<i8', 'q'),
+    DATATYPE_FLOAT32: ('<f8', 'd'),
+    DATATYPE_FLOAT64: ('<f8', 'd'),
+}
+
+SIM_TIME = 'SIMULATION TIME'
+
+
+class History:
+    def __init__(self, datadef: DataDefinition, capacity=1024, sim_time: Optional[str] = SIM_TIME):
+        # numpy is imported on demand since it's optional and slow to import
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("History requires numpy, try `pip install numpy`")
+        if capacity < 1:
+            raise ValueError("History: capacity must be positive")
+        self.capacity = capacity
+        self.names: List[str] = list(datadef._names)
+        types = [_np_types.get(d['dtyp'], ('O', None)) for d in datadef.defs]
+        # lay out the numeric columns first, so the latest values can be written
+        # to each row with a single struct.pack_into, followed by any object columns
+        numeric = [i for i, (_, code) in enumerate(types) if code]
+        objects = [i for i, (_, code) in enumerate(types) if not code]
+        offsets = {i: 8 * (2 + k) for k, i in enumerate(numeric + objects)}
+        ncols = 2 + len(types)
+        dtype = np.dtype(dict(
+            names=['sim_time', 'local_time'] + self.names,
+            formats=['<f8', '<f8'] + [t for t, _ in types],
+            offsets=[0, 8] + [offsets[i] for i in range(len(types))],
+            itemsize=8 * ncols,
+        ))
+        self.data: 'numpy.ndarray' = np.zeros(2 * capacity, dtype=dtype)
+        self._itemsize = dtype.itemsize
+        # a writable view of the buffer's bytes, which numpy won't export when there are object columns
+        address = self.data.__array_interface__['data'][0]
+        self._buf = memoryview((c_char * self.data.nbytes).from_address(address)).cast('B')
+        self._pack_into = Struct('<dd' + ''.join(types[i][1] for i in numeric)).pack_into   # type: ignore
+        # the latest numeric values, carried forward between updates, starting with the timestamps
+        self._row: List[Any] = [
+            float('nan') if code == 'd' else 0
+            for code in ['d', 'd'] + [types[i][1] for i in numeric]
+        ]
+        for name, (_, code) in zip(['sim_time', 'local_time'] + self.names, [('', 'd'), ('', 'd')] + types):
+            self.data[name] = float('nan') if code == 'd' else 0 if code else None
+        # the position in _row for each numeric field, or -1 for object fields
+        self._pos = [-1] * len(types)
+        for k, i in enumerate(numeric):
+            self._pos[i] = 2 + k
+        # the latest value and column view for each object field
+        self._objects: Dict[int, Any] = {i: None for i in objects}
+        self._object_columns: List[Tuple[int, Any]] = [(i, self.data[self.names[i]]) for i in objects]
+        self._sim_pos = self._pos[self.names.index(sim_time)] if sim_time in self.names else -1
+        # the number of updates since the history was created or cleared
+        self.count = 0
+        # the ring index of the latest row, kept by clear() to carry values forward
+        self._latest: Optional[int] = None
+        # the total number of rows written, and how many of those have been mirrored
+        self._written = 0
+        self._mirrored = 0
+
+    def __len__(self) -> int:
+        """The number of rows available, at most capacity"""
+        return min(self.count, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """The number of older updates overwritten since the buffer filled"""
+        return max(self.count - self.capacity, 0)
+
+    def update(self, decoded: Decoded):
+        """Append a row for a decoded update, a listener for Subscription.add_listener"""
+        row = self._row
+        pos = self._pos
+        for idx, val in decoded:
+            p = pos[idx]
+            if p < 0:
+                self._objects[idx] = val
+            else:
+                row[p] = val
+        row[1] = time()
+        if self._sim_pos >= 0:
+            row[0] = row[self._sim_pos]
+        latest = self._latest
+        i = 0 if latest is None else (latest + 1) % self.capacity
+        # the mirrored copy is written by _sync when needed
+        self._pack_into(self._buf, i * self._itemsize, *row)
+        if self._object_columns:
+            for idx, column in self._object_columns:
+                column[i] = self._objects[idx]
+        self._latest = i
+        self.count += 1
+        self._written += 1
+
+    def _sync(self):
+        """Copy rows written since the last read to their mirrors in the upper half"""
+        pending = self._written - self._mirrored
+        if not pending:
+            return
+        cap, last, data = self.capacity, self._latest, self.data
+        first = last - min(pending, cap) + 1    # type: ignore
+        if first >= 0:
+            data[cap + first:cap + last + 1] = data[first:last + 1]     # type: ignore
+        else:
+            # the pending rows wrap around the end of the ring
+            data[cap:cap + last + 1] = data[:last + 1]  # type: ignore
+            data[2 * cap + first:] = data[cap + first:cap]
+        self._mirrored = self._written
+
+    def _slice(self, n: Optional[int]) -> slice:
+        self._sync()
+        available = len(self)
+        n = available if n is None else min(n, available)
+        end = self._latest + self.capacity + 1 if self._latest is not None else 0
+        return slice(end - n, end)
+
+    def window(self, n: Optional[int] = None) -> 'numpy.ndarray':
+        """A view of the most recent n rows (default all) as a structured array, oldest first"""
+        return self.data[self._slice(n)]
+
+    def column(self, name: str, n: Optional[int] = None) -> Any:
+        """A view of the most recent n values of a field, or of 'sim_time' or 'local_time', oldest first"""
+        return self.data[name][self._slice(n)]
+
+    def latest(self) -> Optional[Any]:
+        """The most recent row, or None if there are no updates yet"""
+        return self.data[self._latest] if self.count else None
+
+    def clear(self):
+        """Forget the rows so far, e.g. when starting a new analysis"""
+        self.count = 0
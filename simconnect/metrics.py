@@ -0,0 +1,106 @@
+"""
+Lightweight counters and latency histograms for monitoring a SimConnect connection,
+enabled with SimConnect(metrics=True) and reported by SimConnect.stats()
+"""
+from typing import Any, Dict
+from time import perf_counter
+
+
+# histogram buckets are powers of two microseconds, from 1us to about 1hr
+_nbuckets = 32
+
+
+class Histogram:
+    """
+    A latency histogram with power of two microsecond buckets,
+    cheap enough to update on every message.  Values are in seconds.
+    """
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * _nbuckets
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), _nbuckets - 1)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q'th quantile as the upper bound of its bucket, capped at the max"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        return dict(
+            count=self.count,
+            total=self.total,
+            mean=self.total / self.count if self.count else 0.0,
+            min=self.min if self.count else 0.0,
+            max=self.max,
+            p50=self.quantile(0.5),
+            p90=self.quantile(0.9),
+            p99=self.quantile(0.99),
+        )
+
+
+class Metrics:
+    """
+    A registry of named counters and histograms, created on first use.
+    Names are dotted, e.g. 'recv.RECV_SIMOBJECT_DATA' or 'decode.PLANE ALTITUDE+2#1a2b3c4d'
+    """
+    def __init__(self):
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.started = perf_counter()
+
+    def count(self, name: str, n: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def histogram(self, name: str) -> Histogram:
+        h = self.histograms.get(name)
+        if h is None:
+            h = self.histograms[name] = Histogram()
+        return h
+
+    def observe(self, name: str, seconds: float):
+        self.histogram(name).observe(seconds)
+
+    def discard(self, *names: str):
+        """Forget the named histograms, e.g. once their DataDefinition is cleared"""
+        for name in names:
+            self.histograms.pop(name, None)
+
+    def reset(self):
+        """Zero everything, keeping existing histograms since receivers hold on to them"""
+        self.counters.clear()
+        for h in self.histograms.values():
+            h.__init__()
+        self.started = perf_counter()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the elapsed seconds since the metrics started or were reset,
+        the counters with a per-second rate for each, and a summary of each histogram
+        """
+        elapsed = perf_counter() - self.started
+        return dict(
+            elapsed=elapsed,
+            counters=dict(self.counters),
+            rates={k: v / elapsed for k, v in self.counters.items()} if elapsed else {},
+            histograms={k: h.snapshot() for k, h in self.histograms.items()},
+        )
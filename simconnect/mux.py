@@ -0,0 +1,197 @@
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+from .scdefs import (
+    PERIOD_SIM_FRAME, PERIOD_VISUAL_FRAME, PERIOD_SECOND,
+    DATA_REQUEST_FLAG_CHANGED, DATA_REQUEST_FLAG_TAGGED,
+)
+from .datadef import (
+    DataDefinition, SimVarsSpec, SimData, SimDataHandler, Subscription, Decoded, _validate_simvars, _changedict
+)
+from .scvars import _namestd
+if TYPE_CHECKING:
+    from .sc import SimConnect
+
+
+# a sim-side field is identified by (upper case simvar name, units, data type)
+FieldKey = Tuple[str, str, int]
+# requests are ranked by approximate seconds between updates, then by period
+Rate = Tuple[float, int]
+
+# estimated duration of each period, assuming ~60 frames per second
+_period_seconds = {
+    PERIOD_SIM_FRAME: 1/60,
+    PERIOD_VISUAL_FRAME: 1/60,
+    PERIOD_SECOND: 1,
+}
+
+
+def _rate(period: int, interval: int) -> Rate:
+    if period not in _period_seconds:
+        raise ValueError(f"SimDataMux: unsupported period {period}, expected PERIOD_SIM_FRAME, VISUAL_FRAME or SECOND")
+    # prefer sim frames to visual frames when the estimates tie
+    return (_period_seconds[period] * max(interval, 1), -period)
+
+
+class MuxSubscription:
+    """
+    A subscriber's view of some of the variables shared by a SimDataMux.
+    Like Subscription, it has its own simdata and optional callback,
+    and stops receiving updates after cancel()
+    """
+    def __init__(
+            self, mux: 'SimDataMux', defs: List[Dict[str, Any]],
+            rate: Rate, callback: Optional[SimDataHandler]):
+        self.mux = mux
+        self.defs = defs
+        self.keys: List[FieldKey] = [_field_key(d) for d in defs]
+        self.rate = rate
+        self.callback = callback
+        # compared using this subscriber's own epsilons, which may be coarser than the group's
+        self.simdata: SimData = _changedict(defs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.cancel()
+
+    def get_units(self) -> Dict[str, str]:
+        return {d['name']: d['units'] for d in self.defs}
+
+    def cancel(self) -> bool:
+        """Stop receiving updates, returning False if already cancelled"""
+        return self.mux._remove(self)
+
+
+class _Group:
+    """The shared sim-side subscription for all fields requested at the same fastest rate"""
+    def __init__(self, sub: Subscription, keys: List[FieldKey], epsilons: List[float]):
+        self.sub = sub
+        self.keys = keys
+        self.epsilons = epsilons
+
+
+class SimDataMux:
+    """
+    Merges overlapping subscriptions onto shared sim-side data requests.
+    Each distinct (simvar, units, type) is requested from the sim once,
+    at the fastest period requested by any subscriber, and the decoded values
+    are fanned out to each subscriber's simdata and callback. For example
+
+        mux = SimDataMux(sc)
+        altimeter = mux.subscribe_simdata(["Indicated Altitude", "Kohlsman setting hg"])
+        vsi = mux.subscribe_simdata(["Indicated Altitude", "Vertical Speed"], period=PERIOD_VISUAL_FRAME)
+
+    shares a single per-frame request for "Indicated Altitude".
+    Note subscribers see changes at the rate of the fastest request for each variable.
+    """
+    def __init__(self, sc: 'SimConnect'):
+        self.sc = sc
+        self._subscribers: List[MuxSubscription] = []
+        self._groups: Dict[Rate, _Group] = {}
+        # the subscribers interested in each field, with the name they use for it
+        self._routes: Dict[FieldKey, List[Tuple[MuxSubscription, str]]] = {}
+        # latest value of each field, used to seed new subscribers
+        self._values: Dict[FieldKey, Any] = {}
+
+    def subscribe_simdata(
+            self, simvars: SimVarsSpec,
+            period=PERIOD_SECOND,
+            interval=1,
+            callback: Optional[SimDataHandler] = None
+            ) -> MuxSubscription:
+        """
+        Subscribe to simvars via the shared requests, see SimConnect.subscribe_simdata.
+        Updates are always tagged and only sent when values change.
+        """
+        msub = MuxSubscription(self, _validate_simvars(simvars), _rate(period, interval), callback)
+        for key, d in zip(msub.keys, msub.defs):
+            if key in self._values:
+                msub.simdata[d['name']] = self._values[key]
+        self._subscribers.append(msub)
+        self._rebuild()
+        return msub
+
+    def _remove(self, msub: MuxSubscription) -> bool:
+        if msub not in self._subscribers:
+            return False
+        self._subscribers.remove(msub)
+        self._rebuild()
+        return True
+
+    def close(self):
+        """Cancel all subscribers and shared requests"""
+        self._subscribers = []
+        self._rebuild()
+
+    def _rebuild(self):
+        """Update the shared requests to match the current subscribers"""
+        # find the fastest rate and smallest epsilon for each field
+        fields: Dict[FieldKey, Dict[str, Any]] = {}
+        rates: Dict[FieldKey, Rate] = {}
+        routes: Dict[FieldKey, List[Tuple[MuxSubscription, str]]] = {}
+        for msub in self._subscribers:
+            for key, d in zip(msub.keys, msub.defs):
+                if key not in fields:
+                    # request the standard spelling, whichever subscriber asked first
+                    fields[key] = dict(d, name=key[0])
+                    rates[key] = msub.rate
+                else:
+                    fields[key]['epsilon'] = min(fields[key]['epsilon'], d['epsilon'])
+                    rates[key] = min(rates[key], msub.rate)
+                routes.setdefault(key, []).append((msub, d['name']))
+        self._routes = routes
+        self._values = {k: v for k, v in self._values.items() if k in fields}
+
+        wanted: Dict[Rate, List[FieldKey]] = {}
+        for key, rate in rates.items():
+            wanted.setdefault(rate, []).append(key)
+
+        for rate in set(wanted) | set(self._groups):
+            keys = wanted.get(rate, [])
+            epsilons = [fields[k]['epsilon'] for k in keys]
+            group = self._groups.pop(rate, None)
+            if group and group.keys == keys and group.epsilons == epsilons:
+                self._groups[rate] = group
+                continue
+            # start the replacement request before stopping the old one to avoid a gap
+            if keys:
+                self._groups[rate] = self._start(rate, keys, [fields[k] for k in keys], epsilons)
+            if group:
+                group.sub.cancel(clear_definition=True)
+
+    def _start(self, rate: Rate, keys: List[FieldKey], defs: List[Dict[str, Any]], epsilons: List[float]) -> _Group:
+        seconds, period = rate
+        period = -period
+        interval = max(1, round(seconds / _period_seconds[period]))
+        sub = self.sc.subscribe_simdata(
+            DataDefinition.from_defs(self.sc, defs),
+            period=period,
+            interval=interval,
+            flags=DATA_REQUEST_FLAG_CHANGED | DATA_REQUEST_FLAG_TAGGED,
+        )
+
+        def _fanout(decoded: Decoded):
+            touched: Dict[MuxSubscription, None] = {}
+            routes = self._routes
+            for idx, val in decoded:
+                key = keys[idx]
+                self._values[key] = val
+                for msub, name in routes.get(key, ()):
+                    simdata = msub.simdata
+                    version = simdata.version
+                    simdata[name] = val
+                    if simdata.version != version:
+                        touched[msub] = None
+            for msub in touched:
+                if msub.callback:
+                    msub.callback(msub.simdata)
+
+        sub.add_listener(_fanout)
+        return _Group(sub, keys, epsilons)
+
+
+def _field_key(d: Dict[str, Any]) -> FieldKey:
+    # spellings like Plane_Altitude and PLANE ALTITUDE share a field, but ENGINE RPM:1 and :2 don't
+    name = d['name']
+    _, sep, index = name.rpartition(':')
+    return (_namestd(name) + (sep + index if sep else ''), d['units'], d['dtyp'])
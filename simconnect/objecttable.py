@@ -0,0 +1,131 @@
+"""
+A columnar snapshot of the same simvars for many simulation objects,
+e.g. every AI aircraft within a radius, as returned by SimConnect.request_simdata_bytype.
+
+RequestDataOnSimObjectType responds with one RECV_SIMOBJECT_DATA_BYTYPE packet per object,
+numbered dwentrynumber out of dwoutof.  Each packet fills one row of the table
+without building a dict per object.  When numpy is available the rows are copied
+as raw bytes into a packed structured array, so columns are numpy arrays
+and nothing is decoded in python except string columns, which are decoded when read.
+Otherwise each packet is decoded into lists, one per column.
+"""
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from ctypes import addressof, c_char
+from .scdefs import RECV_SIMOBJECT_DATA, DATATYPE_STRING256
+from .datadef import DataDefinition, _struct_code, _dtyps, _data_offset
+if TYPE_CHECKING:
+    import numpy
+
+
+# numpy equivalents of the standard size struct codes used by _struct_code
+_np_codes = dict(i='<i4', I='<u4', q='<i8', Q='<u8', f='<f4', d='<f8')
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class ObjectTable:
+    """
+    Columns of simvar values for each object, indexed by simvar name, e.g.
+    table['PLANE ALTITUDE'], aligned with table.object_ids.
+    Use table.row(object_id) to get the values for a single object as a dict.
+    """
+    def __init__(self, datadef: DataDefinition, use_numpy: Optional[bool] = None):
+        self.datadef = datadef
+        self.names: List[str] = list(datadef._names)
+        self.size: Optional[int] = None     # the number of objects, once the first packet arrives
+        self.received = 0
+        self.object_ids: Any = []
+        self.data: Optional['numpy.ndarray'] = None     # the structured array, with numpy
+        self._rows: Optional['numpy.ndarray'] = None    # a byte view of each row of data
+        self._filled: List[bool] = []
+        self._columns: Dict[str, List[Any]] = {}
+        # string columns decoded from data, until the next packet arrives
+        self._strings: Dict[str, Any] = {}
+        self._index: Optional[Dict[int, int]] = None
+        self._np = _numpy() if use_numpy is not False else None
+        if use_numpy and self._np is None:
+            raise ImportError("ObjectTable: use_numpy requires numpy")
+        self._codes = [_struct_code(_dtyps[d['dtyp']]) for d in datadef.defs]
+        self._string_names = {d['name'] for d in datadef.defs if d['dtyp'] == DATATYPE_STRING256}
+
+    def __len__(self) -> int:
+        return self.size or 0
+
+    def __getitem__(self, name: str) -> Any:
+        """The column of values for a simvar"""
+        if self.data is None:
+            return self._columns[name]
+        if name not in self._string_names:
+            return self.data[name]
+        column = self._strings.get(name)
+        if column is None:
+            # decode to str like the list columns, rather than returning numpy's bytes
+            column = self._strings[name] = self._np.char.decode(self.data[name], 'ascii')
+        return column
+
+    def __repr__(self) -> str:
+        return f"ObjectTable({self.received}/{len(self)} objects, {self.names})"
+
+    @property
+    def complete(self) -> bool:
+        return self.size is not None and self.received >= self.size
+
+    def keys(self) -> List[str]:
+        return self.names
+
+    def row(self, object_id: int) -> Dict[str, Any]:
+        """The values for one object as a dict"""
+        if self._index is None:
+            self._index = {int(oid): i for i, oid in enumerate(self.object_ids)}
+        i = self._index[object_id]
+        return {name: self[name][i] for name in self.names}
+
+    def _allocate(self, size: int):
+        self.size = size
+        self._filled = [False] * size
+        np = self._np
+        if np:
+            dtype = np.dtype([
+                (name, f'S{code[:-1]}' if code.endswith('s') else _np_codes[code])
+                for name, code in zip(self.names, self._codes)
+            ])
+            self.object_ids = np.zeros(size, dtype='<u4')
+            self.data = np.zeros(size, dtype=dtype)
+            self._rows = self.data.view(np.uint8).reshape(size, dtype.itemsize)
+        else:
+            self.object_ids = [0] * size
+            self._columns = {name: [None] * size for name in self.names}
+
+    def add(self, recv: RECV_SIMOBJECT_DATA) -> bool:
+        """Fill the row for a RECV_SIMOBJECT_DATA_BYTYPE packet, returning True once all rows have arrived"""
+        if self.size is None:
+            # the sim answers with a single empty packet if there are no matching objects
+            self._allocate(recv.dwoutof if recv.dwDefineCount else 0)
+        if not self.size:
+            return True
+        entry = recv.dwentrynumber - 1
+        if not 0 <= entry < self.size:
+            return self.complete
+        self.object_ids[entry] = recv.dwObjectID
+        buf = memoryview((c_char * recv.dwSize).from_address(addressof(recv)))
+        if self.data is not None and recv.dwDefineCount == len(self.names):
+            row = self._rows[entry]
+            row[:] = self._np.frombuffer(buf, dtype='u1', count=len(row), offset=_data_offset)
+        else:
+            decoded = self.datadef.decode(recv)
+            columns = self.data if self.data is not None else self._columns
+            for idx, val in decoded:
+                columns[self.names[idx]][entry] = val
+        if not self._filled[entry]:
+            # the same entry can arrive more than once, which only updates its row
+            self._filled[entry] = True
+            self.received += 1
+        self._strings.clear()
+        self._index = None
+        return self.complete
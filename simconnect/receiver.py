@@ -1,4 +1,4 @@
-from typing import Callable, Type, Dict
+from typing import Callable, Type, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import logging
 from ctypes import cast, POINTER
 from .scdefs import RECV, RECV_OPEN, RECV_EXCEPTION
@@ -7,6 +7,9 @@ from . import scdefs
 
 Receiver = Callable[[RECV], bool]
 
+# a pointer to a received packet, as passed to the dispatch callback
+RECV_P = POINTER(RECV)
+
 _exc_map = dict(
     (getattr(scdefs, s), s)
     for s in dir(scdefs)
@@ -28,9 +31,11 @@ class ReceiverInstance:
         for kls in all_subclasses(RECV)
     }
 
-    def __init__(self, rtype: Type[RECV], receiver: Receiver):
+    def __init__(self, rtype: Type[RECV], receiver: Receiver, req_id: Optional[int] = None):
         self._rtype = rtype
         self._receiver = receiver
+        # if req_id is set, only messages with a matching dwRequestID are received
+        self._req_id = req_id
 
     @staticmethod
     def cast_recv(pRecv) -> RECV:   #TODO type annotation : pointer[RECV] per https://github.com/python/mypy/issues/7540
@@ -40,10 +45,97 @@ class ReceiverInstance:
         return pRecv.contents
 
     def receive(self, recv: RECV) -> bool:
-        if isinstance(recv, self._rtype):
-            return self._receiver(recv)
-        else:
+        if not isinstance(recv, self._rtype):
             return False
+        if self._req_id is not None and getattr(recv, 'dwRequestID', None) != self._req_id:
+            return False
+        return self._receiver(recv)
+
+
+class ReceiverTable:
+    """
+    Routes each RECV message to its receivers without scanning them all.
+    Broadcast receivers are indexed by RECV class, including superclasses,
+    so e.g. a RECV_EXCEPTION receiver sees every exception.
+    Receivers with a req_id are indexed by (RECV class, request id),
+    and only see data-bearing messages with that dwRequestID.
+    """
+    def __init__(self, receivers: Iterable[ReceiverInstance] = ()):
+        self._broadcast: List[ReceiverInstance] = []
+        self._requests: Dict[Tuple[type, int], List[ReceiverInstance]] = {}
+        # cache the broadcast receivers and request keys for each concrete RECV class we see
+        self._routes: Dict[type, Tuple[Tuple[ReceiverInstance, ...], Tuple[type, ...]]] = {}
+        for r in receivers:
+            self.add(r)
+
+    def __len__(self) -> int:
+        return len(self._broadcast) + sum(len(rs) for rs in self._requests.values())
+
+    def __iter__(self) -> Iterator[ReceiverInstance]:
+        yield from self._broadcast
+        for rs in self._requests.values():
+            yield from rs
+
+    def add(self, r: ReceiverInstance):
+        # replace rather than mutate lists so receivers can be added or removed during dispatch
+        if r._req_id is None:
+            self._broadcast = self._broadcast + [r]
+            self._routes.clear()
+        else:
+            key = (r._rtype, r._req_id)
+            self._requests[key] = self._requests.get(key, []) + [r]
+
+    def remove(self, receiver: Union[Receiver, ReceiverInstance]) -> bool:
+        """Remove a receiver instance, or all instances of a receiver function, returning True if found"""
+        if isinstance(receiver, ReceiverInstance) and receiver._req_id is not None:
+            # fast path for a request receiver
+            key = (receiver._rtype, receiver._req_id)
+            rs = self._requests.get(key, [])
+            if receiver not in rs:
+                return False
+            rs = [r for r in rs if r is not receiver]
+            if rs:
+                self._requests[key] = rs
+            else:
+                del self._requests[key]
+            return True
+
+        def keep(r: ReceiverInstance) -> bool:
+            return r is not receiver and r._receiver != receiver
+
+        n = len(self)
+        self._broadcast = [r for r in self._broadcast if keep(r)]
+        requests = {}
+        for k, rs in self._requests.items():
+            kept = [r for r in rs if keep(r)]
+            if kept:
+                requests[k] = kept
+        self._requests = requests
+        self._routes.clear()
+        return len(self) < n
+
+    def _route(self, kls: type) -> Tuple[Tuple[ReceiverInstance, ...], Tuple[type, ...]]:
+        rtypes = tuple(c for c in kls.__mro__ if isinstance(c, type) and issubclass(c, RECV))
+        route = (
+            tuple(r for r in self._broadcast if r._rtype in rtypes),
+            rtypes if hasattr(kls, 'dwRequestID') else (),
+        )
+        self._routes[kls] = route
+        return route
+
+    def dispatch(self, recv: RECV) -> int:
+        """Dispatch recv to matching receivers, returning the number which accepted it"""
+        kls = type(recv)
+        broadcast, rtypes = self._routes.get(kls) or self._route(kls)
+        n = 0
+        for r in broadcast:
+            n += r._receiver(recv)
+        if rtypes:
+            req_id = recv.dwRequestID
+            for rtype in rtypes:
+                for r in self._requests.get((rtype, req_id), ()):
+                    n += r._receiver(recv)
+        return n
 
 
 def receiveException(recv: RECV_EXCEPTION) -> bool:
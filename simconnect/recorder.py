@@ -0,0 +1,328 @@
+"""
+A compact append-only recording format for subscription updates.
+
+A recording starts with a header describing the fields,
+followed by blocks of up to block_rows updates stored column by column:
+
+    magic       b'SCREC1'
+    header      uint32 length + JSON {"defs": [...], "t0": epoch seconds}
+    block*      varint row count, varint byte length of the rest of the block, then
+                row count varint deltas of the update time in microseconds,
+                row count varint masks of changed fields, XOR'd with the previous mask,
+                then for each field the packed values of the rows where it changed
+
+Numeric values are packed little-endian with the struct format of their SimConnect type,
+strings as a varint byte length followed by utf-8 bytes,
+and structured types like DATATYPE_LATLONALT as their raw fixed size bytes.
+Only values which differ from the previously recorded value are stored.
+"""
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from struct import Struct, pack
+from ctypes import Structure, sizeof
+from time import time
+import json
+from .scdefs import DATATYPE_INT32, DATATYPE_INT64, DATATYPE_FLOAT32, DATATYPE_FLOAT64, DATATYPE_STRING256
+from .datadef import DataDefinition, Subscription, Decoded, _dtyps
+
+
+MAGIC = b'SCREC1'
+_header_len = Struct('<I')
+
+
+def _varint(n: int, out: bytearray):
+    """append n >= 0 as a LEB128 varint"""
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf: bytes, offset: int) -> Tuple[int, int]:
+    """return (n, new offset) for the varint at offset"""
+    n = shift = 0
+    while True:
+        b = buf[offset]
+        offset += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, offset
+        shift += 7
+
+
+# the structured data types, which are decoded as raw bytes
+_structs = {dtyp: ctyp for dtyp, ctyp in _dtyps.items() if issubclass(ctyp, Structure)}
+
+# fixed size struct codes for each data type, so recordings are portable, with None for strings
+_codes = {
+    DATATYPE_INT32: 'I',
+    DATATYPE_INT64: 'q',
+    DATATYPE_FLOAT32: 'f',
+    DATATYPE_FLOAT64: 'd',
+    DATATYPE_STRING256: None,
+    **{dtyp: f'{sizeof(ctyp)}s' for dtyp, ctyp in _structs.items()},
+}
+
+
+def _field_codes(defs: List[Dict[str, Any]]) -> List[Optional[str]]:
+    for d in defs:
+        if d['dtyp'] not in _codes:
+            raise ValueError(f"FlightRecorder: can't record {d['name']} with unsupported data type {d['dtyp']}")
+    return [_codes[d['dtyp']] for d in defs]
+
+
+class FlightRecorder:
+    """
+    Record updates from a subscription (or any DataDefinition) to a binary file,
+    see the module docstring for the format.  For example
+
+        sub = sc.subscribe_simdata(simvars, period=PERIOD_SIM_FRAME)
+        with FlightRecorder('flight.screc', sub):
+            while True:
+                sc.receive()
+
+    The file is written a block at a time, so call close() or use a context manager
+    to flush the last block.  Read recordings with read_recording().
+    """
+    def __init__(self, f: Union[str, BinaryIO], source: Union[Subscription, DataDefinition], block_rows=1024):
+        self._own_file = isinstance(f, str)
+        self.f: BinaryIO = open(f, 'wb') if isinstance(f, str) else f
+        self.datadef = source.datadef if isinstance(source, Subscription) else source
+        self.block_rows = block_rows
+        defs = [dict(name=d['name'], units=d['units'], dtyp=d['dtyp']) for d in self.datadef.defs]
+        self._codes = _field_codes(defs)
+        self.t0 = time()
+        header = json.dumps(dict(defs=defs, t0=self.t0)).encode('utf-8')
+        self.f.write(MAGIC + _header_len.pack(len(header)) + header)
+        self.bytes_written = len(MAGIC) + _header_len.size + len(header)
+        self.rows = 0
+
+        n = len(defs)
+        self._last: List[Any] = [None] * n
+        self._times: List[int] = []
+        self._masks: List[int] = []
+        self._columns: List[List[Any]] = [[] for _ in range(n)]
+        self._tlast = 0
+        self._masklast = 0
+
+        self._sub = source if isinstance(source, Subscription) else None
+        if self._sub:
+            self._sub.add_listener(self.record)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def record(self, decoded: Decoded, t: Optional[float] = None):
+        """Record the decoded (index, value) pairs from an update, at time t defaulting to now"""
+        mask = 0
+        last = self._last
+        columns = self._columns
+        for idx, val in decoded:
+            if last[idx] is None or last[idx] != val:
+                last[idx] = val
+                columns[idx].append(val)
+                mask |= 1 << idx
+        if not mask:
+            return
+        self._times.append(round(((time() if t is None else t) - self.t0) * 1e6))
+        self._masks.append(mask)
+        if len(self._times) >= self.block_rows:
+            self.flush()
+
+    def flush(self):
+        """Write any buffered updates as a block"""
+        n = len(self._times)
+        if not n:
+            return
+        body = bytearray()
+        tlast = self._tlast
+        for t in self._times:
+            _varint(max(t - tlast, 0), body)
+            tlast = max(t, tlast)
+        masklast = self._masklast
+        for mask in self._masks:
+            _varint(mask ^ masklast, body)
+            masklast = mask
+        for code, column in zip(self._codes, self._columns):
+            if not column:
+                continue
+            if code and code.endswith('s'):
+                body += b''.join(column)
+            elif code:
+                body += pack(f"<{len(column)}{code}", *column)
+            else:
+                for s in column:
+                    bs = s.encode('utf-8')
+                    _varint(len(bs), body)
+                    body += bs
+        block = bytearray()
+        _varint(n, block)
+        _varint(len(body), block)
+        block += body
+        self.f.write(block)
+        self.bytes_written += len(block)
+        self.rows += n
+
+        self._tlast = tlast
+        self._masklast = masklast
+        self._times = []
+        self._masks = []
+        self._columns = [[] for _ in self._columns]
+
+    def close(self):
+        """Flush buffered updates, detach from the subscription and close the file if we opened it"""
+        if self._sub:
+            self._sub.remove_listener(self.record)
+            self._sub = None
+        self.flush()
+        if self._own_file:
+            self.f.close()
+        else:
+            self.f.flush()
+
+
+def read_recording(f: Union[str, BinaryIO]) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """
+    Read a recording made by FlightRecorder, returning the header and an iterator of blocks.
+    Each block is a dict of NumPy arrays with a row per update:
+    't' is the update time in epoch seconds, 'mask' the bitmask of changed fields
+    (an object array if there are more than 64 fields),
+    and each field name maps to its value after the update,
+    with structured types like DATATYPE_LATLONALT as records, e.g. block['name']['Latitude'].
+    Fields which haven't been seen yet are NaN, zero or empty.
+    Given a path, the blocks iterator owns the file, closing it once exhausted,
+    so call blocks.close() or use it as a context manager to stop reading early.
+    """
+    # numpy is imported on demand since it's optional and slow to import
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("read_recording requires numpy, try `pip install numpy`")
+    fh: BinaryIO = open(f, 'rb') if isinstance(f, str) else f
+    try:
+        magic = fh.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"read_recording: not a recording, got magic {magic!r}")
+        prefix = fh.read(_header_len.size)
+        if len(prefix) < _header_len.size:
+            raise ValueError("read_recording: truncated header")
+        (n,) = _header_len.unpack(prefix)
+        raw = fh.read(n)
+        if len(raw) < n:
+            raise ValueError("read_recording: truncated header")
+        header = json.loads(raw.decode('utf-8'))
+    except BaseException:
+        if isinstance(f, str):
+            fh.close()
+        raise
+
+    def _blocks() -> Iterator[Dict[str, Any]]:
+        defs = header['defs']
+        codes = _field_codes(defs)
+        dtypes = [
+            np.dtype(_structs[d['dtyp']]) if d['dtyp'] in _structs
+            else np.dtype('<' + code) if code else np.dtype(object)
+            for d, code in zip(defs, codes)
+        ]
+        # the value before the first update of each field
+        prev = [
+            np.zeros(1, dtype=dt) if dt.names else np.array([np.nan if dt.kind == 'f' else 0 if code else ''], dtype=dt)
+            for dt, code in zip(dtypes, codes)
+        ]
+        tlast = 0
+        masklast = 0
+        while True:
+            block = _read_block(fh)
+            if block is None:
+                return
+            nrows, body = block
+            offset = 0
+            times = np.empty(nrows, dtype=np.int64)
+            masks: List[int] = []
+            for i in range(nrows):
+                dt, offset = _read_varint(body, offset)
+                tlast += dt
+                times[i] = tlast
+            for i in range(nrows):
+                delta, offset = _read_varint(body, offset)
+                masklast ^= delta
+                masks.append(masklast)
+
+            if len(defs) <= 64:
+                mask_arr = np.array(masks, dtype=np.uint64)
+                present = [((mask_arr >> np.uint64(i)) & np.uint64(1)).astype(bool) for i in range(len(defs))]
+            else:
+                mask_arr = np.array(masks, dtype=object)
+                present = [np.array([(m >> i) & 1 for m in masks], dtype=bool) for i in range(len(defs))]
+
+            result: Dict[str, Any] = dict(t=header['t0'] + times / 1e6, mask=mask_arr)
+            for i, (d, code, dt) in enumerate(zip(defs, codes, dtypes)):
+                count = int(present[i].sum())
+                if code:
+                    values = np.frombuffer(body, dtype=dt, count=count, offset=offset)
+                    offset += count * dt.itemsize
+                else:
+                    strs = []
+                    for _ in range(count):
+                        size, offset = _read_varint(body, offset)
+                        strs.append(body[offset:offset + size].decode('utf-8'))
+                        offset += size
+                    values = np.array(strs, dtype=object)
+                # forward fill: row r takes the latest value up to and including r
+                filled = np.concatenate([prev[i], values])
+                result[d['name']] = filled[np.cumsum(present[i])]
+                prev[i] = filled[-1:]
+            yield result
+
+    return header, _Blocks(_blocks(), fh if isinstance(f, str) else None)
+
+
+class _Blocks:
+    """The blocks of a recording, closing the file they were read from, if any, when exhausted or closed"""
+    def __init__(self, blocks: Iterator[Dict[str, Any]], fh: Optional[BinaryIO]):
+        self._blocks = blocks
+        self._fh = fh
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        try:
+            return next(self._blocks)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+
+def _read_block(fh: BinaryIO) -> Optional[Tuple[int, bytes]]:
+    """read the next (row count, body) from a recording, or None at the end"""
+    prefix = bytearray()
+    values = []
+    while len(values) < 2:
+        b = fh.read(1)
+        if not b:
+            if prefix or values:
+                raise ValueError("read_recording: truncated block header")
+            return None
+        prefix += b
+        if b[0] < 0x80:
+            values.append(_read_varint(prefix, 0)[0])
+            prefix = bytearray()
+    nrows, size = values
+    body = fh.read(size)
+    if len(body) < size:
+        raise ValueError("read_recording: truncated block")
+    return nrows, body
@@ -0,0 +1,174 @@
+"""
+Capture the raw RECV packets received by a SimConnect connection,
+and replay them later through the same dispatch path without the DLL.
+
+A capture file starts with a header, followed by a record per packet:
+
+    magic       b'SCCAP1'
+    header      uint32 length + JSON {"t0": epoch seconds, "name": connection name}
+    packet*     float64 seconds since t0, uint32 nSize, then nSize bytes of the packet
+
+For example, capture a session with
+
+    with SimConnect() as sc:
+        sc.start_capture('incident.sccap')
+        ...
+
+then replay it at twice the original rate with
+
+    with SimConnect(backend=PacketReplay('incident.sccap', speed=2)) as sc:
+        ...
+
+or by setting SIMCONNECT_BACKEND=replay:incident.sccap.
+The replay backend ignores requests, so data packets are routed by their
+original request ids: consumers see the same traffic if they make the same requests in the same order.
+"""
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from ctypes import create_string_buffer, cast, string_at
+from struct import Struct
+from time import time, perf_counter
+import json
+from .scdefs import _decls
+from .receiver import RECV_P
+
+
+MAGIC = b'SCCAP1'
+_header_len = Struct('<I')
+_packet = Struct('<dI')
+
+
+class PacketCapture:
+    """
+    Write each packet passed to write() to a capture file, see the module docstring for the format.
+    Normally created via SimConnect.start_capture()
+    """
+    def __init__(self, f: Union[str, BinaryIO], name=''):
+        self._own_file = isinstance(f, str)
+        self.f: BinaryIO = open(f, 'wb') if isinstance(f, str) else f
+        self.t0 = time()
+        self._start = perf_counter()
+        header = json.dumps(dict(t0=self.t0, name=name)).encode('utf-8')
+        self.f.write(MAGIC + _header_len.pack(len(header)) + header)
+        self.packets = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def write(self, pRecv, nSize: int):
+        """Copy a packet from the SDK's buffer to the capture"""
+        self.f.write(_packet.pack(perf_counter() - self._start, nSize) + string_at(pRecv, nSize))
+        self.packets += 1
+
+    def close(self):
+        if self._own_file:
+            self.f.close()
+        else:
+            self.f.flush()
+
+
+def read_capture(f: Union[str, BinaryIO]) -> Tuple[Dict[str, Any], Iterator[Tuple[float, bytes]]]:
+    """Read a capture file, returning the header and an iterator of (seconds since t0, packet bytes)"""
+    fh: BinaryIO = open(f, 'rb') if isinstance(f, str) else f
+    magic = fh.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ValueError(f"read_capture: not a capture, got magic {magic!r}")
+    (n,) = _header_len.unpack(fh.read(_header_len.size))
+    header = json.loads(fh.read(n).decode('utf-8'))
+
+    def _packets() -> Iterator[Tuple[float, bytes]]:
+        try:
+            while True:
+                prefix = fh.read(_packet.size)
+                if not prefix:
+                    return
+                if len(prefix) < _packet.size:
+                    raise ValueError("read_capture: truncated packet header")
+                t, size = _packet.unpack(prefix)
+                data = fh.read(size)
+                if len(data) < size:
+                    raise ValueError("read_capture: truncated packet")
+                yield t, data
+        finally:
+            if isinstance(f, str):
+                fh.close()
+
+    return header, _packets()
+
+
+class _NoDLL:
+    """Stands in for the DLL to list the SDK functions, each of which succeeds without doing anything"""
+    class _Function:
+        def __call__(self, *args):
+            return 0
+
+    def __getattr__(self, name):
+        return self._Function()
+
+
+class PacketReplay:
+    """
+    A SimConnect backend which delivers the packets from a capture file via CallDispatch or GetNextDispatch.
+    With speed=1 packets are released at their original rate, with speed=N at N times that rate,
+    and with speed=None as fast as possible, up to max_batch packets per CallDispatch.
+    The clock starts at the first dispatch call.  Other SDK functions are accepted but ignored.
+    """
+    def __init__(self, f: Union[str, BinaryIO], speed: Optional[float] = 1.0, max_batch=1000):
+        self.header, packets = read_capture(f)
+        # prepare the buffers up front so replay measures the cost of handling each packet
+        self.packets: List[Tuple[float, Any, int]] = [
+            (t, create_string_buffer(data, max(len(data), 64)), len(data)) for t, data in packets
+        ]
+        self.speed = speed
+        self.max_batch = max_batch
+        self._next = 0
+        self._start: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        """True once every packet has been delivered"""
+        return self._next >= len(self.packets)
+
+    def rewind(self):
+        """Start replaying from the first packet again"""
+        self._next = 0
+        self._start = None
+
+    def decls(self) -> Dict[str, Callable]:
+        decls = _decls(_NoDLL())
+        decls.update(CallDispatch=self.CallDispatch, GetNextDispatch=self.GetNextDispatch)
+        return decls
+
+    def _due(self) -> int:
+        """The index after the last packet which is due for delivery"""
+        n = min(len(self.packets), self._next + self.max_batch)
+        if not self.speed:
+            return n
+        if self._start is None:
+            self._start = perf_counter() - self.packets[0][0] / self.speed if self.packets else 0
+        now = (perf_counter() - self._start) * self.speed
+        end = self._next
+        while end < n and self.packets[end][0] <= now:
+            end += 1
+        return end
+
+    def CallDispatch(self, hSimConnect, pfcnDispatch, pContext) -> int:
+        end = self._due()
+        packets = self.packets
+        for i in range(self._next, end):
+            # advance first, in case a receiver dispatches again
+            self._next = i + 1
+            _, buf, size = packets[i]
+            pfcnDispatch(cast(buf, RECV_P), size, pContext)
+        return 0
+
+    def GetNextDispatch(self, hSimConnect, ppData, pcbData) -> int:
+        if self._due() <= self._next:
+            raise OSError("PacketReplay: no messages waiting")
+        _, buf, size = self.packets[self._next]
+        self._next += 1
+        ppData._obj.contents = cast(buf, RECV_P).contents
+        pcbData._obj.value = size
+        return 0
@@ -1,21 +1,31 @@
-from typing import List, Optional, Type, Any
-from ctypes import byref, sizeof, cast, POINTER, c_void_p
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Type, Union, Any, TYPE_CHECKING
+from concurrent.futures import Future
+from ctypes import byref, sizeof, cast, addressof, c_void_p, c_float
+from heapq import heappush, heappop
 import itertools
 import logging
 import os
-from time import time, sleep
+from time import time, sleep, perf_counter
 from .scdefs import (
     _decls, DispatchProc,
-    RECV, DATA_REQUEST_FLAG_CHANGED, DATA_REQUEST_FLAG_TAGGED,
-    OBJECT_ID_USER, PERIOD_SECOND, PERIOD_ONCE,
+    RECV, RECV_SIMOBJECT_DATA, RECV_SIMOBJECT_DATA_BYTYPE, DATA_REQUEST_FLAG_CHANGED, DATA_REQUEST_FLAG_TAGGED,
+    OBJECT_ID_USER, SIMOBJECT_TYPE_AIRCRAFT, PERIOD_SECOND, PERIOD_ONCE, DATATYPE_FLOAT64,
     GROUP_PRIORITY_HIGHEST, EVENT_FLAG_GROUPID_IS_PRIORITY,
     HANDLE, windll,
 )
-from .receiver import Receiver, ReceiverInstance, _default_receivers
-from .datadef import SimVarsSpec, DataDefinition, SimData, SimDataHandler, _norm_simvars, map_event_id
-
+from .receiver import Receiver, ReceiverInstance, ReceiverTable, _default_receivers
+from .datadef import (
+    SimVarsSpec, DataDefinition, DefinitionRegistry, Subscription, Setter, SimData, SimDataHandler, DecodedHandler,
+    _norm_simvars, _validate_simvars, map_event_id
+)
+from .changedict import ChangeDict
+from .scvars import _namestd
+if TYPE_CHECKING:
+    # optional features are imported on first use to keep `import simconnect` fast
+    from .objecttable import ObjectTable
+    from .replay import PacketCapture
+    from .metrics import Metrics
 
-RECV_P = POINTER(RECV)
 
 # to change the default logging, set the LOGLEVEL environment variable, e.g. LOGLEVEL=DEBUG
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
@@ -23,19 +33,48 @@ logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
 _dll_path = os.path.join(os.path.dirname(__file__), 'SimConnect.dll')
 
 
+# the measurements reported by RequestResponseTimes, in order
+_response_time_names = ('round_trip', 'request_sent', 'request_received', 'response_sent', 'response_received')
+
+
 class SimConnect:
     def __init__(
             self,
             name='pySimConnect',
             dll_path=_dll_path,
             default_receivers=_default_receivers,
-            poll_interval_seconds=0.05):
-        try:
-            dll = windll.LoadLibrary(dll_path)
-        except Exception:
-            logging.error(f"Failed to load SimConnect DLL from {dll_path}")
-            raise
-        self._decls = _decls(dll)
+            poll_interval_seconds=0.05,
+            backend=None,
+            metrics=False,
+            max_definitions=1000):
+        """
+        Open a connection to the SimConnect SDK via SimConnect.dll,
+        or via an alternative backend which provides the SDK functions with a decls() method,
+        e.g. SimConnectEmulator for testing without Flight Simulator.
+        Set the SIMCONNECT_BACKEND environment variable to 'emulator' to use a default emulator,
+        or to 'replay:<path>' to replay a capture file, see start_capture().
+        With metrics=True, collect message counts and timings, see stats().
+        At most max_definitions data definitions are kept registered with the sim,
+        clearing the least recently used idle ones as needed, see DefinitionRegistry
+        """
+        backend = backend or os.environ.get('SIMCONNECT_BACKEND')
+        if backend == 'emulator':
+            from .emulator import SimConnectEmulator
+            backend = SimConnectEmulator()
+        elif isinstance(backend, str) and backend.startswith('replay:'):
+            from .replay import PacketReplay
+            backend = PacketReplay(backend[len('replay:'):])
+        if backend:
+            self._decls = backend.decls()
+        else:
+            try:
+                dll = windll.LoadLibrary(dll_path)
+            except Exception:
+                logging.error(f"Failed to load SimConnect DLL from {dll_path}")
+                raise
+            self._decls = _decls(dll)
+        self.backend = backend
+        self.name = name
         self.hsc = HANDLE()
         # All methods other than open pass the sc HANDLE as the first arg
         try:
@@ -44,13 +83,27 @@ class SimConnect:
             logging.error("Failed to open SimConnect, is Flight Simulator running?")
             raise
         self._reqid_iter = itertools.count()
-        self._receivers: List[ReceiverInstance] = default_receivers[:]
+        self.definitions = DefinitionRegistry(self, max_definitions)
+        # client event ids mapped by send_event, see map_event_id
+        self.event_ids: Dict[str, int] = {}
+        self._receivers = ReceiverTable(default_receivers)
+        self._dispatch_proc = DispatchProc(self._dispatcher)
+        self._received = 0
+        self._capture: Optional['PacketCapture'] = None
+        self.metrics: Optional['Metrics'] = None
+        if metrics:
+            from . import metrics as metrics_module
+            self.metrics = metrics_module.Metrics()
+        # one-shot requests awaiting a response, keyed by request id, with a heap of their deadlines
+        self._pending: Dict[int, Future] = {}
+        self._deadlines: List[Tuple[float, int]] = []
         self.poll_interval_seconds = poll_interval_seconds
 
     def __enter__(self):
         return self
 
     def __exit__(self, type, value, traceback):
+        self.stop_capture()
         self.Close()
 
     def __getattr__(self, k):
@@ -66,27 +119,80 @@ class SimConnect:
             return f(self.hsc, *args)
         return _callable
 
-    def add_receiver(self, rtype: Type[RECV], receiver: Receiver):
+    def add_receiver(self, rtype: Type[RECV], receiver: Receiver, req_id: Optional[int] = None) -> ReceiverInstance:
         """
-        Adds a receiver to handle type recv_type
-        Any additional kwargs will be passed to the receiver when it's called
+        Adds a receiver to handle type recv_type.
+        If req_id is given, the receiver only sees messages with a matching dwRequestID,
+        e.g. RECV_SIMOBJECT_DATA in response to a specific request.
         Returns an identifer for the receiver which can be used to remove it
         """
-        self._receivers.append(ReceiverInstance(rtype, receiver))
+        r = ReceiverInstance(rtype, receiver, req_id)
+        self._receivers.add(r)
+        return r
 
-    def remove_receiver(self, receiver: Receiver) -> bool:
-        """Remove a receiver instance by id, return True if found"""
-        n = len(self._receivers)
-        self._receivers = [r for r in self._receivers if r._receiver == receiver]
-        return len(self._receivers) < n
+    def remove_receiver(self, receiver: Union[Receiver, ReceiverInstance]) -> bool:
+        """Remove a receiver by identifier, or all instances of a receiver function, return True if found"""
+        return self._receivers.remove(receiver)
 
     def _dispatcher(self, pRecv, nSize, pContext):
-        """Dispatch to all our handlers whenever we get a RECV object"""
+        """Dispatch to our matching handlers whenever we get a RECV object"""
         recv = ReceiverInstance.cast_recv(pRecv)
         logging.debug(f"receive: got {recv.__class__.__name__} with size {nSize} and context {pContext}")
-        self._received = sum(r.receive(recv) for r in self._receivers)
-        if not self._received:
+        if self._capture:
+            self._capture.write(pRecv, nSize)
+        metrics = self.metrics
+        if metrics:
+            t0 = perf_counter()
+            received = self._receivers.dispatch(recv)
+            name = recv.__class__.__name__
+            metrics.observe('dispatch.' + name, perf_counter() - t0)
+            metrics.count('recv.' + name)
+            metrics.count('recv_bytes', nSize)
+            if not received:
+                metrics.count('recv_unhandled')
+        else:
+            received = self._receivers.dispatch(recv)
+        if not received:
             logging.warn(f"receive: no receiver found for {recv.__class__.__name__}")
+        self._received += received
+
+    def start_capture(self, f: Union[str, BinaryIO]) -> 'PacketCapture':
+        """
+        Write a copy of every packet we receive to a capture file,
+        which can be replayed later with SimConnect(backend=PacketReplay(...))
+        """
+        from .replay import PacketCapture
+        self.stop_capture()
+        self._capture = PacketCapture(f, self.name)
+        return self._capture
+
+    def stop_capture(self):
+        """Stop capturing packets and close the capture file"""
+        if self._capture:
+            self._capture.close()
+            self._capture = None
+
+    def dispatch(self) -> int:
+        """
+        Call the SDK dispatcher once without waiting, handling any pending messages.
+        Returns the number of times a receiver accepted a message
+        """
+        self._received = 0
+        self.CallDispatch(self._dispatch_proc, None)
+        if self._deadlines:
+            self._expire_pending()
+        return self._received
+
+    def _expire_pending(self):
+        """Fail any pending requests which have passed their deadline"""
+        now = time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, req_id = heappop(self._deadlines)
+            fut = self._pending.get(req_id)
+            if fut:
+                if self.metrics:
+                    self.metrics.count('request_timeouts')
+                fut.set_exception(TimeoutError(f"SimConnect: request {req_id} timed out"))
 
     def receive(self, timeout_seconds=None) -> bool:
         """
@@ -95,13 +201,44 @@ class SimConnect:
         Returns true if we received a message
         """
         tmax = time() + timeout_seconds if timeout_seconds else None
-        self._received = 0
         while True:
-            self.CallDispatch(DispatchProc(self._dispatcher), None)
-            if self._received or not tmax or time() > tmax:
+            received = self.dispatch()
+            if received or not tmax or time() > tmax:
                 break
             sleep(self.poll_interval_seconds)
-        return self._received > 0
+            if self.metrics:
+                self.metrics.count('receive_sleep_seconds', self.poll_interval_seconds)
+        return received > 0
+
+    def response_times(self, count=5) -> Dict[str, float]:
+        """
+        Get the sim-side latency of the most recent round trip via RequestResponseTimes, in seconds:
+        the total round trip, then from our request until it's sent, received by the server,
+        and responded to, and from the response until we receive it
+        """
+        elapsed = (c_float * count)()
+        self.RequestResponseTimes(count, elapsed)
+        return dict(zip(_response_time_names, elapsed))
+
+    def stats(self, include_sim=False) -> Dict[str, Any]:
+        """
+        Return a snapshot of the connection's state and metrics:
+        the number of active receivers and pending requests,
+        and with metrics=True, counts and rates for each type of message received,
+        and latency histograms for dispatching each message type,
+        and for decoding and callbacks for each DataDefinition.
+        With include_sim=True, also ask the sim for its response_times(),
+        which costs a call to the sim, so is best left off when polling stats frequently
+        """
+        stats: Dict[str, Any] = dict(
+            receivers=len(self._receivers),
+            pending=len(self._pending),
+        )
+        if include_sim:
+            stats['response_times'] = self.response_times()
+        if self.metrics:
+            stats.update(self.metrics.snapshot())
+        return stats
 
     def get_simdatum(
             self,
@@ -122,35 +259,161 @@ class SimConnect:
         if you plan to query the same data frequently use subscribe_simdata instead.
         waits up to timeout_seconds for a response,
         returning SimData (a dictionary that supports changedsince, see changedict.py)
+        which is empty if there was no response
+        """
+        fut = self.request_simdata(simvars, timeout_seconds or 1)
+        self.wait([fut])
+        try:
+            return fut.result(0)
+        except TimeoutError:
+            return ChangeDict()
+
+    def request_simdata(self, simvars: SimVarsSpec, timeout_seconds=1) -> Future:
         """
-        dd = self.subscribe_simdata(simvars, period=PERIOD_ONCE, repeat_count=1, flags=0)
-        tmax = time() + (timeout_seconds or 1)
-        # we'll potentially receive other messages while we're looking for this result
-        # so wait up to timeout_seconds total while there are messages and we haven't got data yet
-        while self.receive(tmax - time()) and not dd.simdata:
-            pass
-        self._receivers.pop()
-        return dd.simdata
+        Request a snapshot of one or more simvars without waiting for the response.
+        Returns a Future which resolves to SimData when the response is received
+        by receive(), dispatch() or wait(), or fails with TimeoutError after timeout_seconds.
+        Many requests can be pipelined, e.g.
+
+            futures = [sc.request_simdata(simvars) for simvars in batch]
+            sc.wait(futures)
+            results = [f.result() for f in futures]
+        """
+        dd = DataDefinition.create(self, simvars)
+        dd._refs += 1
+        req_id = next(self._reqid_iter)
+        fut: Future = Future()
+
+        def _receiver(recv: RECV_SIMOBJECT_DATA) -> bool:
+            if not fut.done():
+                fut.set_result(dd.decode_simdata(recv))
+            return True
+
+        r = self.add_receiver(RECV_SIMOBJECT_DATA, _receiver, req_id)
+        self._add_pending(req_id, fut, r, dd, timeout_seconds)
+        self.RequestDataOnSimObject(req_id, dd.id, OBJECT_ID_USER, PERIOD_ONCE, 0, 0, 1, 1)
+        return fut
+
+    def _add_pending(self, req_id: int, fut: Future, r: ReceiverInstance, dd: DataDefinition, timeout_seconds):
+        """Track a one-shot request until its future is resolved, expires or is cancelled"""
+        def _forget(_: Future):
+            # remove the request and its receiver
+            del self._pending[req_id]
+            self.remove_receiver(r)
+            dd._refs -= 1
+
+        self._pending[req_id] = fut
+        heappush(self._deadlines, (time() + timeout_seconds, req_id))
+        fut.add_done_callback(_forget)
+
+    def get_simdata_bytype(
+            self,
+            simvars: SimVarsSpec,
+            radius_meters=200_000,
+            object_type=SIMOBJECT_TYPE_AIRCRAFT,
+            timeout_seconds=1,
+            use_numpy: Optional[bool] = None) -> 'ObjectTable':
+        """
+        Get a snapshot of one or more simvars for every object of object_type within radius_meters
+        of the user's aircraft, as an ObjectTable with a column for each simvar.
+        Waits up to timeout_seconds, returning whatever rows have arrived, see table.complete.
+        The table uses numpy arrays when it's installed, unless use_numpy=False
+        """
+        fut = self.request_simdata_bytype(simvars, radius_meters, object_type, timeout_seconds or 1, use_numpy)
+        self.wait([fut])
+        return fut.table    # type: ignore
+
+    def request_simdata_bytype(
+            self,
+            simvars: SimVarsSpec,
+            radius_meters=200_000,
+            object_type=SIMOBJECT_TYPE_AIRCRAFT,
+            timeout_seconds=1,
+            use_numpy: Optional[bool] = None) -> Future:
+        """
+        Request a snapshot of simvars for many objects via RequestDataOnSimObjectType
+        without waiting for the response, like request_simdata.
+        Returns a Future which resolves to an ObjectTable once the packets for all objects are received,
+        or fails with TimeoutError.  The table being filled is also available as fut.table.
+        The SDK limits radius_meters to 200km, and only returns the user's aircraft when it's zero.
+        """
+        from .objecttable import ObjectTable
+        dd = DataDefinition.create(self, simvars)
+        dd._refs += 1
+        req_id = next(self._reqid_iter)
+        fut: Future = Future()
+        table = fut.table = ObjectTable(dd, use_numpy)     # type: ignore
+
+        def _receiver(recv: RECV_SIMOBJECT_DATA_BYTYPE) -> bool:
+            if not fut.done() and table.add(recv):
+                fut.set_result(table)
+            return True
+
+        r = self.add_receiver(RECV_SIMOBJECT_DATA_BYTYPE, _receiver, req_id)
+        self._add_pending(req_id, fut, r, dd, timeout_seconds)
+        self.RequestDataOnSimObjectType(req_id, dd.id, radius_meters, object_type)
+        return fut
+
+    def wait(self, futures: Iterable[Future], timeout_seconds=None) -> bool:
+        """
+        Poll the SDK for messages until all the futures are done,
+        or until timeout_seconds if specified.
+        Pending requests always finish by their own deadline.
+        Returns true if all the futures are done
+        """
+        tmax = time() + timeout_seconds if timeout_seconds else None
+        waiting = [f for f in futures if not f.done()]
+        while waiting:
+            if tmax and time() > tmax:
+                return False
+            if not self.dispatch():
+                sleep(self.poll_interval_seconds)
+            waiting = [f for f in waiting if not f.done()]
+        return True
 
     def subscribe_simdata(
-            self, simvars: SimVarsSpec,
+            self, simvars: Union[SimVarsSpec, DataDefinition],
             period=PERIOD_SECOND,
             skip_periods=0,   # number of periods to skip before starting
             interval=1,       # number of periods between updates
             repeat_count=0,   # number of updates before stopping (0 = forever)
             flags=DATA_REQUEST_FLAG_CHANGED | DATA_REQUEST_FLAG_TAGGED,
-            callback: Optional[SimDataHandler] = None
-            ):
+            callback: Optional[SimDataHandler] = None,
+            history=0,        # keep the last history updates in sub.history, see history.py
+            ) -> Subscription:
         """
-        Create and subscribe to a data definition.
-        The returned data definition provides methods to access the
-        current data (via dd.simdata) and inferred units etc.
+        Create and subscribe to a data definition, or subscribe to an existing one.
+        The returned subscription provides methods to access the
+        current data (via sub.simdata) and inferred units etc,
+        and to stop the updates with sub.cancel().
         If the optional callback is provided, it will be called
-        with dd.simdata whenever the data is changed.
+        with sub.simdata whenever the data is changed.
+        With history > 0, each update is also appended to a numpy ring buffer, sub.history.
+        Unless it's already one of the simvars, SIMULATION TIME is added to the data definition
+        to timestamp the updates, but it's only recorded in the history, not in sub.simdata,
+        and the callback still only sees changes to the requested simvars.
         """
-        dd = DataDefinition.create(self, simvars)
+        visible: Optional[int] = None
+        if history:
+            from .history import History, SIM_TIME
+        if isinstance(simvars, DataDefinition):
+            dd = self.definitions.activate(simvars)
+        elif history:
+            defs = _validate_simvars(simvars)
+            if not any(_namestd(d['name']) == SIM_TIME for d in defs):
+                # SIMULATION TIME is missing from the documented simvars, so add it pre-validated
+                visible = len(defs)
+                defs.append(dict(name=SIM_TIME, units='seconds', dtyp=DATATYPE_FLOAT64, epsilon=0))
+            dd = DataDefinition.from_defs(self, defs)
+        else:
+            dd = DataDefinition.create(self, simvars)
         req_id = next(self._reqid_iter)
-        dd.add_receiver(self, req_id, callback)
+        listeners: List[DecodedHandler] = []
+        r = dd.add_receiver(self, req_id, callback, listeners, visible)
+        sub = Subscription(self, dd, req_id, r, listeners)
+        if history:
+            sub.history = History(dd, history)
+            listeners.append(sub.history.update)
         # note the SDK doc for first two args is misleading/wrong
         self.RequestDataOnSimObject(
             req_id,
@@ -162,7 +425,7 @@ class SimConnect:
             interval,
             repeat_count
         )
-        return dd
+        return sub
 
     def set_simdatum(self, name, value, units=None):
         """Set a single simulator variable"""
@@ -179,10 +442,7 @@ class SimConnect:
         values = {d['name']: d['value'] for d in sds}
         data = dd._pack_data(values)
         logging.debug(f"setting simdata {sds} with {sizeof(data)} bytes")
-        #TODO: some data types can be also be set as array,
-        # e.g. any number of waypoints can be given to an AI object using a single call to this function,
-        # and any number of marker state structures can also be combined into an array
-        # in that case number of items would be greater than 1
+        # see set_simdata_array to set many items at once
         self.SetDataOnSimObject(
             dd.id,
             OBJECT_ID_USER,
@@ -192,6 +452,44 @@ class SimConnect:
             cast(byref(data), c_void_p),  # pointer to start of data
         )
 
+    def set_simdata_array(self, simvars: SimVarsSpec, records, object_id=OBJECT_ID_USER) -> int:
+        """
+        Set an array of items with a single SetDataOnSimObject call,
+        e.g. a flight plan for an AI aircraft as a list of waypoints:
+
+            sc.set_simdata_array(
+                dict(name='AI WAYPOINT LIST', units='number', type=DATATYPE_WAYPOINT),
+                [dict(Latitude=47.6, Longitude=-122.3, Altitude=3000, Flags=WAYPOINT_SPEED_REQUESTED, ktsSpeed=150),
+                 ...],
+                object_id=ai_object_id,
+            )
+
+        The simvars are specified like set_simdata without values,
+        and records are dicts of values keyed by simvar name, or just the value for a single simvar,
+        or a numpy structured array with fields matching the simvars,
+        or the fields of a single structured simvar, e.g. with dtype np.dtype(DATA_WAYPOINT).
+        Returns the number of items sent.
+        """
+        dd = DataDefinition.create(self, simvars, settable=True)
+        data, count = dd._pack_array(records)
+        if not count:
+            return 0
+        item_size = sizeof(dd._struct_type())
+        pointer = data.ctypes.data if hasattr(data, 'ctypes') else addressof(data)
+        self.SetDataOnSimObject(dd.id, object_id, 0, count, item_size, c_void_p(pointer))
+        return count
+
+    def setter(self, simvars: SimVarsSpec, object_id=OBJECT_ID_USER) -> Setter:
+        """
+        Return a reusable Setter for one or more simvars, specified like set_simdata without values,
+        which is much cheaper than set_simdata for repeated updates, e.g.
+
+            with sc.setter(['AILERON POSITION', 'ELEVATOR POSITION']) as controls:
+                while flying:
+                    controls(aileron, elevator)
+        """
+        return Setter(self, DataDefinition.create(self, simvars, settable=True), object_id)
+
     def send_event(self, event, data=0):
         """Send an event to FlightSim, see datadef.EVENTS"""
         client_id = map_event_id(self, event)
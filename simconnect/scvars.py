@@ -1,9 +1,12 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Mapping, Sequence, Tuple
 import re
 import os
 import json
+import zlib
 import logging
 from difflib import get_close_matches
+from itertools import islice
+from heapq import nlargest
 from .scdefs import DATATYPE_INT32, DATATYPE_FLOAT64, DATATYPE_STRING256
 
 
@@ -12,7 +15,8 @@ def validate_simvar(name: str, settable: bool) -> Optional[Dict[str, Any]]:
     base = _namestd(name)
     sv = SIMVARS.get(base, {})
     if not sv:
-        logging.warning(f"SimConnect: unrecognized simvar '{base}', {_closemsg(base, SIMVARS)}")
+        msg = _closemsg(base, SIMVARS.keys(), _suggestions('VARIABLES'))
+        logging.warning(f"SimConnect: unrecognized simvar '{base}', {msg}")
     else:
         if sv['indexed'] and ':' not in name:
             logging.warning(f"SimConnect: expected indexed simvar, e.g. {name}:3")
@@ -43,16 +47,15 @@ def validate_units(name: str, units: Optional[str], simvar: Optional[Dict[str, A
         ustd = units
     else:
         # get the canonical unit name
-        ustd = _unitstd(units)[0]
-        if ustd in UNITS:
-            ustd = UNITS[ustd]['name_std']
-        else:
+        ustd, known = _canonical_units(units)
+        if not known:
             possibilities: List[str] = []
             if simvar:
                 possibilities = DIMENSIONS.get(simvar['dimensions'])
-            if not possibilities:
-                possibilities = [u['name_std'] for u in UNITS.values()]
-            msg = _closemsg(ustd, possibilities)
+            if possibilities:
+                msg = _closemsg(ustd, possibilities)
+            else:
+                msg = _closemsg(ustd, UNITS.names(), _suggestions('UNITS'))
             logging.warning(f"SimConnect: unrecognized units '{units}' for {name}, {msg}")
     return ustd
 
@@ -79,16 +82,58 @@ def type_for_unit(unit: str) -> int:
     return DATATYPE_FLOAT64
 
 
-def _closemsg(s, ss):
-    xs = get_close_matches(s, ss)
+def _closemsg(s: str, ss: Sequence[str], index: Optional['NGramIndex'] = None) -> str:
+    xs = index.close_matches(s) if index else get_close_matches(s, ss)
     if xs:
         msg = f"perhaps one of {', '.join(xs)}?"
     else:
-        options = (ss[:3] + ['...']) if len(ss) > 3 else ss
+        options = list(islice(ss, 4))
+        if len(options) > 3:
+            options[3] = '...'
         msg = f"found no similar options among: {', '.join(options)}"
     return msg
 
 
+class NGramIndex:
+    """
+    Suggest close matches for a misspelled word from a large vocabulary in bounded time.
+    Words sharing the most trigrams with the query are shortlisted
+    and then ranked by difflib like get_close_matches.
+    """
+    def __init__(self, words: Sequence[str], shortlist=64):
+        self.words = list(words)
+        self.shortlist = shortlist
+        self.postings: Dict[str, List[int]] = {}
+        for i, w in enumerate(self.words):
+            for g in self._ngrams(w):
+                self.postings.setdefault(g, []).append(i)
+
+    @staticmethod
+    def _ngrams(w: str) -> set:
+        w = f"  {w.upper()} "
+        return {w[i:i+3] for i in range(len(w) - 2)}
+
+    def close_matches(self, s: str, n=3, cutoff=0.6) -> List[str]:
+        counts: Dict[int, int] = {}
+        for g in self._ngrams(s):
+            for i in self.postings.get(g, ()):
+                counts[i] = counts.get(i, 0) + 1
+        best = nlargest(self.shortlist, counts, key=counts.__getitem__)
+        return get_close_matches(s, [self.words[i] for i in best], n, cutoff)
+
+
+_suggestion_indexes: Dict[str, NGramIndex] = {}
+
+
+def _suggestions(kind: str) -> NGramIndex:
+    """Build the suggestion index for unknown simvars or units on first use"""
+    index = _suggestion_indexes.get(kind)
+    if index is None:
+        words = UNITS.names() if kind == 'UNITS' else SIMVARS.keys()
+        index = _suggestion_indexes[kind] = NGramIndex(words)
+    return index
+
+
 def _namestd(s) -> str:
     return s.rsplit(':', 1)[0].upper().replace('_', ' ')
 
@@ -115,19 +160,185 @@ def _unitstd(ss, canonical=True) -> List[str]:
     return vs
 
 
+_unit_aliases: Optional[Dict[str, str]] = None
+_unit_memo: Dict[str, Tuple[str, bool]] = {}
+_unit_memo_size = 1024
+
+
+def _canonical_units(units: str) -> Tuple[str, bool]:
+    """
+    Return the standard name for units and whether they're recognized,
+    looking up common spellings in the table precomputed by ../scripts/mkdb.py
+    and memoizing others rather than rerunning _unitstd on every call
+    """
+    global _unit_aliases
+    if _unit_aliases is None:
+        _unit_aliases = dict(_query("SELECT alias, name_std FROM unit_aliases")) if _use_db() else {}
+    name_std = _unit_aliases.get(units)
+    if name_std is not None:
+        return name_std, True
+    v = _unit_memo.get(units)
+    if v is None:
+        ustd = _unitstd(units)[0]
+        v = (UNITS[ustd]['name_std'], True) if ustd in UNITS else (ustd, False)
+        if len(_unit_memo) >= _unit_memo_size:
+            # evict the oldest entry
+            del _unit_memo[next(iter(_unit_memo))]
+        _unit_memo[units] = v
+    return v
+
+
 def _eventstd(s):
     return s.upper()
 
 
-# Load SDK definitions scraped from documentation, see ../scripts/scrapevars.py
-try:
-    _scvars = json.load(open(os.path.join(os.path.dirname(__file__), 'scvars.json')))
-except Exception:
-    logging.warning('Failed to load scvars.json')
-    _scvars = dict(SIMVARS={}, EVENTS={}, UNITS={}, DIMENSIONS={})
+class Metadata(Mapping):
+    """
+    A read-only mapping of one kind of SDK definition, e.g. VARIABLES,
+    which loads entries on demand from the compiled scvars.db, see ../scripts/mkdb.py,
+    or from scvars.json if the database is unavailable.  Nothing is read until first use.
+    """
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._cache: Dict[str, Any] = {}
+        self._complete = False
+        self._keys: Optional[List[str]] = None
+        self._keyset: Optional[frozenset] = None
+        self._names: Optional[List[str]] = None
+
+    def _lazy(self) -> bool:
+        """True if entries should be loaded from the database as needed"""
+        if self._complete:
+            return False
+        if _use_db():
+            return True
+        self._cache = _load_json().get(self.kind, {})
+        self._complete = True
+        return False
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._cache or not self._lazy():
+            return self._cache[key]
+        row = _query("SELECT value FROM scvars WHERE kind=? AND key=?", (self.kind, key)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        v = self._cache[key] = json.loads(row[0])
+        return v
+
+    def __contains__(self, key) -> bool:
+        if key in self._cache:
+            return True
+        if not self._lazy():
+            return key in self._cache
+        if self._keyset is None:
+            self._keyset = frozenset(self.keys())
+        return key in self._keyset
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def keys(self) -> List[str]:   # type: ignore
+        if self._keys is None:
+            if self._lazy():
+                rows = _query("SELECT key FROM scvars WHERE kind=? ORDER BY seq", (self.kind,))
+                self._keys = [k for (k,) in rows]
+            else:
+                self._keys = list(self._cache)
+        return self._keys
+
+    def values(self):
+        self._load_all()
+        return self._cache.values()
+
+    def items(self):
+        self._load_all()
+        return self._cache.items()
+
+    def names(self) -> List[str]:
+        """The display names of each entry, e.g. 'meter' for units, without loading the entries"""
+        if self._names is None:
+            if self._lazy():
+                rows = _query("SELECT name FROM scvars WHERE kind=? ORDER BY seq", (self.kind,))
+                self._names = [name for (name,) in rows]
+            else:
+                self._names = [_display_name(self.kind, k, d) for k, d in self._cache.items()]
+        return self._names
+
+    def _load_all(self):
+        if self._lazy():
+            rows = _query("SELECT key, value FROM scvars WHERE kind=? ORDER BY seq", (self.kind,))
+            self._cache = {k: json.loads(v) for k, v in rows}
+            self._complete = True
+
+
+def _display_name(kind: str, key: str, d: Any) -> str:
+    """The name shown by autocompletion, see cli.py, also stored in scvars.db by scripts/mkdb.py"""
+    if kind == 'DIMENSIONS':
+        return key
+    return d['name_std'] if kind == 'UNITS' else d['name']
+
+
+_thisdir = os.path.dirname(__file__)
+_dbpath = os.path.join(_thisdir, 'scvars.db')
+_jsonpath = os.path.join(_thisdir, 'scvars.json')
+_db = None
+_db_ok: Optional[bool] = None
+_json: Optional[Dict[str, Any]] = None
+
+
+def _query(sql: str, params=()):
+    global _db
+    if _db is None:
+        import sqlite3
+        _db = sqlite3.connect(f"file:{_dbpath}?mode=ro", uri=True, check_same_thread=False)
+    return _db.execute(sql, params)
+
+
+def _source_checksum(path: str) -> str:
+    """
+    A checksum of scvars.json, ignoring line endings so a checkout with CRLF still matches.
+    crc32 is plenty to detect edits and much cheaper than a cryptographic hash on the import path
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if b'\r' in data:
+        data = data.replace(b'\r\n', b'\n')
+    return f'{zlib.crc32(data):08x}'
+
+
+def _use_db() -> bool:
+    """Check once whether scvars.db exists and was built from the current scvars.json"""
+    global _db_ok
+    if _db_ok is None:
+        _db_ok = False
+        if os.path.exists(_dbpath):
+            try:
+                row = _query("SELECT value FROM meta WHERE key='source_crc32'").fetchone()
+                _db_ok = not os.path.exists(_jsonpath) or (row is not None and row[0] == _source_checksum(_jsonpath))
+                if not _db_ok:
+                    logging.warning('scvars.db is out of date, rebuild with scripts/mkdb.py')
+            except Exception:
+                logging.warning('Failed to read scvars.db')
+    return _db_ok
+
+
+def _load_json() -> Dict[str, Any]:
+    global _json
+    if _json is None:
+        # Load SDK definitions scraped from documentation, see ../scripts/scrapevars.py
+        try:
+            _json = json.load(open(_jsonpath))
+        except Exception:
+            logging.warning('Failed to load scvars.json')
+            _json = {}
+    return _json
+
 
 # Expose the standardized definitions scraped from docs
-SIMVARS = _scvars['VARIABLES']
-EVENTS = _scvars['EVENTS']
-UNITS = _scvars['UNITS']
-DIMENSIONS = _scvars['DIMENSIONS']
+SIMVARS = Metadata('VARIABLES')
+EVENTS = Metadata('EVENTS')
+UNITS = Metadata('UNITS')
+DIMENSIONS = Metadata('DIMENSIONS')
@@ -0,0 +1,317 @@
+"""
+Full text search over the SDK documentation, used by `simconnect search`.
+The index is an SQLite database of inverted postings built by ../scripts/mkidx.py,
+holding the BM25 score of each term in each document field as computed by lunr.
+Queries use lunr's syntax, e.g. 'alti*', 'alti~1', '+kind:EVENTS altimeter' or 'flaps^10 -handle',
+and return the same results as lunr's Index.search, but only read
+the postings for the query terms rather than loading the whole index.
+Queries are parsed and stemmed here rather than by lunr, whose import alone is slower than a search.
+"""
+from __future__ import annotations
+from math import sqrt
+import os
+import sqlite3
+
+from ._porter import stem
+
+# the CLI imports this for each search, so avoid the cost of importing typing at runtime
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+OPTIONAL, REQUIRED, PROHIBITED = '', '+', '-'
+# lexeme types
+_FIELD, _TERM, _EDIT_DISTANCE, _BOOST, _PRESENCE = 'FIELD', 'TERM', 'EDIT_DISTANCE', 'BOOST', 'PRESENCE'
+# lunr's default term separators, but leading + and - mark presence
+_SEPARATORS = " \t\n\r\f\v\xa0-"
+
+
+class QueryParseError(ValueError):
+    pass
+
+
+class Clause:
+    """A single term to match, with optional field, presence, edit distance and boost as in lunr.Clause"""
+    def __init__(self, fields: List[str]):
+        self.term = ''
+        self.fields = fields
+        self.presence = OPTIONAL
+        self.edit_distance = 0
+        self.boost = 1
+        # wildcard terms aren't stemmed
+        self.use_pipeline = True
+
+
+class SearchIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._fields: Optional[List[str]] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"SearchIndex: missing {self.path}, see scripts/mkidx.py")
+            self._db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        return self._db
+
+    @property
+    def fields(self) -> List[str]:
+        if self._fields is None:
+            self._fields = [name for (name,) in self.db.execute("SELECT name FROM fields ORDER BY id")]
+        return self._fields
+
+    def search(self, q: str) -> List[Dict[str, Any]]:
+        """
+        Return matching documents as a list of dict(ref=..., score=...) in descending order of score.
+        Raises QueryParseError for malformed queries.
+        """
+        return self.query(parse_query(q, self.fields))
+
+    def _expand(self, term: str, edit_distance: int) -> List[int]:
+        """Find the ids of indexed terms matching a term with optional wildcards or edit distance"""
+        if edit_distance:
+            return [
+                tid for t, tid in self._fuzzy_candidates(term, edit_distance)
+                if _within_distance(term, t, edit_distance)
+            ]
+        if '*' in term:
+            # GLOB uses * like lunr, so escape its other special characters
+            pattern = term.replace('[', '[[]').replace('?', '[?]')
+            prefix = term.split('*', 1)[0]
+            if prefix:
+                # use the term index to narrow the range before matching the pattern
+                rows = self.db.execute(
+                    "SELECT term, id FROM terms WHERE term >= ? AND term < ? AND term GLOB ?",
+                    (prefix, prefix + '\U0010ffff', pattern))
+            else:
+                rows = self.db.execute("SELECT term, id FROM terms WHERE term GLOB ?", (pattern,))
+            # list terms in the order lunr's token set does, a depth first walk in reverse order,
+            # so that results with tied scores are ranked the same way
+            return [tid for _, tid in sorted(rows, key=lambda r: r[0] + '\U0010ffff', reverse=True)]
+        row = self.db.execute("SELECT id FROM terms WHERE term = ?", (term,)).fetchone()
+        return [row[0]] if row else []
+
+    def _fuzzy_candidates(self, term: str, edit_distance: int) -> List[Tuple[str, int]]:
+        """
+        Cheaply narrow the terms which might be within edit_distance of term,
+        first by length in SQL and then by the characters they contain,
+        since each edit adds or removes at most one distinct character
+        """
+        n, mask = len(term), _charmask(term)
+        rows = self.db.execute(
+            "SELECT term, id, mask FROM terms WHERE length BETWEEN ? AND ? ORDER BY term",
+            (n - edit_distance, n + edit_distance))
+        return [
+            (t, tid) for t, tid, m in rows
+            if bin(m & ~mask).count('1') <= edit_distance and bin(mask & ~m).count('1') <= edit_distance
+        ]
+
+    def _postings(self, tid: int, field: int) -> Dict[int, float]:
+        """Map each document containing term tid in field to the term's score"""
+        rows = self.db.execute(
+            "SELECT doc, score FROM postings WHERE term = ? AND field = ? ORDER BY doc", (tid, field))
+        return dict(rows)
+
+    def query(self, clauses: List[Clause]) -> List[Dict[str, Any]]:
+        """Run a parsed query, following the logic of lunr's Index.query"""
+        field_ids = {field: i for i, field in enumerate(self.fields)}
+        # the query vector for each field, mapping term id to boost
+        query_vectors: List[Dict[int, float]] = [{} for _ in self.fields]
+        postings: Dict[Tuple[int, int], Dict[int, float]] = {}
+        # (doc, field) pairs which match some term, in the order lunr finds them
+        matching: Dict[Tuple[int, int], None] = {}
+        # None represents the complete set of documents
+        required: Dict[int, Optional[Set[int]]] = {}
+        prohibited: Dict[int, Set[int]] = {}
+
+        for clause in clauses:
+            term = stem(clause.term) if clause.use_pipeline else clause.term
+            fields = [field_ids[f] for f in clause.fields]
+            clause_matches: Set[int] = set()
+            tids = self._expand(term, clause.edit_distance)
+            if not tids and clause.presence == REQUIRED:
+                # a missing required term can't match anything
+                for f in fields:
+                    required[f] = set()
+            for tid in tids:
+                for f in fields:
+                    key = (tid, f)
+                    if key not in postings:
+                        postings[key] = self._postings(tid, f)
+                    docs = postings[key]
+                    if clause.presence == REQUIRED:
+                        clause_matches.update(docs)
+                        required.setdefault(f, None)
+                    elif clause.presence == PROHIBITED:
+                        prohibited.setdefault(f, set()).update(docs)
+                        continue
+                    qv = query_vectors[f]
+                    qv[tid] = qv.get(tid, 0) + clause.boost
+                    for doc in docs:
+                        matching[(doc, f)] = None
+            if clause.presence == REQUIRED and tids:
+                for f in fields:
+                    req = required[f]
+                    required[f] = clause_matches if req is None else req & clause_matches
+
+        all_required: Optional[Set[int]] = None
+        for req in required.values():
+            if req is not None:
+                all_required = req if all_required is None else all_required & req
+        all_prohibited: Set[int] = set().union(*prohibited.values())
+
+        if all(clause.presence == PROHIBITED for clause in clauses):
+            rows = self.db.execute("SELECT DISTINCT doc, field FROM postings ORDER BY doc, field")
+            matching = {(doc, f): None for doc, f in rows}
+
+        # lunr's cosine-like similarity for each (doc, field) is the dot product of the vectors
+        # scaled by the query magnitude, so accumulate the dot products from the postings
+        # rather than looking up every query term for every matching document
+        dots: List[Dict[int, float]] = [{} for _ in self.fields]
+        magnitudes: List[float] = []
+        for f, qv in enumerate(query_vectors):
+            magnitudes.append(sqrt(sum(v * v for v in qv.values())))
+            dot = dots[f]
+            for tid, boost in qv.items():
+                docs = postings.get((tid, f))
+                if docs is None:
+                    docs = postings[(tid, f)] = self._postings(tid, f)
+                for doc, score in docs.items():
+                    dot[doc] = dot.get(doc, 0.0) + boost * score
+
+        scores: Dict[int, float] = {}
+        for doc, f in matching:
+            if (all_required is not None and doc not in all_required) or doc in all_prohibited:
+                continue
+            magnitude = magnitudes[f]
+            scores[doc] = scores.get(doc, 0) + (dots[f].get(doc, 0.0) / magnitude if magnitude else 0)
+
+        if not scores:
+            return []
+        refs = dict(self.db.execute(
+            f"SELECT id, ref FROM docs WHERE id IN ({','.join('?' * len(scores))})", list(scores)))
+        results = [dict(ref=refs[doc], score=score) for doc, score in scores.items()]
+        return sorted(results, key=lambda r: r['score'], reverse=True)
+
+
+def parse_query(q: str, fields: List[str]) -> List[Clause]:
+    """Parse a query string into clauses like lunr's QueryParser, e.g. '+kind:EVENTS alti*'"""
+    lexemes = _lex(q)
+    clauses = []
+    i, n = 0, len(lexemes)
+    while i < n:
+        clause = Clause(fields)
+        typ, s = lexemes[i]
+        if typ == _PRESENCE:
+            clause.presence = s
+            i += 1
+            if i == n:
+                raise QueryParseError("Expected either a field or a term, found nothing")
+            typ, s = lexemes[i]
+            if typ not in (_FIELD, _TERM):
+                raise QueryParseError(f"Expected either a field or a term, found {typ}")
+        if typ == _FIELD:
+            if s not in fields:
+                raise QueryParseError(f'Unrecognized field "{s}", possible fields {", ".join(fields)}')
+            clause.fields = [s]
+            i += 1
+            if i == n:
+                raise QueryParseError("Expected term, found nothing")
+            typ, s = lexemes[i]
+            if typ != _TERM:
+                raise QueryParseError(f"Expected term, found {typ}")
+        if typ != _TERM:
+            raise QueryParseError(f"Expected either a field or a term, found {typ}")
+        clause.term = s.lower()
+        clause.use_pipeline = '*' not in s
+        i += 1
+        while i < n and lexemes[i][0] in (_EDIT_DISTANCE, _BOOST):
+            typ, s = lexemes[i]
+            if not s:
+                raise QueryParseError(f"{'Edit distance' if typ == _EDIT_DISTANCE else 'Boost'} must be numeric")
+            if typ == _EDIT_DISTANCE:
+                clause.edit_distance = int(s)
+            else:
+                clause.boost = int(s)
+            i += 1
+        clauses.append(clause)
+    return clauses
+
+
+def _lex(q: str) -> List[Tuple[str, str]]:
+    """Split a query into (type, string) lexemes, following lunr's QueryLexer"""
+    lexemes: List[Tuple[str, str]] = []
+    start = pos = 0
+    escapes: List[int] = []
+
+    def emit(typ: str, end: int):
+        nonlocal start
+        s, i = '', start
+        for e in escapes:
+            s, i = s + q[i:e], e + 1
+        lexemes.append((typ, s + q[i:end]))
+        escapes.clear()
+        start = end
+
+    def digits(i: int) -> int:
+        while i < len(q) and q[i] in '0123456789':
+            i += 1
+        return i
+
+    while pos < len(q):
+        c = q[pos]
+        pos += 1
+        if c == '\\':
+            # the escaped character is part of the term
+            escapes.append(pos - 1)
+            pos += 1
+        elif c == ':':
+            emit(_FIELD, pos - 1)
+            start = pos
+        elif c in '~^':
+            if pos - 1 > start:
+                emit(_TERM, pos - 1)
+            start = pos
+            pos = digits(pos)
+            emit(_EDIT_DISTANCE if c == '~' else _BOOST, pos)
+        elif c in '+-' and pos - start == 1:
+            emit(_PRESENCE, pos)
+        elif c in _SEPARATORS:
+            if pos - start > 1:
+                emit(_TERM, pos - 1)
+            start = pos
+    if pos > start:
+        emit(_TERM, pos)
+    return lexemes
+
+
+def _charmask(term: str) -> int:
+    """A bitmask of the characters in term, folded into 63 bits to fit an SQLite integer"""
+    mask = 0
+    for c in term:
+        mask |= 1 << (ord(c) % 63)
+    return mask
+
+
+def _within_distance(a: str, b: str, k: int) -> bool:
+    """True if a and b are within k insertions, deletions, substitutions or adjacent transpositions"""
+    if abs(len(a) - len(b)) > k:
+        return False
+    # optimal string alignment distance, stopping early once every entry in a row exceeds k
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+        if min(cur) > k:
+            return False
+        prev2, prev = prev, cur
+    return prev[-1] <= k
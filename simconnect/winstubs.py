@@ -1,21 +1,22 @@
 # hack to avoid simconnect import error on non-windows platform
-# allows us to run some supporting tools, but not simconnect SDK connection
-from ctypes import c_char, c_ushort, c_ulong, c_void_p, c_char_p
+# allows us to run some supporting tools, and the emulator backend, but not simconnect SDK connection
+from ctypes import CFUNCTYPE, c_char, c_int32, c_ushort, c_uint32, c_void_p, c_char_p
 
 
-HRESULT = c_ushort
+# match the windows sizes, so structure layouts are the same on all platforms
+HRESULT = c_int32
 BYTE = c_char
 WORD = c_ushort
-DWORD = c_ulong
+DWORD = c_uint32
 HANDLE = c_void_p
 LPCSTR = c_char_p
 HWND = c_void_p
 
-
-def WINFUNCTYPE(*args, **kwargs):
-    pass
+# callbacks use the C calling convention off windows
+WINFUNCTYPE = CFUNCTYPE
 
 
 class windll:
-    def LoadLibrary(self, *args, **kwargs):
-        pass
+    @staticmethod
+    def LoadLibrary(*args, **kwargs):
+        raise OSError("SimConnect.dll is only available on Windows, see SimConnect(backend=...)")
@@ -0,0 +1,32 @@
+import pytest
+
+from simconnect import SimConnect, SimConnectEmulator
+
+
+@pytest.fixture
+def emulator():
+    """A deterministic emulator whose clock advances one sim frame per dispatch"""
+    return SimConnectEmulator(
+        simvars={
+            'PLANE ALTITUDE': lambda t: 1000 + 60 * t,
+            'PLANE LATITUDE': 0.8,
+            'ATC ID': 'N12345',
+        },
+        objects={
+            101: {'PLANE ALTITUDE': 500, 'ATC ID': 'AI101'},
+            102: {'PLANE ALTITUDE': 700, 'ATC ID': 'AI102'},
+        },
+        realtime=False,
+    )
+
+
+@pytest.fixture
+def sc(emulator):
+    with SimConnect(name='test', backend=emulator, poll_interval_seconds=0.001) as sc:
+        yield sc
+
+
+def pump(sc, n=10):
+    """Dispatch n times, advancing the emulated clock by n frames"""
+    for _ in range(n):
+        sc.dispatch()
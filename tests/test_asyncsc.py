@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+
+from simconnect import SimConnect, AsyncSimConnect, SystemState, PERIOD_SIM_FRAME
+
+
+def run(coroutine_function, emulator):
+    async def main():
+        async with AsyncSimConnect(sc=SimConnect(backend=emulator), poll_interval_seconds=0.001) as asc:
+            return await coroutine_function(asc)
+    return asyncio.run(main())
+
+
+def test_get_simdata(emulator):
+    async def f(asc):
+        return await asyncio.gather(asc.get_simdatum('PLANE LATITUDE'), asc.get_simdata(['ATC ID']))
+    latitude, simdata = run(f, emulator)
+    assert latitude == 0.8
+    assert simdata == {'ATC ID': 'N12345'}
+
+
+def test_system_state(emulator):
+    async def f(asc):
+        return await asc.RequestSystemState('Sim'), await asc.RequestSystemState('AircraftLoaded')
+    sim, aircraft = run(f, emulator)
+    assert sim == SystemState(1, 0.0, '')
+    assert aircraft.string.endswith('aircraft.cfg')
+
+
+def test_subscribe(emulator):
+    async def f(asc):
+        updates = []
+        baseline = len(asc.sc._receivers)
+        it = asc.subscribe_simdata('PLANE ALTITUDE', period=PERIOD_SIM_FRAME)
+        async for simdata in it:
+            updates.append(simdata)
+            if len(updates) == 3:
+                break
+        await it.aclose()
+        return updates, len(asc.sc._receivers) - baseline
+    updates, extra_receivers = run(f, emulator)
+    assert [u['PLANE ALTITUDE'] for u in updates] == pytest.approx([1001, 1002, 1003])
+    assert extra_receivers == 0
+
+
+def test_timeout(emulator):
+    emulator.RequestDataOnSimObject = lambda *args: 0
+
+    async def f(asc):
+        return await asc.get_simdata('PLANE ALTITUDE', timeout_seconds=0.01)
+    assert run(f, emulator) == {}
@@ -0,0 +1,60 @@
+import pytest
+
+from simconnect.changedict import ChangeDict, now, within
+
+
+def test_versions():
+    d = ChangeDict()
+    d.update(a=1, b=2)
+    changes, token = d.snapshot_diff()
+    assert changes == {'b': 2, 'a': 1} and token == 2
+    # unchanged values don't bump the version
+    d.update(a=1, b=2)
+    assert d.snapshot_diff(token) == ({}, 2)
+    d['a'] = 3
+    d['c'] = 4
+    assert d.snapshot_diff(token) == ({'c': 4, 'a': 3}, 4)
+    assert d.versionof('a') == 3 and d.versionof('missing') == 0
+    assert list(d) == ['b', 'a', 'c']
+
+
+def test_times():
+    t = now()
+    d = ChangeDict()
+    assert d.latest() == 0
+    d.update(a=1, b=2)
+    assert d.latest() >= t
+    assert d.changedsince(t - 1) == {'b': 2, 'a': 1}
+    assert d.changedsince(d.latest()) == {}
+    with pytest.raises(ValueError):
+        ChangeDict(track_times=False).changedsince(0)
+
+
+@pytest.mark.parametrize('remove', [
+    lambda d: d.pop('a'),
+    lambda d: d.popitem(last=False),
+    lambda d: d.__delitem__('a'),
+    lambda d: d.clear(),
+])
+def test_remove_and_readd(remove):
+    d = ChangeDict()
+    d['a'] = 1
+    d['b'] = 2
+    remove(d)
+    d['a'] = 2
+    assert d['a'] == 2
+    assert d.changedsince_version(2) == {'a': 2}
+    assert d.changedsince(0)['a'] == 2
+    assert d.pop('missing', None) is None
+
+
+def test_comparators():
+    d = ChangeDict(comparators=dict(alt=within(5)))
+    d['alt'] = 100.0
+    d['alt'] = 104.0
+    assert d['alt'] == 100.0
+    d['alt'] = 106.0
+    assert d['alt'] == 106.0
+    d['s'] = 'x'
+    d['s'] = 'x'
+    assert d.version == 3
@@ -0,0 +1,58 @@
+import pytest
+
+from simconnect import PERIOD_SIM_FRAME
+from conftest import pump
+
+np = pytest.importorskip('numpy')
+
+
+def test_history(sc):
+    with sc.subscribe_simdata(['PLANE ALTITUDE', 'ATC ID'], period=PERIOD_SIM_FRAME, history=8) as sub:
+        history = sub.history
+        assert len(history) == 0 and history.latest() is None
+        pump(sc, 20)
+        assert len(history) == 8
+        assert history.dropped == 12
+        altitude = history.column('PLANE ALTITUDE')
+        assert list(altitude) == pytest.approx([1000 + f for f in range(13, 21)])
+        # values which didn't change are carried forward
+        assert list(history.column('ATC ID')) == ['N12345'] * 8
+        assert np.all(np.diff(history.column('local_time')) >= 0)
+        assert len(history.window(3)) == 3
+        assert history.window(3)['PLANE ALTITUDE'][-1] == history.latest()['PLANE ALTITUDE']
+
+
+def test_history_views(sc):
+    with sc.subscribe_simdata('PLANE ALTITUDE', period=PERIOD_SIM_FRAME, history=4) as sub:
+        pump(sc, 6)
+        window = sub.history.column('PLANE ALTITUDE')
+        assert window.base is not None
+        snapshot = window.copy()
+        sub.history.clear()
+        assert len(sub.history) == 0
+        pump(sc, 2)
+        assert list(sub.history.column('PLANE ALTITUDE')) == pytest.approx([1007, 1008])
+        assert list(snapshot) == pytest.approx([1003, 1004, 1005, 1006])
+
+
+def test_history_timestamp_hidden(sc, emulator):
+    emulator.simvars['SIMULATION TIME'] = lambda t: t
+    updates = []
+    with sc.subscribe_simdata(
+            ['PLANE LATITUDE', 'ATC ID'], period=PERIOD_SIM_FRAME, history=16,
+            callback=lambda simdata: updates.append(dict(simdata))) as sub:
+        pump(sc, 10)
+        # the constant simvars only change once, though the timestamp changes every frame
+        assert updates == [{'PLANE LATITUDE': 0.8, 'ATC ID': 'N12345'}]
+        assert 'SIMULATION TIME' not in sub.simdata
+        assert len(sub.history) == 10
+        assert list(sub.history.column('sim_time')) == pytest.approx([f / 60 for f in range(1, 11)])
+
+
+def test_history_wraps(sc):
+    with sc.subscribe_simdata('PLANE ALTITUDE', period=PERIOD_SIM_FRAME, history=5) as sub:
+        for n in range(1, 23):
+            sc.dispatch()
+            if n % 3 == 0:
+                expected = [1000 + f for f in range(max(n - 4, 1), n + 1)]
+                assert list(sub.history.column('PLANE ALTITUDE')) == pytest.approx(expected)
@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+
+def test_optional_modules_are_lazy():
+    code = (
+        "import sys, simconnect; "
+        "assert 'asyncio' not in sys.modules and 'simconnect.mux' not in sys.modules; "
+        "simconnect.AsyncSimConnect; simconnect.SimDataMux; "
+        "assert 'simconnect.asyncsc' in sys.modules; "
+        "assert 'AsyncSimConnect' in dir(simconnect)"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_search_skips_client():
+    code = (
+        "import sys, simconnect.search; "
+        "assert 'simconnect.sc' not in sys.modules and 'simconnect.scvars' not in sys.modules; "
+        "assert not any(m.split('.')[0] == 'lunr' for m in sys.modules); "
+        "from simconnect import *; "
+        "assert SimConnect.__module__ == 'simconnect.sc' and SIMVARS and PERIOD_SIM_FRAME"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
@@ -0,0 +1,73 @@
+import pytest
+
+from simconnect import SimDataMux, PERIOD_SIM_FRAME, PERIOD_SECOND
+from conftest import pump
+
+
+def test_shared_field(sc):
+    mux = SimDataMux(sc)
+    slow = mux.subscribe_simdata(['PLANE ALTITUDE', 'ATC ID'])
+    fast = mux.subscribe_simdata(['PLANE ALTITUDE', 'PLANE LATITUDE'], period=PERIOD_SIM_FRAME)
+    # altitude moves to the fastest request, with ATC ID left at the slow rate
+    assert len(mux._groups) == 2
+    assert len(sc.definitions) == 2
+    pump(sc, 10)
+    assert fast.simdata['PLANE ALTITUDE'] == pytest.approx(1010)
+    assert slow.simdata['PLANE ALTITUDE'] == fast.simdata['PLANE ALTITUDE']
+    assert fast.simdata['PLANE LATITUDE'] == 0.8
+    mux.close()
+    assert not mux._groups
+
+
+def test_regroup_on_cancel(sc, emulator):
+    baseline = len(sc._receivers)
+    mux = SimDataMux(sc)
+    slow = mux.subscribe_simdata('PLANE ALTITUDE', period=PERIOD_SECOND)
+    fast = mux.subscribe_simdata('PLANE ALTITUDE', period=PERIOD_SIM_FRAME)
+    assert [rate for rate, _ in mux._groups.items()] == [(1 / 60, -PERIOD_SIM_FRAME)]
+    assert fast.cancel()
+    assert not fast.cancel()
+    assert list(mux._groups) == [(1, -PERIOD_SECOND)]
+    version = slow.simdata.version
+    pump(sc, 120)
+    assert slow.simdata.version > version
+    slow.cancel()
+    assert not mux._groups
+    assert len(sc._receivers) == baseline
+    # cancelled groups clear their definitions in the sim
+    assert not emulator.definitions
+
+
+def test_new_subscriber_seeded(sc):
+    mux = SimDataMux(sc)
+    first = mux.subscribe_simdata('PLANE LATITUDE', period=PERIOD_SIM_FRAME)
+    pump(sc, 2)
+    second = mux.subscribe_simdata('PLANE LATITUDE', period=PERIOD_SIM_FRAME)
+    assert second.simdata == first.simdata == {'PLANE LATITUDE': 0.8}
+
+
+def test_callbacks_only_on_change(sc):
+    mux = SimDataMux(sc)
+    coarse, fine = [], []
+    mux.subscribe_simdata(
+        [dict(name='PLANE ALTITUDE', epsilon=5)], period=PERIOD_SIM_FRAME, callback=lambda d: coarse.append(dict(d)))
+    mux.subscribe_simdata(
+        [dict(name='PLANE ALTITUDE', epsilon=0.1)], period=PERIOD_SIM_FRAME, callback=lambda d: fine.append(dict(d)))
+    pump(sc, 20)
+    assert len(fine) == 20
+    # altitude climbs one foot per frame so the coarse subscriber sees every sixth change
+    assert 3 <= len(coarse) <= 4
+
+
+def test_spellings_share_field(sc):
+    mux = SimDataMux(sc)
+    a = mux.subscribe_simdata('PLANE_ALTITUDE', period=PERIOD_SIM_FRAME)
+    b = mux.subscribe_simdata('Plane Altitude', period=PERIOD_SIM_FRAME)
+    c = mux.subscribe_simdata(['GENERAL ENG RPM:1', 'GENERAL ENG RPM:2'], period=PERIOD_SIM_FRAME)
+    assert a.keys == b.keys
+    assert len(set(c.keys)) == 2
+    assert len(mux._groups[(1 / 60, -PERIOD_SIM_FRAME)].keys) == 3
+    pump(sc, 3)
+    # each subscriber sees its own spelling
+    assert a.simdata['PLANE_ALTITUDE'] == b.simdata['Plane Altitude'] == pytest.approx(1003)
+    mux.close()
@@ -0,0 +1,50 @@
+import pytest
+
+from simconnect import SimConnect, ObjectTable, SIMOBJECT_TYPE_USER
+
+
+@pytest.fixture(params=[False, True], ids=['lists', 'numpy'])
+def use_numpy(request):
+    if request.param:
+        pytest.importorskip('numpy')
+    return request.param
+
+
+def test_bytype(sc, use_numpy):
+    fut = sc.request_simdata_bytype(['PLANE ALTITUDE', 'ATC ID'], use_numpy=use_numpy)
+    assert sc.wait([fut])
+    table = fut.result()
+    assert isinstance(table, ObjectTable)
+    assert (table.data is not None) == use_numpy
+    assert table.complete and len(table) == 2
+    assert sorted(int(oid) for oid in table.object_ids) == [101, 102]
+    assert list(table['PLANE ALTITUDE']) == [500, 700]
+    assert list(table['ATC ID']) == ['AI101', 'AI102']
+    row = table.row(102)
+    assert row['PLANE ALTITUDE'] == 700
+    assert row['ATC ID'] == 'AI102' and isinstance(row['ATC ID'], str)
+    assert not sc._pending
+
+
+def test_bytype_repeated_entry(sc, emulator, use_numpy):
+    fut = sc.request_simdata_bytype('PLANE ALTITUDE', timeout_seconds=0.05, use_numpy=use_numpy)
+    # deliver the first object's packet twice, and never the second's
+    emulator._queue[1] = emulator._queue[0]
+    assert sc.wait([fut])
+    table = fut.table
+    assert table.received == 1 and not table.complete
+    with pytest.raises(TimeoutError):
+        fut.result()
+
+
+def test_bytype_user(sc):
+    table = sc.get_simdata_bytype('PLANE LATITUDE', radius_meters=0, object_type=SIMOBJECT_TYPE_USER)
+    assert table.complete
+    assert list(table['PLANE LATITUDE']) == [0.8]
+
+
+def test_bytype_empty(emulator):
+    emulator.objects.clear()
+    with SimConnect(backend=emulator) as sc:
+        table = sc.get_simdata_bytype('PLANE ALTITUDE')
+        assert table.complete and len(table) == 0
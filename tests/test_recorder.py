@@ -0,0 +1,66 @@
+from io import BytesIO
+import pytest
+
+from simconnect import FlightRecorder, read_recording, PERIOD_SIM_FRAME, DATATYPE_LATLONALT, DATATYPE_STRINGV
+from simconnect.recorder import _field_codes
+from conftest import pump
+
+np = pytest.importorskip('numpy')
+
+
+def test_recording_round_trip(sc, emulator):
+    emulator.simvars['STRUCT LATLONALT'] = lambda t: dict(Latitude=47.5, Longitude=-122.25, Altitude=100 * t)
+    f = BytesIO()
+    simvars = ['PLANE ALTITUDE', 'ATC ID', dict(name='STRUCT LATLONALT', units='number', type=DATATYPE_LATLONALT)]
+    with sc.subscribe_simdata(simvars, period=PERIOD_SIM_FRAME) as sub:
+        with FlightRecorder(f, sub, block_rows=4) as recorder:
+            pump(sc, 10)
+    assert recorder.rows == 10
+    f.seek(0)
+    header, blocks = read_recording(f)
+    assert [d['name'] for d in header['defs']][:3] == ['PLANE ALTITUDE', 'ATC ID', 'STRUCT LATLONALT']
+    blocks = list(blocks)
+    assert [len(b['t']) for b in blocks] == [4, 4, 2]
+    altitude = np.concatenate([b['PLANE ALTITUDE'] for b in blocks])
+    assert list(altitude) == pytest.approx([1000 + f for f in range(1, 11)])
+    assert set(np.concatenate([b['ATC ID'] for b in blocks])) == {'N12345'}
+    position = np.concatenate([b['STRUCT LATLONALT'] for b in blocks])
+    assert list(position['Latitude']) == [47.5] * 10
+    assert list(position['Altitude']) == pytest.approx([100 * f / 60 for f in range(1, 11)])
+
+
+def test_recorder_unsupported_type():
+    with pytest.raises(ValueError, match='ATC ID'):
+        _field_codes([dict(name='ATC ID', units=None, dtyp=DATATYPE_STRINGV)])
+
+
+def test_read_recording_closes_file(sc, tmp_path, monkeypatch):
+    opened = []
+    real_open = open
+
+    def tracking_open(*args, **kwargs):
+        opened.append(real_open(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr('builtins.open', tracking_open)
+    bad = tmp_path / 'bad.screc'
+    bad.write_bytes(b'NOTREC')
+    with pytest.raises(ValueError, match='not a recording'):
+        read_recording(str(bad))
+    truncated = tmp_path / 'truncated.screc'
+    truncated.write_bytes(b'SCREC1\xff\x00\x00\x00{}')
+    with pytest.raises(ValueError, match='truncated header'):
+        read_recording(str(truncated))
+    assert len(opened) == 2 and all(f.closed for f in opened)
+
+    path = str(tmp_path / 'flight.screc')
+    with sc.subscribe_simdata('PLANE ALTITUDE', period=PERIOD_SIM_FRAME) as sub:
+        with FlightRecorder(path, sub):
+            pump(sc, 3)
+    # the blocks own the file, which closes once they're exhausted or closed
+    _, blocks = read_recording(path)
+    assert len(list(blocks)) == 1 and opened[-1].closed
+    _, blocks = read_recording(path)
+    with blocks:
+        assert not opened[-1].closed
+    assert opened[-1].closed
@@ -0,0 +1,29 @@
+import io
+
+from simconnect import SimConnect, PacketReplay, read_capture, PERIOD_SIM_FRAME
+from conftest import pump
+
+
+def test_capture_replay(sc):
+    capture = io.BytesIO()
+    sc.start_capture(capture)
+    sub = sc.subscribe_simdata(['PLANE ALTITUDE', 'ATC ID'], period=PERIOD_SIM_FRAME)
+    snapshot = sc.get_simdata('PLANE LATITUDE')
+    pump(sc, 10)
+    expected = dict(sub.simdata)
+    sc.stop_capture()
+
+    header, packets = read_capture(io.BytesIO(capture.getvalue()))
+    assert header['name'] == 'test'
+    assert len(list(packets)) > 10
+
+    # the same requests in the same order see the same traffic
+    replay = PacketReplay(io.BytesIO(capture.getvalue()), speed=None)
+    with SimConnect(backend=replay) as rsc:
+        rsub = rsc.subscribe_simdata(['PLANE ALTITUDE', 'ATC ID'], period=PERIOD_SIM_FRAME)
+        assert rsc.get_simdata('PLANE LATITUDE') == snapshot
+        while not replay.done:
+            rsc.dispatch()
+        assert dict(rsub.simdata) == expected
+    replay.rewind()
+    assert not replay.done
@@ -0,0 +1,216 @@
+from ctypes import sizeof
+import pytest
+
+from simconnect import (
+    SimConnect, DataDefinition, DATATYPE_INT32, DATATYPE_WAYPOINT, DATA_WAYPOINT, PERIOD_SIM_FRAME,
+)
+from conftest import pump
+
+
+def test_get_simdatum(sc):
+    assert sc.get_simdatum('Plane Altitude') == pytest.approx(1001)
+
+
+def test_get_simdata(sc):
+    simdata = sc.get_simdata(['PLANE ALTITUDE', 'ATC ID', 'PLANE LATITUDE'])
+    assert list(simdata) == ['PLANE ALTITUDE', 'ATC ID', 'PLANE LATITUDE']
+    assert simdata['ATC ID'] == 'N12345'
+    assert simdata['PLANE LATITUDE'] == 0.8
+
+
+def test_request_simdata_pipelined(sc):
+    futures = [sc.request_simdata('PLANE ALTITUDE') for _ in range(5)]
+    assert sc.wait(futures)
+    assert all(f.result()['PLANE ALTITUDE'] > 1000 for f in futures)
+    assert not sc._pending
+
+
+def test_request_timeout(sc, emulator):
+    baseline = len(sc._receivers)
+    fut = sc.request_simdata('PLANE ALTITUDE', timeout_seconds=0.01)
+    # drop the request so the emulator never answers
+    emulator.requests.clear()
+    assert sc.wait([fut])
+    with pytest.raises(TimeoutError):
+        fut.result()
+    assert len(sc._receivers) == baseline
+    assert not sc._pending
+    assert sc.get_simdata('PLANE ALTITUDE', timeout_seconds=0.01) is not None
+
+
+def test_subscribe_and_cancel(sc):
+    baseline = len(sc._receivers)
+    updates = []
+    sub = sc.subscribe_simdata(
+        ['PLANE ALTITUDE', 'ATC ID'], period=PERIOD_SIM_FRAME, callback=lambda simdata: updates.append(dict(simdata))
+    )
+    assert len(sc._receivers) == baseline + 1
+    pump(sc, 10)
+    assert len(updates) == 10
+    # tagged updates only include changes after the first
+    assert updates[0]['ATC ID'] == 'N12345'
+    assert sub.simdata['PLANE ALTITUDE'] == pytest.approx(1010)
+    assert sub.cancel()
+    assert not sub.cancel()
+    assert len(sc._receivers) == baseline
+    pump(sc, 10)
+    assert len(updates) == 10
+
+
+def test_subscribe_many_cancel(sc):
+    baseline = len(sc._receivers)
+    for _ in range(100):
+        with sc.subscribe_simdata('PLANE ALTITUDE', period=PERIOD_SIM_FRAME):
+            sc.dispatch()
+    assert len(sc._receivers) == baseline
+    assert len(sc.definitions) == 1
+
+
+def test_subscribe_untagged_interval(sc):
+    with sc.subscribe_simdata('PLANE LATITUDE', period=PERIOD_SIM_FRAME, interval=5, flags=0) as sub:
+        versions = []
+        for _ in range(20):
+            sc.dispatch()
+            versions.append(sub.simdata.version)
+        # constant values are still sent without DATA_REQUEST_FLAG_CHANGED, but never change simdata
+        assert versions[-1] == 1
+        assert sub.datadef.defs[0]['name'] == 'PLANE LATITUDE'
+
+
+def test_set_simdata(sc, emulator):
+    sc.set_simdatum('PLANE LATITUDE', 0.5)
+    assert emulator.value('PLANE LATITUDE') == 0.5
+    sc.set_simdata([dict(name='ATC ID', value='N999'), dict(name='PLANE LATITUDE', value=0.25)])
+    assert emulator.value('ATC ID') == 'N999'
+    assert sc.get_simdata(['ATC ID', 'PLANE LATITUDE']) == {'ATC ID': 'N999', 'PLANE LATITUDE': 0.25}
+
+
+def test_setter(sc, emulator):
+    baseline = len(sc.definitions)
+    with sc.setter(['PLANE LATITUDE', 'ATC ID']) as setter:
+        setter(0.1, 'A')
+        assert (emulator.value('PLANE LATITUDE'), emulator.value('ATC ID')) == (0.1, 'A')
+        setter['PLANE LATITUDE'] = 0.2
+        setter.send()
+        assert emulator.value('PLANE LATITUDE') == 0.2
+        setter(**{'ATC ID': 'B'})
+        assert (emulator.value('PLANE LATITUDE'), emulator.value('ATC ID')) == (0.2, 'B')
+        assert setter.datadef._refs == 1
+    assert setter.datadef._refs == 0
+    assert len(sc.definitions) == baseline + 1
+
+
+def test_set_simdata_array(sc, emulator):
+    assert sc.set_simdata_array('PLANE LATITUDE', [0.1, 0.2, 0.3], object_id=101) == 3
+    # the emulator keeps the last item of an array
+    assert emulator.value('PLANE LATITUDE', 101) == pytest.approx(0.3)
+    assert sc.set_simdata_array(['PLANE LATITUDE'], []) == 0
+
+
+def test_set_simdata_array_waypoints(sc, emulator):
+    waypoints = [dict(Latitude=47.6 + i, Longitude=-122.3, Altitude=3000, Flags=0, ktsSpeed=150) for i in range(3)]
+    spec = dict(name='AI WAYPOINT LIST', units='number', type=DATATYPE_WAYPOINT)
+    assert sc.set_simdata_array(spec, waypoints, object_id=101) == 3
+    raw = emulator.value('AI WAYPOINT LIST', 101)
+    assert len(raw) == sizeof(DATA_WAYPOINT)
+    last = DATA_WAYPOINT.from_buffer_copy(raw)
+    assert (last.Latitude, last.ktsSpeed) == (49.6, 150)
+
+
+def test_set_simdata_array_numpy(sc, emulator):
+    np = pytest.importorskip('numpy')
+    dd = DataDefinition.create(sc, ['PLANE LATITUDE', 'PLANE ALTITUDE'], settable=True)
+    records = np.zeros(4, dtype=[('PLANE LATITUDE', '<f8'), ('PLANE ALTITUDE', '<f8')])
+    records['PLANE ALTITUDE'] = [1, 2, 3, 4]
+    assert sc.set_simdata_array(['PLANE LATITUDE', 'PLANE ALTITUDE'], records, object_id=102) == 4
+    assert emulator.value('PLANE ALTITUDE', 102) == 4
+    assert dd._refs == 0
+
+
+def test_set_simdata_array_numpy_waypoints(sc, emulator):
+    np = pytest.importorskip('numpy')
+    waypoints = np.zeros(3, dtype=np.dtype(DATA_WAYPOINT))
+    waypoints['Latitude'] = [47.6, 47.7, 47.8]
+    waypoints['Longitude'] = -122.3
+    waypoints['ktsSpeed'] = 150
+    spec = dict(name='AI WAYPOINT LIST', units='number', type=DATATYPE_WAYPOINT)
+    assert sc.set_simdata_array(spec, waypoints, object_id=101) == 3
+    last = DATA_WAYPOINT.from_buffer_copy(emulator.value('AI WAYPOINT LIST', 101))
+    assert (last.Latitude, last.Longitude, last.Altitude, last.Flags, last.ktsSpeed) == (47.8, -122.3, 0, 0, 150)
+
+
+def test_set_simdata_array_numpy_unmatched(sc):
+    np = pytest.importorskip('numpy')
+    records = np.zeros(2, dtype=[('PLANE LATITUDE', '<f8'), ('altitude', '<f8')])
+    with pytest.raises(ValueError, match='altitude'):
+        sc.set_simdata_array(['PLANE LATITUDE', 'PLANE ALTITUDE'], records)
+
+
+def test_send_event(sc, emulator):
+    sc.send_event('KOHLSMAN_INC')
+    sc.send_event('AXIS_ELEVATOR_SET', 100)
+    assert list(emulator.events) == [('KOHLSMAN_INC', 0), ('AXIS_ELEVATOR_SET', 100)]
+
+
+def test_registry_evicts_idle(emulator):
+    with SimConnect(backend=emulator, max_definitions=3) as sc:
+        subs = [sc.subscribe_simdata(name) for name in ('PLANE ALTITUDE', 'PLANE LATITUDE')]
+        for name in ('ATC ID', 'PLANE LONGITUDE', 'AIRSPEED INDICATED'):
+            sc.get_simdata(name)
+        assert len(sc.definitions) == 3
+        assert all(sub.datadef in sc.definitions for sub in subs)
+        assert len(emulator.definitions) == 3
+
+
+def test_stats(emulator):
+    with SimConnect(backend=emulator, metrics=True) as sc:
+        sc.get_simdata('PLANE ALTITUDE')
+        stats = sc.stats()
+        assert stats['pending'] == 0
+        assert stats['counters']['recv.RECV_SIMOBJECT_DATA'] == 1
+        assert 'response_times' not in stats
+        assert 'round_trip' in sc.stats(include_sim=True)['response_times']
+
+
+def test_metrics_survive_id_reuse(emulator):
+    with SimConnect(backend=emulator, metrics=True, max_definitions=1) as sc:
+        with sc.subscribe_simdata('PLANE ALTITUDE', period=PERIOD_SIM_FRAME) as sub:
+            pump(sc, 3)
+        decode_name, callback_name = sub.datadef._metric_names()
+        assert sc.metrics.histograms[decode_name].count == 3
+        # evicts the idle definition, dropping its histograms, and reuses its id
+        with sc.subscribe_simdata('ATC ID', period=PERIOD_SIM_FRAME) as sub2:
+            pump(sc, 2)
+        assert sub.datadef.id == sub2.datadef.id
+        histograms = sc.metrics.histograms
+        assert decode_name not in histograms and callback_name not in histograms
+        assert histograms[sub2.datadef._metric_names()[0]].count == 1
+
+
+def test_metric_names_are_short(sc):
+    dd = DataDefinition.create(sc, [f'GENERAL ENG RPM:{i}' for i in range(1, 101)])
+    decode_name, callback_name = dd._metric_names()
+    assert decode_name.startswith('decode.GENERAL ENG RPM:1+99#') and len(decode_name) < 40
+    assert callback_name == 'callback.' + decode_name[len('decode.'):]
+
+
+def test_emulator_coerces_values(emulator):
+    emulator.simvars.update({
+        'TRANSPONDER CODE:1': 1200.0,
+        'AI WAYPOINT LIST': dict(Latitude=47.6, Longitude=-122.3, Altitude=3000, Flags=0, ktsSpeed=150),
+    })
+    with SimConnect(backend=emulator) as sc:
+        simdata = sc.get_simdata([
+            dict(name='TRANSPONDER CODE:1', units='number', type=DATATYPE_INT32),
+            dict(name='AI WAYPOINT LIST', units='number', type=DATATYPE_WAYPOINT),
+        ])
+        assert simdata['TRANSPONDER CODE:1'] == 1200
+        assert DATA_WAYPOINT.from_buffer_copy(simdata['AI WAYPOINT LIST']).ktsSpeed == 150
+        emulator.simvars['TRANSPONDER CODE:1'] = 'squawk'
+        with pytest.raises(ValueError, match='TRANSPONDER CODE:1'):
+            sc.get_simdata(dict(name='TRANSPONDER CODE:1', units='number', type=DATATYPE_INT32))
+
+
+def test_stub_sizes():
+    from simconnect.winstubs import HRESULT, DWORD
+    assert sizeof(HRESULT) == sizeof(DWORD) == 4
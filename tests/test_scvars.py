@@ -0,0 +1,24 @@
+import shutil
+
+from simconnect import scvars
+
+
+def test_db_matches_json():
+    assert scvars._use_db()
+    assert scvars.SIMVARS['PLANE ALTITUDE']['settable']
+
+
+def test_stale_db_detected(tmp_path, monkeypatch):
+    path = tmp_path / 'scvars.json'
+    shutil.copy(scvars._jsonpath, path)
+    monkeypatch.setattr(scvars, '_jsonpath', str(path))
+    monkeypatch.setattr(scvars, '_db_ok', None)
+    # a CRLF checkout still matches
+    path.write_bytes(path.read_bytes().replace(b'\n', b'\r\n'))
+    assert scvars._use_db()
+    # but a same-size edit doesn't
+    size = path.stat().st_size
+    path.write_bytes(path.read_bytes().replace(b'"Feet', b'"Fees', 1))
+    assert path.stat().st_size == size
+    monkeypatch.setattr(scvars, '_db_ok', None)
+    assert not scvars._use_db()
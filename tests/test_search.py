@@ -0,0 +1,62 @@
+import os
+import pytest
+
+import simconnect
+from simconnect._porter import stem
+from simconnect.search import PROHIBITED, REQUIRED, QueryParseError, SearchIndex, _within_distance, parse_query
+
+
+@pytest.fixture(scope='module')
+def idx():
+    return SearchIndex(os.path.join(os.path.dirname(simconnect.__file__), 'scvars_idx.db'))
+
+
+def refs(results):
+    return [r['ref'] for r in results]
+
+
+def test_search(idx):
+    results = idx.search('altitude')
+    assert 'VARIABLES_PLANE ALTITUDE' in refs(results)
+    scores = [r['score'] for r in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_required_kind(idx):
+    results = idx.search('+kind:EVENTS alti*')
+    assert results and all(ref.startswith('EVENTS_') for ref in refs(results))
+
+
+def test_search_prohibited(idx):
+    assert not any(ref.startswith('UNITS_') for ref in refs(idx.search('-kind:UNITS feet')))
+
+
+def test_search_fuzzy(idx):
+    # a transposition is a single edit
+    assert 'VARIABLES_PLANE ALTITUDE' in refs(idx.search('altitdue~1'))
+    assert set(refs(idx.search('altitude'))) <= set(refs(idx.search('altitdue~2')))
+    assert idx.search('qqqqqqq~1') == []
+
+
+def test_within_distance():
+    assert _within_distance('alti', 'alt', 1)
+    assert _within_distance('alti', 'atli', 1)
+    assert not _within_distance('alti', 'tila', 1)
+    assert _within_distance('alti', 'alto', 1) and not _within_distance('alti', 'xyz', 3)
+
+
+def test_parse_query():
+    fields = ['kind', 'name']
+    c1, c2, c3 = parse_query('+kind:EVENTS alti*~1 -Flaps\\-Handle^10', fields)
+    assert (c1.term, c1.fields, c1.presence, c1.use_pipeline) == ('events', ['kind'], REQUIRED, True)
+    assert (c2.term, c2.fields, c2.edit_distance, c2.use_pipeline) == ('alti*', fields, 1, False)
+    assert (c3.term, c3.presence, c3.boost) == ('flaps-handle', PROHIBITED, 10)
+    for q in ['nope:alti', 'kind:', 'alti~', '+']:
+        with pytest.raises(QueryParseError):
+            parse_query(q, fields)
+
+
+def test_stem_matches_lunr():
+    porter_stemmer = pytest.importorskip('lunr.stemmer').porter_stemmer
+    words = ['altitudes', 'flaps', 'handling', 'generalization', 'hopeful', 'agreed', 'try', 'lay', 'as', 'ion']
+    assert [stem(w) for w in words] == [porter_stemmer.stem(w) for w in words]